@@ -0,0 +1,61 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import os
+import pandas as pd
+import pytest
+
+# library imports
+from library.data.generator.generate_tickhistory_legacy import generate_raw_legacy
+from library.data.parser.parse_tickhistory_legacy_to_normalized import chunkwise_reconstruct_book, load_df, merge_raw_files
+
+# settings
+RICS = ["AAA.DE", "BBB.DE", "CCC.DE"]
+DAYS = 3
+UPDATES_PER_DAY = 2_000
+
+# FIXTURES (shared by the tests of all modules, generated once per session) . . .
+
+@pytest.fixture(scope="session")
+def path_list(tmp_path_factory):
+    """
+    Generate synthetic TRTH raw legacy data, one file per '#RIC', each with several trading days.
+    """
+
+    # ...
+    path_dir = tmp_path_factory.mktemp("raw")
+    path_list = []
+    for i, ric in enumerate(RICS):
+        path = os.path.join(path_dir, "{ric}.csv.gz".format(ric=ric))
+        generate_raw_legacy(path, rics=(ric,), days=DAYS, updates_per_day=UPDATES_PER_DAY, seed=i)
+        path_list.append(path)
+
+    return path_list
+
+@pytest.fixture(scope="session")
+def data(path_list):
+    """
+    Load all files as a single DataFrame, '#RIC' after '#RIC'.
+    """
+
+    return pd.concat([load_df(path) for path in path_list], axis=0, ignore_index=True)
+
+@pytest.fixture(scope="session")
+def merged(path_list):
+    """
+    Merge all files by 'Date-Time', i.e. UPDATE STATEs of several '#RIC's are interleaved.
+    """
+
+    return pd.concat(merge_raw_files(path_list, block_size=5_000), axis=0, ignore_index=True)
+
+@pytest.fixture(scope="session")
+def reference(data):
+    """
+    Reconstruct book chunkwise, serially, using the numpy engine.
+    """
+
+    return chunkwise_reconstruct_book(data)
@@ -0,0 +1,700 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: support authentication for the tick history API (token header), currently pre-signed URLs only
+
+# general imports
+import argparse
+import collections
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import contextlib
+import gzip
+import hashlib
+import http.client
+import io
+import json
+import os
+import pandas as pd
+import re
+import sys
+import threading
+import time
+import urllib.parse
+
+# make library importable if run as script, e.g. `python library/data/downloader/downloader.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.utility.hashing.hashing import hash_file
+
+# settings
+WORKERS = 8 # number of threads, i.e. segments downloaded at the same time
+MAX_PER_HOST = 4 # number of connections per host at the same time
+SEGMENT_SIZE = 2**26 # bytes per byte-range segment, 64 MiB
+BLOCK_SIZE = 2**20 # bytes per read, 1 MiB
+TIMEOUT = 60 # seconds per socket operation
+RETRIES = 5 # attempts per request after a connection failure, with exponential backoff
+BACKOFF = 1 # seconds before the first retry
+MAX_REDIRECTS = 5
+STATE_INTERVAL = 5 # seconds between updates of the resume state of a file
+CHECKSUM_ALGORITHMS = {32: "md5", 40: "sha1", 64: "sha256"} # hex digest length mapped to algorithm
+RETRY_ERRORS = (ConnectionError, TimeoutError, http.client.HTTPException, OSError)
+
+class ConnectionPool:
+
+    def __init__(self, max_per_host=MAX_PER_HOST, timeout=TIMEOUT):
+        """
+        Keep-alive HTTP(S) connections, pooled per host, such that segments and
+        files of the same host reuse connections instead of opening a new one
+        (TCP and TLS handshake) per request. At most `max_per_host` requests
+        per host are active at the same time, further requests wait.
+
+        :param max_per_host:
+            int, number of connections per host at the same time, default is MAX_PER_HOST
+        :param timeout:
+            float, seconds per socket operation, default is TIMEOUT
+        """
+
+        # ...
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.idle = collections.defaultdict(list)
+        self.semaphores = {}
+
+    @contextlib.contextmanager
+    def request(self, method:str, url:str, headers=None):
+        """
+        Send a request, yield the response. The connection returns to the pool
+        if the response has been read entirely, else it is closed.
+
+        :param method:
+            str, e.g. "GET"
+        :param url:
+            str, absolute http(s) URL
+        :param headers:
+            dict, request headers, default is None
+        :return response:
+            http.client.HTTPResponse
+        """
+
+        # ...
+        parts = urllib.parse.urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        # at most max_per_host active requests per host
+        with self.lock:
+            semaphore = self.semaphores.setdefault(key, threading.BoundedSemaphore(self.max_per_host))
+        with semaphore:
+            connection = self._get_connection(key)
+            try:
+                connection.request(method, target, headers=headers or {})
+                response = connection.getresponse()
+                yield response
+            except BaseException:
+                connection.close()
+                raise
+
+            # reuse connection only if the response has been read entirely
+            if response.isclosed() and not response.will_close:
+                with self.lock:
+                    self.idle[key].append(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        """
+        Close all idle connections.
+        """
+
+        # ...
+        with self.lock:
+            for connection_list in self.idle.values():
+                for connection in connection_list:
+                    connection.close()
+            self.idle.clear()
+
+    def _get_connection(self, key:tuple):
+        """
+        Get an idle connection to the host, or open a new one.
+        """
+
+        # ...
+        with self.lock:
+            if self.idle[key]:
+                return self.idle[key].pop()
+        scheme, host, port = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+
+        return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+class _File:
+    """
+    Download of a single file: URL (after redirects), validators of the
+    content (size, ETag, Last-Modified), byte-range segments and number of
+    bytes done per segment, which is stored as resume state next to the
+    partial file (`<path>.part`, `<path>.part.json`).
+    """
+
+    __slots__ = ("url", "path", "checksum", "size", "etag", "last_modified", "ranges", "segments", "done", "lock",
+        "fd", "state_time", "error", "time_start",
+    )
+
+    def __init__(self, url:str, path:str, checksum=None):
+        self.url = url
+        self.path = path
+        self.checksum = checksum
+        self.size = None
+        self.etag = None
+        self.last_modified = None
+        self.ranges = False
+        self.segments = []
+        self.done = []
+        self.lock = threading.Lock()
+        self.fd = None
+        self.state_time = 0
+        self.error = None
+        self.time_start = time.time()
+
+    def get_state(self):
+        return {"size": self.size, "etag": self.etag, "last_modified": self.last_modified, "segments": self.segments, "done": self.done}
+
+class Downloader:
+
+    def __init__(self, workers=WORKERS, max_per_host=MAX_PER_HOST, segment_size=SEGMENT_SIZE, block_size=BLOCK_SIZE,
+        timeout=TIMEOUT, retries=RETRIES, headers=None,
+    ):
+        """
+        Download large files, e.g. tick history extracts, concurrently and
+        resumably. Files are split into byte-range segments that are fetched
+        by a pool of threads over pooled keep-alive connections (see
+        `ConnectionPool`) and written to their offset of a partial file, i.e.
+        nothing is buffered beyond a block per thread.
+
+        Progress is stored next to the partial file, such that an interrupted
+        download (or a dropped connection) resumes where it stopped, as long
+        as size and ETag (or Last-Modified) of the file are unchanged. Files
+        are verified by size and, if given, checksum before they are renamed
+        to their final path. Servers that do not support byte ranges are read
+        in a single request, from the beginning.
+
+        :param workers:
+            int, number of threads, i.e. segments downloaded at the same time, default is WORKERS
+        :param max_per_host:
+            int, number of connections per host at the same time, default is MAX_PER_HOST
+        :param segment_size:
+            int, bytes per byte-range segment, default is SEGMENT_SIZE
+        :param block_size:
+            int, bytes per read, default is BLOCK_SIZE
+        :param timeout:
+            float, seconds per socket operation, default is TIMEOUT
+        :param retries:
+            int, attempts per request after a connection failure, default is RETRIES
+        :param headers:
+            dict, headers sent with every request, default is None
+        """
+
+        # ...
+        self.workers = workers
+        self.segment_size = int(segment_size)
+        self.block_size = int(block_size)
+        self.retries = retries
+        self.headers = headers or {}
+        self.pool = ConnectionPool(max_per_host=max_per_host, timeout=timeout)
+        self.stop = threading.Event()
+
+    def download(self, url:str, path:str, checksum=None, overwrite=False):
+        """
+        Download a single file (see `download_many`).
+
+        :param url:
+            str, http(s) URL
+        :param path:
+            str, path to file
+        :param checksum:
+            str, hex digest, optionally prefixed by algorithm, e.g. "sha256:...", default is None
+        :param overwrite:
+            bool, whether to download if the file exists already, default is False
+        :return result:
+            dict, status, bytes and runtime
+        """
+
+        # ...
+        summary = self.download_many([url], [path], checksums=[checksum], overwrite=overwrite)
+        result = summary.iloc[0].to_dict()
+        if result["status"] == "failed":
+            raise IOError(result["error"])
+
+        return result
+
+    def download_many(self, url_list:list, path_list:list, checksums=None, overwrite=False):
+        """
+        Download many files at the same time, segments of all files share the
+        pool of threads and connections. Files that exist already are skipped.
+
+        :param url_list:
+            list, http(s) URLs
+        :param path_list:
+            list, paths to files (or a directory, files are named as in the URL)
+        :param checksums:
+            list, hex digest per file (or None), optionally prefixed by algorithm, default is None
+        :param overwrite:
+            bool, whether to download files that exist already, default is False
+        :return summary:
+            pd.DataFrame, one row per file with status, size and runtime
+        """
+
+        # ...
+        if isinstance(path_list, str):
+            path_list = [os.path.join(path_list, get_file_name(url)) for url in url_list]
+        checksums = checksums or [None] * len(url_list)
+        self.stop.clear()
+
+        # skip files that exist already
+        result_list, file_list = [], []
+        for url, path, checksum in zip(url_list, path_list, checksums):
+            if not overwrite and os.path.exists(path):
+                result_list.append({"path": path, "status": "skipped", "bytes": os.path.getsize(path)})
+            else:
+                file_list.append(_File(url, path, checksum))
+        print("download {} files, skip {} files".format(len(file_list), len(result_list)))
+
+        # ...
+        time_start = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+
+                # resolve redirects, size and validators of all files, resume where possible
+                future_dict = {executor.submit(self._open, file): file for file in file_list}
+                for future in as_completed(future_dict):
+                    self._catch(future, future_dict[future])
+
+                # fetch all remaining segments, then verify each file as soon as it is complete
+                remaining = collections.Counter()
+                future_dict, close_dict = {}, {}
+                for file in file_list:
+                    if file.error is None:
+                        for i in range(len(file.segments)):
+                            future_dict[executor.submit(self._fetch, file, i)] = file
+                            remaining[id(file)] += 1
+                        if not remaining[id(file)]:
+                            close_dict[executor.submit(self._close, file)] = file
+                for future in as_completed(future_dict):
+                    file = future_dict[future]
+                    self._catch(future, file)
+                    remaining[id(file)] -= 1
+                    if not remaining[id(file)]:
+                        close_dict[executor.submit(self._close, file)] = file
+                for future in as_completed(close_dict):
+                    self._catch(future, close_dict[future])
+
+            # stop all threads, keep partial files and resume state
+            except BaseException:
+                self.stop.set()
+                executor.shutdown(wait=True, cancel_futures=True)
+                for file in file_list:
+                    self._save_state(file, force=True)
+                    if file.fd is not None:
+                        os.close(file.fd)
+                        file.fd = None
+                raise
+            finally:
+                self.pool.close()
+
+        # ...
+        for file in file_list:
+            status = "failed" if file.error is not None else "done"
+            result = {"path": file.path, "status": status, "bytes": file.size, "seconds": time.time() - file.time_start}
+            if file.error is not None:
+                result["error"] = file.error
+            result_list.append(result)
+            print("{} {}".format(status, file.path))
+
+        # throughput summary
+        runtime = max(time.time() - time_start, 1e-9)
+        summary = pd.DataFrame(result_list)
+        is_done = summary["status"] == "done" if len(summary) else pd.Series([], dtype=bool)
+        megabytes = summary.loc[is_done, "bytes"].sum() / 1024**2 if is_done.any() else 0
+        print("downloaded {} files ({} skipped, {} failed) in {:.1f} seconds, {:.1f} MB/s".format(
+            is_done.sum(), (summary["status"] == "skipped").sum() if len(summary) else 0,
+            (summary["status"] == "failed").sum() if len(summary) else 0, runtime, megabytes / runtime,
+        ))
+
+        return summary
+
+    def _catch(self, future, file:_File):
+        """
+        Record the error of a failed task (the first one per file).
+        """
+
+        # ...
+        exception = future.exception()
+        if exception is not None and file.error is None:
+            file.error = repr(exception)
+
+    def _open(self, file:_File):
+        """
+        Resolve size, validators and support for byte ranges of a file with a
+        single request for its first byte, then open the partial file and
+        restore the progress of a previous run if the content is unchanged.
+        """
+
+        # request first byte, follow redirects (e.g. pre-signed URLs)
+        for _ in range(MAX_REDIRECTS + 1):
+            with self._request("GET", file.url, headers={"Range": "bytes=0-0"}) as response:
+                if response.status in (301, 302, 303, 307, 308):
+                    file.url = urllib.parse.urljoin(file.url, response.getheader("Location"))
+                    response.read()
+                    continue
+                _check_status(response, file.url)
+                file.etag = response.getheader("ETag")
+                file.last_modified = response.getheader("Last-Modified")
+                content_range = response.getheader("Content-Range") or ""
+                if response.status == 206 and re.fullmatch(r"bytes 0-0/\d+", content_range):
+                    file.ranges = True
+                    file.size = int(content_range.split("/")[1])
+                    response.read()
+                elif response.getheader("Content-Length") is not None:
+                    file.size = int(response.getheader("Content-Length")) # body is not read, connection is closed
+                break
+        else:
+            raise IOError("(ERROR) too many redirects, you provided value {}".format(file.url))
+
+        # segments, the entire file if byte ranges are not supported (or the size is unknown)
+        if file.ranges:
+            file.segments = [(start, min(start + self.segment_size, file.size) - 1) for start in range(0, file.size, self.segment_size)]
+        else:
+            file.segments = [(0, file.size - 1 if file.size is not None else None)]
+        file.done = [0] * len(file.segments)
+
+        # restore progress if the content of the file is unchanged
+        path_part = file.path + ".part"
+        state = _read_json(path_part + ".json")
+        if file.ranges and state is not None and os.path.exists(path_part) and \
+            [state.get(key) for key in ("size", "etag", "last_modified", "segments")] == \
+            [file.size, file.etag, file.last_modified, [list(segment) for segment in file.segments]]:
+            file.done = state["done"]
+        os.makedirs(os.path.dirname(os.path.abspath(file.path)), exist_ok=True)
+        file.fd = os.open(path_part, os.O_RDWR | os.O_CREAT)
+        if not any(file.done):
+            os.ftruncate(file.fd, file.size or 0)
+        self._save_state(file, force=True)
+
+    def _fetch(self, file:_File, i:int):
+        """
+        Fetch a segment of a file, continue from the bytes done after a
+        connection failure. Each block is written to its offset right away.
+        """
+
+        # ...
+        start, end = file.segments[i]
+        for attempt in range(self.retries + 1):
+            if self.stop.is_set() or file.error is not None:
+                return
+            offset = start + file.done[i]
+            if end is not None and offset > end:
+                return
+
+            # without byte ranges, start over
+            if not file.ranges:
+                offset, file.done[i] = 0, 0
+            headers = {}
+            if file.ranges:
+                headers["Range"] = "bytes={}-{}".format(offset, end)
+                if file.etag is not None or file.last_modified is not None:
+                    headers["If-Range"] = file.etag or file.last_modified
+            try:
+                with self._request("GET", file.url, headers=headers) as response:
+                    _check_status(response, file.url)
+                    if file.ranges and response.status != 206:
+                        raise IOError("(ERROR) content changed during download, you provided value {}".format(file.url))
+                    while not self.stop.is_set():
+                        data = response.read(self.block_size if end is None else min(self.block_size, end - offset + 1))
+                        if not data:
+                            break
+                        os.pwrite(file.fd, data, offset)
+                        offset += len(data)
+                        file.done[i] += len(data)
+                        self._save_state(file)
+                    if end is not None and offset <= end and not self.stop.is_set():
+                        raise http.client.IncompleteRead(b"", end - offset + 1)
+                    return
+            except IOError as exception:
+                if str(exception).startswith("(ERROR)") or attempt == self.retries:
+                    raise
+            except RETRY_ERRORS:
+                if attempt == self.retries:
+                    raise
+            time.sleep(BACKOFF * 2**attempt)
+
+    def _close(self, file:_File):
+        """
+        Verify a complete file by size and checksum, then rename it to its
+        final path and remove the resume state. Files that fail verification
+        are removed, such that the next run starts over.
+        """
+
+        # keep partial file and resume state of failed files
+        path_part = file.path + ".part"
+        if file.fd is not None:
+            self._save_state(file, force=True)
+            try:
+                os.fsync(file.fd)
+            finally:
+                os.close(file.fd)
+                file.fd = None
+        if file.error is not None or self.stop.is_set():
+            return
+        size = os.path.getsize(path_part)
+        if file.size is None:
+            file.size = size
+
+        # ...
+        error = None
+        if size != file.size:
+            error = "(ERROR) size mismatch, expected {} bytes, received {} bytes".format(file.size, size)
+        elif file.checksum is not None:
+            algorithm, digest = parse_checksum(file.checksum)
+            actual = hash_file(path_part, algorithm=algorithm)
+            if actual != digest:
+                error = "(ERROR) checksum mismatch, expected {}:{}, received {}:{}".format(algorithm, digest, algorithm, actual)
+        if error is not None:
+            file.error = error
+            for path in (path_part, path_part + ".json"):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+
+        # ...
+        os.replace(path_part, file.path)
+        if os.path.exists(path_part + ".json"):
+            os.remove(path_part + ".json")
+
+    def _save_state(self, file:_File, force=False):
+        """
+        Store the progress of a file, at most every STATE_INTERVAL seconds unless forced.
+        """
+
+        # ...
+        if file.fd is None or not file.ranges or (not force and time.time() - file.state_time < STATE_INTERVAL):
+            return
+        with file.lock:
+            file.state_time = time.time()
+            _write_json(file.path + ".part.json", file.get_state())
+
+    @contextlib.contextmanager
+    def _request(self, method:str, url:str, headers=None):
+        """
+        Send a request with default headers, retry if the connection fails before a response arrives.
+        """
+
+        # ...
+        headers = {**self.headers, **(headers or {})}
+        with contextlib.ExitStack() as stack:
+            for attempt in range(self.retries + 1):
+                try:
+                    response = stack.enter_context(self.pool.request(method, url, headers=headers))
+                    break
+                except RETRY_ERRORS:
+                    if attempt == self.retries or self.stop.is_set():
+                        raise
+                    time.sleep(BACKOFF * 2**attempt)
+            yield response
+
+class _HttpStream(io.RawIOBase):
+    """
+    Read-only stream of an http(s) URL. If the connection fails, the stream
+    continues from the current position with a byte-range request.
+    """
+
+    def __init__(self, downloader:Downloader, url:str):
+        self.downloader = downloader
+        self.url = url
+        self.position = 0
+        self.context = None
+        self.response = None
+        self.validator = None
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        for attempt in range(self.downloader.retries + 1):
+            try:
+                if self.response is None:
+                    self._connect()
+                size = self.response.readinto(buffer)
+                if size or not self.response.length:
+                    self.position += size
+                    return size
+                raise http.client.IncompleteRead(b"")
+            except RETRY_ERRORS:
+                self._disconnect()
+                if attempt == self.downloader.retries:
+                    raise
+                time.sleep(BACKOFF * 2**attempt)
+
+    def close(self):
+        self._disconnect()
+        super().close()
+
+    def _connect(self):
+        headers = {}
+        if self.position:
+            headers["Range"] = "bytes={}-".format(self.position)
+            if self.validator is not None:
+                headers["If-Range"] = self.validator
+        self.context = self.downloader._request("GET", self.url, headers=headers)
+        self.response = self.context.__enter__()
+        if self.response.status in (301, 302, 303, 307, 308):
+            self.url = urllib.parse.urljoin(self.url, self.response.getheader("Location"))
+            self._disconnect()
+            return self._connect()
+        _check_status(self.response, self.url)
+        if self.position and self.response.status != 206:
+            raise IOError("(ERROR) cannot resume stream, you provided value {}".format(self.url))
+        self.validator = self.response.getheader("ETag") or self.response.getheader("Last-Modified")
+
+    def _disconnect(self):
+        if self.context is not None:
+            context, self.context, self.response = self.context, None, None
+            with contextlib.suppress(Exception):
+                context.__exit__(None, None, None)
+
+def open_url(url:str, downloader=None, decompress=True):
+    """
+    Open an http(s) URL as a binary stream, e.g. to pass TRTH raw legacy data
+    straight into the parser without storing it (see `streamwise_reconstruct_book`).
+    Dropped connections are resumed with byte-range requests.
+
+    :param url:
+        str, http(s) URL
+    :param downloader:
+        Downloader, whose connections and settings to use, default is None (new one)
+    :param decompress:
+        bool, whether to decompress .gz (.zst) files, by extension, default is True
+    :return file:
+        file-like object, binary
+    """
+
+    # ...
+    stream = io.BufferedReader(_HttpStream(downloader or Downloader(), url), buffer_size=BLOCK_SIZE)
+    name = get_file_name(url)
+    if decompress and name.endswith(".gz"):
+        return gzip.GzipFile(fileobj=stream, mode="rb")
+
+    # we do not know whether zstandard is installed on system
+    if decompress and name.endswith(".zst"):
+        import zstandard
+        return zstandard.ZstdDecompressor().stream_reader(stream, closefd=True)
+
+    return stream
+
+def is_url(path:str):
+    """
+    Check whether a path is an http(s) URL.
+    """
+
+    # ...
+    return isinstance(path, str) and path.startswith(("http://", "https://"))
+
+def get_file_name(url:str):
+    """
+    Get the file name of a URL, i.e. the last part of its path.
+    """
+
+    # ...
+    return os.path.basename(urllib.parse.unquote(urllib.parse.urlsplit(url).path))
+
+def parse_checksum(checksum:str):
+    """
+    Parse a checksum, i.e. a hex digest, optionally prefixed by algorithm
+    (e.g. "md5:..."), otherwise the algorithm is derived from its length.
+
+    :param checksum:
+        str, checksum
+    :return algorithm, digest:
+        str, str
+    """
+
+    # ...
+    algorithm, _, digest = checksum.rpartition(":")
+    digest = digest.strip().lower()
+    algorithm = algorithm.lower() or CHECKSUM_ALGORITHMS.get(len(digest))
+    assert algorithm in hashlib.algorithms_available, \
+        "(ERROR) checksum algorithm is unknown, you provided value {value}".format(
+            value=checksum,
+        )
+
+    return algorithm, digest
+
+def _check_status(response, url:str):
+    """
+    Raise on error responses, i.e. status 4xx or 5xx.
+    """
+
+    # ...
+    if response.status >= 400:
+        response.read()
+        error = IOError if response.status < 500 else ConnectionError
+        raise error("(ERROR) status {} {}, you provided value {}".format(response.status, response.reason, url) if response.status < 500
+            else "status {} {}".format(response.status, response.reason)
+        )
+
+def _read_json(path:str):
+    """
+    Read a json file, None if it does not exist or is invalid.
+    """
+
+    # ...
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path:str, content:dict):
+    """
+    Write a json file atomically, i.e. write to a temporary file first, then rename.
+    """
+
+    # ...
+    with open(path + ".tmp", "w") as file:
+        json.dump(content, file)
+    os.replace(path + ".tmp", path)
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("downloader")
+    parser.add_argument("--urls", type=str, help="comma-separated URLs, or a .txt file with one URL (and optionally a checksum) per line", default=None)
+    parser.add_argument("--directory", type=str, help="target directory", default=".")
+    parser.add_argument("--workers", type=int, help="number of threads, i.e. segments at the same time", default=WORKERS)
+    parser.add_argument("--max_per_host", type=int, help="number of connections per host at the same time", default=MAX_PER_HOST)
+    parser.add_argument("--segment_size", type=str, help="bytes per byte-range segment, e.g. 64e6", default=str(SEGMENT_SIZE))
+    parser.add_argument("--overwrite", action="store_true", help="download files that exist already")
+
+    # parse args
+    args = parser.parse_args()
+    if args.urls.endswith(".txt"):
+        with open(args.urls) as file:
+            line_list = [line.split() for line in file if line.strip() and not line.startswith("#")]
+        url_list = [line[0] for line in line_list]
+        checksums = [line[1] if len(line) > 1 else None for line in line_list]
+    else:
+        url_list = args.urls.split(",")
+        checksums = None
+
+    # ...
+    downloader = Downloader(workers=args.workers, max_per_host=args.max_per_host, segment_size=int(float(args.segment_size)))
+    downloader.download_many(url_list, args.directory, checksums=checksums, overwrite=args.overwrite)
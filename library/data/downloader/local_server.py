@@ -0,0 +1,224 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import argparse
+import email.utils
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import re
+import sys
+import threading
+import time
+
+# settings
+BLOCK_SIZE = 2**16 # bytes per write
+
+class LocalServer:
+
+    def __init__(self, directory:str, host="127.0.0.1", port=0, ranges=True, fail_after=None, failures=1, latency=0):
+        """
+        Serve the files of a directory via HTTP/1.1 on the local machine, as
+        test double for the servers of tick history extracts, e.g. to test
+        `Downloader` without network access. Supports HEAD, GET, single byte
+        ranges (206), If-Range, ETag and Last-Modified, keep-alive, and can
+        inject failures, i.e. drop connections in the middle of a response.
+
+        Use as context manager, e.g. `with LocalServer(directory) as server:`,
+        files are available at `server.url + "/" + name`.
+
+        :param directory:
+            str, path to directory
+        :param host:
+            str, address to bind, default is "127.0.0.1"
+        :param port:
+            int, port to bind, default is 0 (any free port)
+        :param ranges:
+            bool, whether to support byte ranges, default is True
+        :param fail_after:
+            int, drop the connection after this number of bytes of a response body, default is None (never)
+        :param failures:
+            int, number of responses to fail (see fail_after), default is 1
+        :param latency:
+            float, seconds to wait before each response, default is 0
+        """
+
+        # ...
+        self.directory = directory
+        self.ranges = ranges
+        self.fail_after = fail_after
+        self.failures = failures
+        self.latency = latency
+
+        # statistics, e.g. to check the number of concurrent connections per host
+        self.lock = threading.Lock()
+        self.request_list = []
+        self.connections = 0
+        self.peak_connections = 0
+
+        # ...
+        self.server = ThreadingHTTPServer((host, port), self._get_handler())
+        self.server.daemon_threads = True
+        self.server.handle_error = self._handle_error
+        self.url = "http://{}:{}".format(*self.server.server_address[:2])
+        self.thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Start serving in a background thread.
+        """
+
+        # ...
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop serving, close the socket.
+        """
+
+        # ...
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _handle_error(self, request, client_address):
+        """
+        Ignore connections closed by the client, e.g. after reading the first byte only.
+        """
+
+        # ...
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            ThreadingHTTPServer.handle_error(self.server, request, client_address)
+
+    def _get_handler(self):
+        """
+        Get request handler class bound to this server.
+        """
+
+        # ...
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive
+            disable_nagle_algorithm = True # headers and body are written separately
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.connections += 1
+                    server.peak_connections = max(server.peak_connections, server.connections)
+
+            def finish(self):
+                with server.lock:
+                    server.connections -= 1
+                super().finish()
+
+            def log_message(self, *args):
+                pass
+
+            def do_HEAD(self):
+                self._respond(body=False)
+
+            def do_GET(self):
+                self._respond(body=True)
+
+            def _respond(self, body:bool):
+                with server.lock:
+                    server.request_list.append((self.command, self.path, self.headers.get("Range")))
+                time.sleep(server.latency)
+
+                # ...
+                path = os.path.join(server.directory, os.path.basename(self.path.split("?")[0]))
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                stat = os.stat(path)
+                size = stat.st_size
+                etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, size)
+                last_modified = email.utils.formatdate(stat.st_mtime, usegmt=True)
+
+                # single byte range, ignored if If-Range does not match
+                start, end, status = 0, size - 1, 200
+                match = re.fullmatch(r"bytes=(\d*)-(\d*)", self.headers.get("Range") or "")
+                if_range = self.headers.get("If-Range")
+                if server.ranges and match and (if_range is None or if_range in (etag, last_modified)):
+                    if match.group(1):
+                        start = int(match.group(1))
+                        end = min(int(match.group(2)), size - 1) if match.group(2) else size - 1
+                    else:
+                        start = max(size - int(match.group(2)), 0)
+                    if start >= size or start > end:
+                        self.send_response(416)
+                        self.send_header("Content-Range", "bytes */{}".format(size))
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    status = 206
+
+                # ...
+                self.send_response(status)
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("ETag", etag)
+                self.send_header("Last-Modified", last_modified)
+                if server.ranges:
+                    self.send_header("Accept-Ranges", "bytes")
+                if status == 206:
+                    self.send_header("Content-Range", "bytes {}-{}/{}".format(start, end, size))
+                self.end_headers()
+                if not body:
+                    return
+
+                # drop connection after fail_after bytes, as long as failures are left
+                with server.lock:
+                    limit = None
+                    if server.fail_after is not None and server.failures > 0:
+                        server.failures -= 1
+                        limit = server.fail_after
+                with open(path, "rb") as file:
+                    file.seek(start)
+                    remaining = end - start + 1
+                    while remaining > 0:
+                        if limit is not None and limit <= 0:
+                            self.close_connection = True
+                            self.wfile.flush()
+                            self.connection.shutdown(2)
+                            return
+                        data = file.read(min(BLOCK_SIZE, remaining, limit if limit is not None else BLOCK_SIZE))
+                        self.wfile.write(data)
+                        remaining -= len(data)
+                        if limit is not None:
+                            limit -= len(data)
+
+        return Handler
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("local_server")
+    parser.add_argument("--directory", type=str, help="directory to serve", default=".")
+    parser.add_argument("--port", type=int, help="port to bind", default=8000)
+    parser.add_argument("--no_ranges", action="store_true", help="do not support byte ranges")
+    parser.add_argument("--fail_after", type=int, help="drop connections after this number of bytes", default=None)
+    parser.add_argument("--failures", type=int, help="number of responses to fail", default=1)
+
+    # parse args
+    args = parser.parse_args()
+
+    # serve until interrupted
+    with LocalServer(args.directory, port=args.port, ranges=not args.no_ranges, fail_after=args.fail_after, failures=args.failures) as server:
+        print("serving {} at {}".format(args.directory, server.url))
+        try:
+            server.thread.join()
+        except KeyboardInterrupt:
+            pass
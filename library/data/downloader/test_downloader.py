@@ -0,0 +1,98 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import os
+import pytest
+
+# library imports
+from library.data.downloader.downloader import Downloader
+from library.data.downloader.local_server import LocalServer
+from library.utility.hashing.hashing import hash_file
+
+# settings
+SIZE = 2**21 + 12345 # bytes, not a multiple of the segment size
+SEGMENT_SIZE = 2**19
+FAIL_AFTER = 100_000 # bytes per response before the connection is dropped
+
+# FIXTURES . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.fixture
+def directory(tmp_path):
+    """
+    Directory with a file of random bytes, served by `LocalServer`.
+    """
+
+    # ...
+    directory = os.path.join(tmp_path, "server")
+    os.makedirs(directory)
+    with open(os.path.join(directory, "raw.csv.gz"), "wb") as file:
+        file.write(os.urandom(SIZE))
+
+    return directory
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_resume_after_dropped_connection(directory, tmp_path):
+    """
+    A connection dropped in the middle of a segment is retried from the bytes done, the file is byte-identical.
+    """
+
+    # ...
+    path = os.path.join(tmp_path, "raw.csv.gz")
+    with LocalServer(directory, fail_after=FAIL_AFTER, failures=3) as server:
+        result = Downloader(segment_size=SEGMENT_SIZE).download(server.url + "/raw.csv.gz", path)
+
+    assert result["status"] == "done"
+    assert hash_file(path) == hash_file(os.path.join(directory, "raw.csv.gz"))
+    assert not os.path.exists(path + ".part") and not os.path.exists(path + ".part.json")
+
+def test_resume_interrupted_download(directory, tmp_path):
+    """
+    A download that fails resumes in the next run from the bytes done, the file is byte-identical.
+    """
+
+    # ...
+    path = os.path.join(tmp_path, "raw.csv.gz")
+    with LocalServer(directory, fail_after=FAIL_AFTER, failures=2) as server:
+        url = server.url + "/raw.csv.gz"
+
+        # first run, no retries, i.e. the dropped connection fails the download, partial file and state are kept
+        summary = Downloader(workers=1, segment_size=SEGMENT_SIZE, retries=0).download_many([url], [path])
+        assert summary["status"].tolist() == ["failed"]
+        assert os.path.exists(path + ".part") and os.path.exists(path + ".part.json")
+
+        # second run, continues the failed segment where it stopped rather than from its start
+        num_requests = len(server.request_list)
+        result = Downloader(workers=1, segment_size=SEGMENT_SIZE, retries=0).download(url, path)
+        range_list = [item[2] for item in server.request_list[num_requests:]]
+
+    assert result["status"] == "done"
+    assert hash_file(path) == hash_file(os.path.join(directory, "raw.csv.gz"))
+    assert "bytes={}-{}".format(FAIL_AFTER, SEGMENT_SIZE - 1) in range_list
+    assert "bytes=0-{}".format(SEGMENT_SIZE - 1) not in range_list
+
+def test_checksum(directory, tmp_path):
+    """
+    A matching checksum passes, a checksum mismatch is an error and removes the partial file.
+    """
+
+    # ...
+    path = os.path.join(tmp_path, "raw.csv.gz")
+    digest = hash_file(os.path.join(directory, "raw.csv.gz"))
+    with LocalServer(directory) as server:
+        url = server.url + "/raw.csv.gz"
+
+        # mismatch
+        with pytest.raises(IOError, match="checksum mismatch"):
+            Downloader(segment_size=SEGMENT_SIZE).download(url, path, checksum="sha256:" + "0" * 64)
+        assert not os.path.exists(path) and not os.path.exists(path + ".part") and not os.path.exists(path + ".part.json")
+
+        # match, with and without algorithm prefix
+        Downloader(segment_size=SEGMENT_SIZE).download(url, path, checksum="sha256:" + digest)
+        Downloader(segment_size=SEGMENT_SIZE).download(url, path, checksum=digest, overwrite=True)
+
+    assert hash_file(path) == digest
@@ -0,0 +1,208 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: support features across snapshots, e.g. order flow imbalance (OFI), which require the previous row per '#RIC'
+
+# general imports
+import argparse
+import numpy as np
+import pandas as pd
+
+# settings
+FEATURES = ("mid", "spread", "microprice", "imbalance", "depth", "vwap")
+VWAP_SIZES = (1_000, 10_000) # quantities for VWAP-to-depth, in shares
+BLOCK_SIZE = 65_536 # number of rows per block, such that all arrays of a block fit into the cpu cache
+MAX_DEPTH = 10
+BOOK_FIELDS = ("BidPrice", "BidSize", "AskPrice", "AskSize")
+
+def compute_book_features(columns, features=FEATURES, vwap_sizes=VWAP_SIZES, block_size=BLOCK_SIZE):
+    """
+    Compute order book features from TRTH normalized book data, block by
+    block of rows: per block, the 'Lk-BidPrice', 'Lk-BidSize', 'Lk-AskPrice'
+    and 'Lk-AskSize' columns are stacked into 2-D arrays (rows x levels) once,
+    all features are computed from these arrays and written into preallocated
+    output arrays, i.e. there are no intermediate DataFrames.
+
+    Levels that are missing (price 0, as in the output of `reconstruct_book`,
+    or NaN) have no size and no price. Features that are not defined, e.g.
+    the spread of a one-sided book, are NaN.
+
+    feature       columns                          definition
+    ----------    -----------------------------    ---------------------------------------------------
+    mid           'Mid'                            (L1-BidPrice + L1-AskPrice) / 2
+    spread        'Spread'                         L1-AskPrice - L1-BidPrice
+    microprice    'Microprice'                     size-weighted mid, i.e. closer to the thinner side
+    imbalance     'Lk-Imbalance'                   (Lk-BidSize - Lk-AskSize) / (Lk-BidSize + Lk-AskSize)
+    depth         'Lk-BidDepth', 'Lk-AskDepth'     cumulative size of levels 1 to k
+    vwap          'BidVWAP-X', 'AskVWAP-X'         average price to sell (buy) X shares, NaN if depth < X
+
+    :param columns:
+        pd.DataFrame or dict, TRTH normalized book data, regular or compact layout (see `compact_book`),
+        or a dict of arrays with the same column names
+    :param features:
+        list, features to compute, default is FEATURES (all)
+    :param vwap_sizes:
+        list, quantities X for feature "vwap", default is VWAP_SIZES
+    :param block_size:
+        int, number of rows per block, default is BLOCK_SIZE
+    :return features:
+        dict, feature columns mapped to np.ndarray, e.g. to be passed on to `pd.DataFrame(features, index=...)`
+    """
+
+    # ...
+    assert all(feature in FEATURES for feature in features), \
+        "(ERROR) features must be in {features}, you provided value {value}".format(
+            features=FEATURES,
+            value=features,
+        )
+
+    # levels 1 to depth that include all required fields
+    fields = ["BidPrice", "AskPrice"] if set(features) <= {"mid", "spread"} else BOOK_FIELDS
+    depth = 0
+    while depth < MAX_DEPTH and all("L{}-{}".format(depth + 1, field) in columns for field in fields):
+        depth += 1
+    assert depth > 0, \
+        "(ERROR) book data must include the columns {columns}".format(
+            columns=["L1-{}".format(field) for field in fields],
+        )
+
+    # access each column as array once, prices are scaled per row in compact layout
+    arrays = {field: [np.asarray(columns["L{}-{}".format(k, field)]) for k in range(1, depth + 1)] for field in fields}
+    scale = np.asarray(10.0 ** np.asarray(columns["Price Decimals"])) if "Price Decimals" in columns else None
+    num_rows = len(arrays["BidPrice"][0])
+
+    # preallocate output arrays, block by block
+    output = None
+    for start in range(0, max(num_rows, 1), block_size):
+        end = min(start + block_size, num_rows)
+
+        # stack levels into 2-D arrays (rows x levels)
+        book = {field: np.stack([array[start:end] for array in array_list], axis=1).astype(float)
+            for field, array_list in arrays.items()
+        }
+        if scale is not None:
+            book["BidPrice"] /= scale[start:end, None]
+            book["AskPrice"] /= scale[start:end, None]
+
+        # ...
+        result = _compute_block(book, features=features, vwap_sizes=vwap_sizes)
+        if output is None:
+            output = {col: np.empty(num_rows, dtype=values.dtype) for col, values in result.items()}
+        for col, values in result.items():
+            output[col][start:end] = values
+
+    return output
+
+def _compute_block(book:dict, features=FEATURES, vwap_sizes=VWAP_SIZES):
+    """
+    Compute order book features for a block of rows, see `compute_book_features`.
+
+    :param book:
+        dict, 'BidPrice', 'BidSize', 'AskPrice', 'AskSize' mapped to float arrays (rows x levels)
+    :param features:
+        list, features to compute
+    :param vwap_sizes:
+        list, quantities X for feature "vwap"
+    :return features:
+        dict, feature columns mapped to np.ndarray (rows)
+    """
+
+    # missing levels have price NaN and size 0
+    bid_price = np.where(book["BidPrice"] != 0, book["BidPrice"], np.nan)
+    ask_price = np.where(book["AskPrice"] != 0, book["AskPrice"], np.nan)
+    if "BidSize" in book:
+        bid_size = np.where(np.isnan(bid_price), 0, np.nan_to_num(book["BidSize"]))
+        ask_size = np.where(np.isnan(ask_price), 0, np.nan_to_num(book["AskSize"]))
+    depth = bid_price.shape[1]
+
+    # 0 / 0 is NaN, e.g. imbalance of a missing level
+    output = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+
+        # BEST BID AND ASK . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        if "mid" in features:
+            output["Mid"] = (bid_price[:, 0] + ask_price[:, 0]) / 2
+        if "spread" in features:
+            output["Spread"] = ask_price[:, 0] - bid_price[:, 0]
+        if "microprice" in features:
+            output["Microprice"] = (bid_price[:, 0] * ask_size[:, 0] + ask_price[:, 0] * bid_size[:, 0]) \
+                / (bid_size[:, 0] + ask_size[:, 0])
+
+        # PER LEVEL . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        if "imbalance" in features:
+            imbalance = (bid_size - ask_size) / (bid_size + ask_size)
+            for k in range(depth):
+                output["L{}-Imbalance".format(k + 1)] = imbalance[:, k]
+        if "depth" in features or "vwap" in features:
+            bid_depth = np.cumsum(bid_size, axis=1)
+            ask_depth = np.cumsum(ask_size, axis=1)
+        if "depth" in features:
+            for k in range(depth):
+                output["L{}-BidDepth".format(k + 1)] = bid_depth[:, k].astype(np.int64)
+                output["L{}-AskDepth".format(k + 1)] = ask_depth[:, k].astype(np.int64)
+
+        # VWAP-TO-DEPTH . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        if "vwap" in features:
+            for size in vwap_sizes:
+                output["BidVWAP-{}".format(size)] = _get_vwap(bid_price, bid_size, bid_depth, size)
+                output["AskVWAP-{}".format(size)] = _get_vwap(ask_price, ask_size, ask_depth, size)
+
+    return output
+
+def _get_vwap(price:np.ndarray, size:np.ndarray, depth:np.ndarray, quantity:float):
+    """
+    Compute the volume-weighted average price of executing a given quantity
+    against one side of the book, walking the levels from best to worst.
+
+    price     size    depth      quantity 250: filled
+    ------    ----    -----      --------------------
+    10.00     100     100        100
+    10.01     100     200        100
+    10.02     100     300        50    ->   vwap = (1000 + 1001 + 501) / 250 = 10.008
+
+    :param price:
+        np.ndarray, prices (rows x levels), NaN if missing
+    :param size:
+        np.ndarray, sizes (rows x levels), 0 if missing
+    :param depth:
+        np.ndarray, cumulative sizes (rows x levels)
+    :param quantity:
+        float, quantity to execute
+    :return vwap:
+        np.ndarray, average price per row, NaN if the depth of all levels is smaller than quantity
+    """
+
+    # quantity filled at each level, i.e. what remains after the previous levels, at most the level size
+    filled = np.clip(quantity - (depth - size), 0, size)
+    notional = np.where(filled > 0, filled * price, 0).sum(axis=1)
+    vwap = notional / quantity
+    vwap[depth[:, -1] < quantity] = np.nan
+
+    return vwap
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("compute_book_features")
+    parser.add_argument("--path", type=str, help="TRTH normalized book data, as .csv(.gz)", default=None)
+    parser.add_argument("--path_out", type=str, help="book data with features, as .csv(.gz)", default=None)
+    parser.add_argument("--features", type=str, help="comma-separated features, e.g. mid,spread,vwap", default=",".join(FEATURES))
+    parser.add_argument("--vwap_sizes", type=str, help="comma-separated quantities for feature vwap, e.g. 1000,10000", default=None)
+
+    # parse args
+    args = parser.parse_args()
+    vwap_sizes = [int(float(size)) for size in args.vwap_sizes.split(",")] if args.vwap_sizes is not None else VWAP_SIZES
+
+    # ...
+    full = pd.read_csv(args.path)
+    features = compute_book_features(full, features=args.features.split(","), vwap_sizes=vwap_sizes)
+    full = pd.concat([full, pd.DataFrame(features, index=full.index)], axis=1)
+    full.to_csv(args.path_out, index=False)
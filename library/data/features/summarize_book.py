@@ -0,0 +1,147 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import argparse
+import numpy as np
+import os
+import pandas as pd
+import sys
+
+# make library importable if run as script, e.g. `python library/data/features/summarize_book.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.data.features.compute_book_features import compute_book_features
+from library.utility.compression.compression import open_compressed
+
+# settings
+SUMMARY_COLUMNS = ("#RIC", "Date", "Updates", "Rows", "Missing TIMACT_MS", "Duplicates", "Duplicate Rate",
+    "First Date-Time", "Last Date-Time", "Spread Min", "Spread Max", "Spread Mean", "Mid Min", "Mid Max", "Mid Mean",
+    "Crossed Share", "Locked Share",
+)
+
+def summarize_book(full:pd.DataFrame, counts=None):
+    """
+    Summarize TRTH normalized book data per ('#RIC', calendar date), e.g. for
+    data-quality checks and universe screening without reading the book.
+    Dates are calendar dates of 'Date-Time' (UTC), as partitions of
+    `chunkwise_reconstruct_book`.
+
+    column                 definition
+    -------------------    ------------------------------------------------------------
+    Updates                number of UPDATE STATEs in the raw data (requires counts)
+    Rows                   number of rows in the book
+    Missing TIMACT_MS      number of UPDATE STATEs removed as TIMACT_MS is missing (requires counts)
+    Duplicates             number of UPDATE STATEs removed as duplicate book state (requires counts)
+    Duplicate Rate         Duplicates / (Updates - Missing TIMACT_MS)
+    First/Last Date-Time   first and last 'Date-Time' in the book
+    Spread Min/Max/Mean    L1-AskPrice - L1-BidPrice, two-sided rows only
+    Mid Min/Max/Mean       (L1-BidPrice + L1-AskPrice) / 2, two-sided rows only
+    Crossed Share          share of rows with L1-BidPrice > L1-AskPrice
+    Locked Share           share of rows with L1-BidPrice == L1-AskPrice
+
+    :param full:
+        pd.DataFrame, TRTH normalized book data, regular or compact layout (see `compact_book`)
+    :param counts:
+        pd.DataFrame, columns '#RIC', 'Date', 'Updates' and 'Missing TIMACT_MS', as counted during
+        reconstruction (see `reconstruct_book`), default is None (these columns are NaN)
+    :return summary:
+        pd.DataFrame, one row per ('#RIC', date), in order of first appearance
+    """
+
+    # ...
+    datetime = pd.DatetimeIndex(full["Date-Time"])
+    datetime = datetime.tz_localize(None) if datetime.tz is not None else datetime
+    features = compute_book_features(full, features=["mid", "spread"])
+
+    # ...
+    stats = pd.DataFrame({
+        "#RIC": np.asarray(full["#RIC"]).astype(object),
+        "Date": datetime.normalize(),
+        "Date-Time": datetime,
+        "Spread": features["Spread"],
+        "Mid": features["Mid"],
+        "Crossed": features["Spread"] < 0,
+        "Locked": features["Spread"] == 0,
+    })
+    summary = stats.groupby(["#RIC", "Date"], sort=False).agg(**{
+        "Rows": ("Date-Time", "size"),
+        "First Date-Time": ("Date-Time", "min"),
+        "Last Date-Time": ("Date-Time", "max"),
+        "Spread Min": ("Spread", "min"),
+        "Spread Max": ("Spread", "max"),
+        "Spread Mean": ("Spread", "mean"),
+        "Mid Min": ("Mid", "min"),
+        "Mid Max": ("Mid", "max"),
+        "Mid Mean": ("Mid", "mean"),
+        "Crossed Share": ("Crossed", "mean"),
+        "Locked Share": ("Locked", "mean"),
+    })
+
+    # include partitions without rows, e.g. if TIMACT_MS is missing throughout
+    if counts is None:
+        counts = pd.DataFrame({"#RIC": [], "Date": pd.DatetimeIndex([]), "Updates": [], "Missing TIMACT_MS": []})
+    counts = counts.assign(**{"Date": pd.DatetimeIndex(counts["Date"])}).set_index(["#RIC", "Date"])
+    summary = counts[["Updates", "Missing TIMACT_MS"]].join(summary, how="outer", sort=False) \
+        if len(counts) else summary.assign(**{"Updates": np.nan, "Missing TIMACT_MS": np.nan})
+    summary["Rows"] = summary["Rows"].fillna(0).astype(int)
+
+    # duplicates are all UPDATE STATEs that are neither in the book nor removed for missing TIMACT_MS
+    summary["Duplicates"] = summary["Updates"] - summary["Missing TIMACT_MS"] - summary["Rows"]
+    summary["Duplicate Rate"] = summary["Duplicates"] / (summary["Updates"] - summary["Missing TIMACT_MS"]).replace(0, np.nan)
+
+    return summary.reset_index()[list(SUMMARY_COLUMNS)]
+
+def save_summary(summary:pd.DataFrame, path:str, compression=None): # as .csv(.gz/.zst)
+    """
+    Save summary, e.g. next to the reconstructed book (see `get_output_path`).
+
+    :param summary:
+        pd.DataFrame, summary as returned by `summarize_book`
+    :param path:
+        str, path to .csv(.gz/.zst) file
+    :param compression:
+        str, "gzip" or "zstd", default is None (gzip)
+    """
+
+    # ...
+    with open_compressed(path, "wb", compression=compression or "gzip") as file:
+        file.write(summary.to_csv(index=False).encode())
+
+def load_summary(path:str):
+    """
+    Load summary, e.g. to screen instruments and days before reading the book.
+
+    :param path:
+        str, path to .csv(.gz/.zst) file
+    :return summary:
+        pd.DataFrame, summary as returned by `summarize_book`
+    """
+
+    # ...
+    with open_compressed(path, "rb") as file:
+        summary = pd.read_csv(file, parse_dates=["Date", "First Date-Time", "Last Date-Time"])
+
+    return summary
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("summarize_book")
+    parser.add_argument("--path", type=str, help="summary, as .csv(.gz/.zst)", default=None)
+    parser.add_argument("--min_duplicate_rate", type=float, help="list only ('#RIC', date) with a duplicate rate above this", default=None)
+
+    # parse args
+    args = parser.parse_args()
+
+    # screen
+    summary = load_summary(args.path)
+    if args.min_duplicate_rate is not None:
+        summary = summary[summary["Duplicate Rate"] > args.min_duplicate_rate]
+    print(summary.to_string())
@@ -0,0 +1,88 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# library imports
+from library.data.features.compute_book_features import _get_vwap, compute_book_features
+from library.data.parser.parse_tickhistory_legacy_to_normalized import chunkwise_reconstruct_book, compact_book
+
+# HELPERS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def _assert_features_equal(result:dict, expected:dict):
+    """
+    Feature columns are the same and equal up to floating point precision, NaN where expected.
+    """
+
+    # ...
+    assert list(result) == list(expected)
+    for col in expected:
+        np.testing.assert_allclose(result[col], expected[col], rtol=1e-12, equal_nan=True, err_msg=col)
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_get_vwap():
+    """
+    Example of the docstring: executing 250 against levels of 100 each, NaN if the depth is too small.
+    """
+
+    # ...
+    price = np.array([[10.00, 10.01, 10.02]])
+    size = np.array([[100.0, 100.0, 100.0]])
+    depth = np.cumsum(size, axis=1)
+
+    np.testing.assert_allclose(_get_vwap(price, size, depth, 250), [10.008])
+    np.testing.assert_allclose(_get_vwap(price, size, depth, 100), [10.00])
+    assert np.isnan(_get_vwap(price, size, depth, 301)).all()
+
+def test_known_book():
+    """
+    Features of a two-level book, a one-sided book (NaN) and a book with a missing second level.
+    """
+
+    # ...
+    book = pd.DataFrame({
+        "L1-BidPrice": [9.99, 9.99, 10.00], "L1-BidSize": [300, 300, 100],
+        "L1-AskPrice": [10.01, 0.0, 10.02], "L1-AskSize": [100, 0, 100],
+        "L2-BidPrice": [9.98, 9.98, 0.0], "L2-BidSize": [200, 200, 0],
+        "L2-AskPrice": [10.02, 0.0, 10.03], "L2-AskSize": [100, 0, 300],
+    })
+    features = compute_book_features(book, vwap_sizes=(200,))
+
+    np.testing.assert_allclose(features["Mid"], [10.00, np.nan, 10.01], equal_nan=True)
+    np.testing.assert_allclose(features["Spread"], [0.02, np.nan, 0.02], equal_nan=True)
+    np.testing.assert_allclose(features["Microprice"][[0, 2]], [(9.99 * 100 + 10.01 * 300) / 400, 10.01])
+    np.testing.assert_allclose(features["L1-Imbalance"], [0.5, 1.0, 0.0])
+    np.testing.assert_allclose(features["L2-Imbalance"], [1 / 3, 1.0, -1.0])
+    np.testing.assert_array_equal(features["L2-BidDepth"], [500, 500, 100])
+    np.testing.assert_array_equal(features["L2-AskDepth"], [200, 0, 400])
+    np.testing.assert_allclose(features["BidVWAP-200"], [9.99, 9.99, np.nan], equal_nan=True)
+    np.testing.assert_allclose(features["AskVWAP-200"], [10.015, np.nan, 10.025], equal_nan=True)
+
+def test_compact_equals_regular(data, reference):
+    """
+    Features of the compact layout, compacted afterwards or within the engine, equal those of the regular layout.
+    """
+
+    # ...
+    expected = compute_book_features(reference)
+
+    _assert_features_equal(compute_book_features(compact_book(reference)), expected)
+    _assert_features_equal(compute_book_features(chunkwise_reconstruct_book(data, compact=True)), expected)
+
+@pytest.mark.parametrize("block_size", [1, 1_000])
+def test_block_size(reference, block_size):
+    """
+    Features do not depend on the number of rows per block, including a partial last block.
+    """
+
+    # ...
+    df = reference.iloc[:2_500]
+
+    _assert_features_equal(compute_book_features(df, block_size=block_size), compute_book_features(df))
@@ -0,0 +1,98 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import numpy as np
+import os
+import pandas as pd
+
+# library imports
+from library.data.features.summarize_book import SUMMARY_COLUMNS, load_summary, save_summary, summarize_book
+from library.data.parser.parse_tickhistory_legacy_to_normalized import chunkwise_reconstruct_book, compact_book
+
+# HELPERS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def _get_book():
+    """
+    Book of two '#RIC's with a locked, a crossed and a one-sided row, and counts of a further '#RIC' without rows.
+    """
+
+    # ...
+    full = pd.DataFrame({
+        "#RIC": ["A.DE", "A.DE", "A.DE", "B.DE", "A.DE", "B.DE"],
+        "Date-Time": pd.to_datetime([
+            "2021-01-04 08:00:00", "2021-01-04 09:00:00", "2021-01-04 10:00:00",
+            "2021-01-04 08:30:00", "2021-01-05 08:00:00", "2021-01-04 09:30:00",
+        ]).tz_localize("UTC"),
+        "L1-BidPrice": [10.00, 10.01, 10.03, 20.00, 10.00, 20.00],
+        "L1-AskPrice": [10.02, 10.01, 10.02, 20.10, 0.00, 20.20],
+    })
+    counts = pd.DataFrame({
+        "#RIC": ["A.DE", "B.DE", "A.DE", "C.DE"],
+        "Date": pd.to_datetime(["2021-01-04", "2021-01-04", "2021-01-05", "2021-01-04"]),
+        "Updates": [10, 4, 1, 3],
+        "Missing TIMACT_MS": [2, 2, 0, 3],
+    })
+
+    return full, counts
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_summarize_known_book():
+    """
+    Rows, duplicates, duplicate rate and spread statistics of a known book, per ('#RIC', date).
+    """
+
+    # ...
+    full, counts = _get_book()
+    summary = summarize_book(full, counts=counts).set_index(["#RIC", "Date"])
+
+    assert list(summary.reset_index().columns) == list(SUMMARY_COLUMNS)
+    a1, b1, a2, c1 = [summary.loc[(ric, pd.Timestamp(date))] for ric, date in
+        [("A.DE", "2021-01-04"), ("B.DE", "2021-01-04"), ("A.DE", "2021-01-05"), ("C.DE", "2021-01-04")]
+    ]
+
+    # duplicates are UPDATE STATEs neither in the book nor missing TIMACT_MS
+    assert (a1["Rows"], a1["Duplicates"], a1["Duplicate Rate"]) == (3, 5, 5 / 8)
+    assert (b1["Rows"], b1["Duplicates"], b1["Duplicate Rate"]) == (2, 0, 0)
+    assert (a2["Rows"], a2["Duplicates"], a2["Duplicate Rate"]) == (1, 0, 0)
+    assert c1["Rows"] == 0 and c1["Duplicates"] == 0 and np.isnan(c1["Duplicate Rate"])
+
+    # spread statistics of two-sided rows, shares of all rows
+    np.testing.assert_allclose([a1["Spread Min"], a1["Spread Max"], a1["Spread Mean"]], [-0.01, 0.02, 0.01 / 3])
+    np.testing.assert_allclose([a1["Crossed Share"], a1["Locked Share"]], [1 / 3, 1 / 3])
+    assert np.isnan(a2["Spread Mean"]) and np.isnan(a2["Mid Mean"])
+    assert a1["First Date-Time"] == pd.Timestamp("2021-01-04 08:00:00") and a1["Last Date-Time"] == pd.Timestamp("2021-01-04 10:00:00")
+
+def test_summarize_without_counts():
+    """
+    Without counts, 'Updates', 'Missing TIMACT_MS', 'Duplicates' and 'Duplicate Rate' are NaN.
+    """
+
+    # ...
+    full, _ = _get_book()
+    summary = summarize_book(full)
+
+    assert summary["Rows"].tolist() == [3, 2, 1]
+    assert summary[["Updates", "Missing TIMACT_MS", "Duplicates", "Duplicate Rate"]].isna().all().all()
+
+def test_summary_of_reconstruction(data, reference, tmp_path):
+    """
+    The summary counted during reconstruction accounts for all UPDATE STATEs, for both layouts, and saves losslessly.
+    """
+
+    # ...
+    full, summary = chunkwise_reconstruct_book(data, summary=True)
+    pd.testing.assert_frame_equal(full, reference)
+    assert summary["Updates"].sum() == data["Date-Time"].notna().sum()
+    assert summary["Rows"].sum() == len(reference) and (summary["Duplicates"] >= 0).all()
+    assert summary["Duplicate Rate"].between(0, 1).all()
+    pd.testing.assert_frame_equal(summarize_book(compact_book(reference), counts=summary), summary, check_exact=False)
+
+    # ...
+    path = os.path.join(tmp_path, "summary.csv.gz")
+    save_summary(summary, path)
+    pd.testing.assert_frame_equal(load_summary(path), summary, check_dtype=False)
@@ -0,0 +1,277 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# TODO: support trades and quotes (Market Price domain) in addition to the book
+
+# general imports
+import argparse
+import numpy as np
+import os
+import pandas as pd
+import sys
+
+# make library importable if run as script, e.g. `python library/data/generator/generate_tickhistory_legacy.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.data.parser.parse_tickhistory_legacy_to_normalized import select_mapping
+from library.utility.compression.compression import open_compressed
+
+# settings
+COLUMNS = [
+    "#RIC", "Domain", "Date-Time", "GMT Offset", "Type", "MsgClass/FID number", "UpdateType/Action",
+    "FID Name", "FID Value", "FID Enum String", "PE Code", "Template Number", "Key/Msg Sequence Number",
+]
+SESSION = ("08:00", "16:30") # local exchange time (Xetra)
+TIMEZONE = "Europe/Berlin"
+BLOCK_SIZE = 100_000 # number of UPDATE STATEs generated at once
+
+# 'FID Name' values that are not considered by the parser, all with integer values
+IRRELEVANT_FIDNAMES = ["BOOK_STATE", "NO_BIDMMKR", "NO_ASKMMKR", "PROD_PERM", "SEQNUM_QT", "HALT_REASN"]
+
+def generate_raw_legacy(path:str, rics=("DBKGn.DE",), days=1, updates_per_day=10_000, depth=10,
+    start_date="2021-01-04", start_price=10.0, tick_size=0.005, p_move=0.1,
+    p_missing_timact=0.01, p_duplicate=0.01, p_empty=0.01, p_nan_value=0.001, p_irrelevant=0.2, seed=0,
+): # as .csv(.gz/.zst)
+    """
+    Generate synthetic TRTH raw legacy data in the format that is expected by
+    `reconstruct_book`, i.e. one UPDATE STATE row ('#RIC', 'Date-Time', ...)
+    followed by one row per updated 'FID Name' and 'FID Value'. Instruments
+    are written one after another, each with one trading day after another.
+
+    The book follows a random walk of the best bid in ticks, with a spread of
+    1 to 3 ticks and levels one tick apart. The first UPDATE STATE of each day
+    is a snapshot of all levels, all fields are updated when prices move, and
+    single sizes or numbers of orders are updated otherwise. To resemble real
+    data, some UPDATE STATEs repeat the previous one (duplicate states), come
+    without TIMACT_MS, or without any relevant 'FID Name' (empty), some 'FID
+    Value's are missing (NaN), and irrelevant 'FID Name's are interspersed.
+
+    :param path:
+        str, path to TRTH raw legacy data, as .csv(.gz/.zst), gzip is written as BGZF (see `open_compressed`)
+    :param rics:
+        list, instruments to generate, default is ("DBKGn.DE",)
+    :param days:
+        int, number of trading days (weekdays) per instrument, default is 1
+    :param updates_per_day:
+        int, number of UPDATE STATEs per instrument and day, default is 10_000
+    :param depth:
+        int, number of book levels, default is 10
+    :param start_date:
+        str, first trading day, default is "2021-01-04"
+    :param start_price:
+        float, initial best bid per instrument, default is 10.0
+    :param tick_size:
+        float, price increment, default is 0.005
+    :param p_move:
+        float, probability that prices move per UPDATE STATE, default is 0.1
+    :param p_missing_timact:
+        float, probability that TIMACT_MS is missing per UPDATE STATE, default is 0.01
+    :param p_duplicate:
+        float, probability that an UPDATE STATE repeats the previous one, default is 0.01
+    :param p_empty:
+        float, probability that an UPDATE STATE has no relevant 'FID Name', default is 0.01
+    :param p_nan_value:
+        float, probability that a 'FID Value' is missing, default is 0.001
+    :param p_irrelevant:
+        float, probability that an UPDATE STATE includes an irrelevant 'FID Name', default is 0.2
+    :param seed:
+        int, random seed, default is 0
+    :return nrows:
+        int, number of rows written
+    """
+
+    # ...
+    rng = np.random.default_rng(seed)
+    fidnames = list(select_mapping(depth=depth))
+    columns = list(select_mapping(depth=depth).values())
+    dates = pd.bdate_range(start_date, periods=days)
+    decimals = max(0, -int(np.floor(np.log10(tick_size) + 1e-9)))
+
+    # write header once, then append one block of rows at a time
+    nrows = 0
+    with open_compressed(path, "wt", level=1) as file: # compression dominates runtime otherwise
+        file.write(",".join(COLUMNS) + "\n")
+        for ric in rics:
+            bid = int(round(start_price / tick_size))
+            for date in dates:
+
+                # sample sorted timestamps within the trading session (UTC)
+                session = [pd.Timestamp(f"{date.date()} {time}", tz=TIMEZONE) for time in SESSION]
+                gmt_offset = int(session[0].utcoffset().total_seconds() // 3600)
+                timestamps = np.sort(rng.integers(
+                    session[0].tz_convert(None).value, session[1].tz_convert(None).value, updates_per_day,
+                ))
+
+                # generate blocks of UPDATE STATEs, carry state across blocks
+                state = None
+                for start in range(0, updates_per_day, BLOCK_SIZE):
+                    lines, state, bid = _generate_block(rng, timestamps[start:start + BLOCK_SIZE],
+                        state=state, bid=bid, ric=ric, gmt_offset=gmt_offset, sequence=start,
+                        fidnames=fidnames, columns=columns, decimals=decimals, tick_size=tick_size,
+                        p_move=p_move, p_missing_timact=p_missing_timact, p_duplicate=p_duplicate,
+                        p_empty=p_empty, p_nan_value=p_nan_value, p_irrelevant=p_irrelevant,
+                    )
+                    file.write("".join(lines))
+                    nrows += len(lines)
+
+    return nrows
+
+def _generate_block(rng, timestamps:np.ndarray, state, bid, ric, gmt_offset, sequence, fidnames, columns,
+    decimals, tick_size, p_move, p_missing_timact, p_duplicate, p_empty, p_nan_value, p_irrelevant,
+):
+    """
+    Generate the rows of consecutive UPDATE STATEs of a single instrument and
+    day, see `generate_raw_legacy`. Row 0 of all intermediate arrays holds the
+    last UPDATE STATE of the previous block (state), such that duplicates may
+    also repeat the last UPDATE STATE of the previous block.
+
+    :param timestamps:
+        np.ndarray, sorted timestamps (UTC) in nanoseconds, one per UPDATE STATE
+    :param state:
+        tuple, (is_updated, values) of the last UPDATE STATE of the previous block, None if first block of the day
+    :param bid:
+        int, best bid in ticks
+    :param ric:
+        str, instrument
+    :param gmt_offset:
+        int, 'GMT Offset' in hours
+    :param sequence:
+        int, 'Key/Msg Sequence Number' of the first UPDATE STATE
+    :return lines, state, bid:
+        list, one csv line per row; tuple, state for the next block; int, best bid in ticks
+    """
+
+    # ...
+    n = len(timestamps)
+    depth = len(fidnames[1:]) // 6
+    is_price = np.array(["Price" in col for col in columns[1:]])
+    level = np.array([int(col.split("-")[0][1:]) for col in columns[1:]])
+    is_bid = np.array([col.split("-")[1] in ("BidPrice", "BidSize", "BuyNo") for col in columns[1:]])
+
+    # DRAW EVENTS PER UPDATE STATE . . . . . . . . . . . . . . . . . . . . . . .
+
+    # the first UPDATE STATE of a day is a snapshot, i.e. neither duplicate nor empty
+    is_first = state is None
+    is_duplicate = rng.random(n + 1) < p_duplicate
+    is_empty = rng.random(n + 1) < p_empty
+    is_move = rng.random(n + 1) < p_move
+    is_duplicate[:1 + is_first] = False
+    is_empty[:1 + is_first] = False
+    is_move[:1 + is_first] = True
+    is_move &= ~ is_duplicate
+
+    # best bid follows a random walk in ticks, spread is drawn whenever prices move
+    step = np.where(is_move, rng.choice([-1, 1], n + 1), 0)
+    step[0] = 0
+    best_bid = bid + np.cumsum(step)
+    spread = rng.integers(1, 4, n + 1)[np.maximum.accumulate(np.where(is_move, np.arange(n + 1), 0))]
+
+    # prices of all levels, levels are one tick apart
+    ticks = np.where(is_bid, best_bid[:, None] - (level - 1), best_bid[:, None] + spread[:, None] + (level - 1))
+    values = np.where(is_price, ticks * tick_size,
+        np.where(np.char.find(np.array(columns[1:]), "No") >= 0,
+            rng.integers(1, 20, (n + 1, len(is_price))),
+            rng.integers(1, 50, (n + 1, len(is_price))) * 100,
+        ),
+    ).astype(np.float64)
+
+    # update all fields when prices move, one or two sizes or numbers of orders otherwise
+    is_updated = is_move[:, None] | (~ is_price & (rng.random((n + 1, len(is_price))) < 1.5 / (4 * depth)))
+    is_missing = ~ is_updated.any(axis=1)
+    is_updated[is_missing, rng.choice(np.flatnonzero(~ is_price), is_missing.sum())] = True
+    values[rng.random(values.shape) < p_nan_value] = np.nan
+
+    # carry last UPDATE STATE of the previous block
+    if not is_first:
+        is_updated[0], values[0] = state
+
+    # duplicates repeat the fields and values of the last UPDATE STATE that is neither duplicate nor empty
+    source = np.maximum.accumulate(np.where(is_duplicate | is_empty, 0, np.arange(n + 1)))
+    is_updated = is_updated[source]
+    values = values[source]
+    state = (is_updated[-1].copy(), values[-1].copy())
+    is_updated[is_empty] = False
+
+    # ASSEMBLE ROWS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    # columns are TIMACT_MS, book fields, irrelevant field (row 0 is dropped)
+    has_timact = ~ is_empty & (rng.random(n + 1) >= p_missing_timact)
+    has_irrelevant = rng.random(n + 1) < p_irrelevant
+    is_updated = np.column_stack([has_timact, is_updated, has_irrelevant])[1:]
+
+    # TIMACT_MS is exchange time in milliseconds since midnight (UTC), slightly before 'Date-Time'
+    timact = (timestamps % 86_400_000_000_000) // 1_000_000 - rng.integers(0, 3, n)
+    irrelevant = rng.integers(0, len(IRRELEVANT_FIDNAMES), n)
+
+    # one row per updated field, ordered by UPDATE STATE, then field
+    update, field = np.nonzero(is_updated)
+    is_timact = field == 0
+    is_irrelevant = field == is_updated.shape[1] - 1
+    is_book = ~ is_timact & ~ is_irrelevant
+    fidname = np.array(fidnames + [""], dtype=object)[field]
+    fidname[is_irrelevant] = np.array(IRRELEVANT_FIDNAMES, dtype=object)[irrelevant[update[is_irrelevant]]]
+
+    # format 'FID Value's, prices with fixed decimals, sizes and numbers of orders as integers
+    fidvalue = np.empty(len(field), dtype=object)
+    fidvalue[is_timact] = timact[update[is_timact]].astype(str)
+    fidvalue[is_irrelevant] = rng.integers(0, 10, is_irrelevant.sum()).astype(str)
+    book_value = values[1:][update[is_book], field[is_book] - 1]
+    book_is_price = is_price[field[is_book] - 1]
+    book_string = np.empty(len(book_value), dtype=object)
+    book_string[book_is_price] = np.char.mod(f"%.{decimals}f", book_value[book_is_price])
+    book_string[~ book_is_price] = np.char.mod("%d", np.nan_to_num(book_value[~ book_is_price]))
+    book_string[np.isnan(book_value)] = ""
+    fidvalue[is_book] = book_string
+
+    # format rows, UPDATE STATE rows include '#RIC', 'Date-Time', 'GMT Offset', ...
+    datetime = np.datetime_as_string(timestamps.view("datetime64[ns]"), unit="ns")
+    lines_update = [
+        f"{ric},Market Price,{value}Z,{gmt_offset:+d},Raw,UPDATE,UNSPECIFIED,,,,5289,,{i}\n"
+        for i, value in enumerate(datetime, sequence)
+    ]
+    lines_field = [f",,,,FID,,,{name},{value},,,,\n" for name, value in zip(fidname, fidvalue)]
+
+    # interleave UPDATE STATE rows and field rows
+    lines = np.empty(n + len(field), dtype=object)
+    lines[np.arange(n) + np.searchsorted(update, np.arange(n))] = lines_update
+    lines[np.arange(len(field)) + update + 1] = lines_field
+
+    return lines.tolist(), state, int(best_bid[-1])
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("generate_raw_legacy")
+    parser.add_argument("--path", type=str, help="specify filepath, as .csv(.gz/.zst)", default="...")
+    parser.add_argument("--rics", type=str, help="comma-separated instruments, e.g. DBKGn.DE,SAPG.DE", default="DBKGn.DE")
+    parser.add_argument("--days", type=int, help="number of trading days per instrument", default=1)
+    parser.add_argument("--updates_per_day", type=str, help="number of UPDATE STATEs per instrument and day", default="1e4")
+    parser.add_argument("--depth", type=int, help="number of book levels, 1 to 10", default=10)
+    parser.add_argument("--p_missing_timact", type=float, help="probability that TIMACT_MS is missing", default=0.01)
+    parser.add_argument("--p_duplicate", type=float, help="probability of a duplicate state", default=0.01)
+    parser.add_argument("--p_nan_value", type=float, help="probability that a 'FID Value' is missing", default=0.001)
+    parser.add_argument("--seed", type=int, help="random seed", default=0)
+
+    # parse args
+    args = parser.parse_args()
+
+    # generate raw data
+    print("start generating raw data ...")
+    nrows = generate_raw_legacy(
+        path=args.path,
+        rics=args.rics.split(","),
+        days=args.days,
+        updates_per_day=int(float(args.updates_per_day)),
+        depth=args.depth,
+        p_missing_timact=args.p_missing_timact,
+        p_duplicate=args.p_duplicate,
+        p_nan_value=args.p_nan_value,
+        seed=args.seed,
+    )
+    print("... done generating {} rows of raw data".format(nrows))
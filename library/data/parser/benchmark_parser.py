@@ -0,0 +1,189 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# TODO: include peak rss of worker processes (workers > 1)
+
+# general imports
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+# import pandas, suppress prints (None)
+import pandas as pd
+pd.options.mode.chained_assignment = None  # default="warn"
+
+# make library importable if run as script, e.g. `python library/data/parser/benchmark_parser.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.data.generator.generate_tickhistory_legacy import generate_raw_legacy
+from library.data.parser.parse_tickhistory_legacy_to_normalized import (
+    chunkwise_reconstruct_book,
+    load_df,
+    reconstruct_book,
+    save_df,
+)
+from library.utility.resources.ram import get_peak_rss, get_rss, reset_peak_rss, trim_memory
+
+# settings
+SIZES = (1e4, 1e5, 1e6) # number of UPDATE STATEs per file
+MEGABYTE = 1024 ** 2
+
+def benchmark_parser(sizes=SIZES, rics=("DBKGn.DE",), days=1, depth=10, engine="numpy", workers=1,
+    format="csv", seed=0, path_dir=None,
+):
+    """
+    Benchmark the parser stages `load_df`, `reconstruct_book`,
+    `chunkwise_reconstruct_book` and `save_df` on synthetic TRTH raw legacy
+    data of different sizes (see `generate_raw_legacy`). Per stage and size,
+    measure wall time, cpu time, rows per second, peak rss (in excess of the
+    rss before the stage), and the size of the output file (`save_df`).
+
+    :param sizes:
+        list, total number of UPDATE STATEs per file, spread evenly over rics and days, default is SIZES
+    :param rics:
+        list, instruments per file, default is ("DBKGn.DE",)
+    :param days:
+        int, number of trading days per file, default is 1
+    :param depth:
+        int, number of book levels, default is 10
+    :param engine:
+        str, reconstruction engine, default is "numpy"
+    :param workers:
+        int, number of worker processes for `chunkwise_reconstruct_book`, default is 1
+    :param format:
+        str, output format for `save_df`, default is "csv"
+    :param seed:
+        int, random seed, default is 0
+    :param path_dir:
+        str, directory for generated files, default is None (temporary directory, removed afterwards)
+    :return report:
+        pd.DataFrame, one row per size and stage
+    """
+
+    # ...
+    results = []
+    with tempfile.TemporaryDirectory(dir=path_dir) as directory:
+        for size in sizes:
+            size = int(float(size))
+            updates_per_day = size // (len(rics) * days)
+
+            # generate raw data, not part of the benchmark
+            path = os.path.join(directory, "raw_{}.csv.gz".format(size))
+            nrows = generate_raw_legacy(path, rics=rics, days=days, updates_per_day=updates_per_day,
+                depth=depth, seed=seed,
+            )
+            path_out = path.replace(".csv.gz", "_reconstructed.csv.gz" if format == "csv" else "_reconstructed")
+
+            # run stages, each on the output of the previous one
+            data, result = _measure(load_df, path, rows_in=nrows)
+            results.append({"size": size, "stage": "load_df", **result})
+            full, result = _measure(reconstruct_book, data.copy(), engine=engine, rows_in=len(data))
+            results.append({"size": size, "stage": "reconstruct_book", **result})
+            full, result = _measure(chunkwise_reconstruct_book, data, engine=engine, workers=workers, rows_in=len(data))
+            results.append({"size": size, "stage": "chunkwise_reconstruct_book", **result})
+            _, result = _measure(save_df, full, path_out, format=format, rows_in=len(full), rows_out=len(full))
+            results.append({"size": size, "stage": "save_df", **result, "output_mb": _get_size(path_out) / MEGABYTE})
+            del data, full
+
+    return pd.DataFrame(results)
+
+def _measure(function, *args, rows_in=None, rows_out=None, **kwargs):
+    """
+    Run function once and measure its resource usage, prints are suppressed.
+
+    :param function:
+        callable, function to be measured
+    :param rows_in:
+        int, number of input rows
+    :param rows_out:
+        int, number of output rows, default is None (length of result)
+    :return result, measurement:
+        object, result of function; dict, measurement
+    """
+
+    # reset peak rss to current rss (linux only)
+    trim_memory()
+    reset_peak_rss()
+    rss_start = get_rss() or get_peak_rss()
+
+    # run function, suppress prints
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args, **kwargs)
+    wall, cpu = time.perf_counter() - wall_start, time.process_time() - cpu_start
+
+    # ...
+    if rows_out is None:
+        rows_out = len(result)
+    measurement = {
+        "rows_in": rows_in,
+        "rows_out": rows_out,
+        "wall_seconds": wall,
+        "cpu_seconds": cpu,
+        "rows_per_second": rows_in / wall if wall > 0 else float("nan"),
+        "peak_rss_mb": (get_peak_rss() - rss_start) / MEGABYTE,
+    }
+
+    return result, measurement
+
+def _get_size(path:str):
+    """
+    Get the size of a file, or the total size of all files in a directory.
+
+    :param path:
+        str, path to file or directory
+    :return size:
+        int, size in bytes
+    """
+
+    # ...
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path) for name in names
+    )
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("benchmark_parser")
+    parser.add_argument("--sizes", type=str, help="comma-separated numbers of UPDATE STATEs, e.g. 1e4,1e5", default="1e4,1e5,1e6")
+    parser.add_argument("--rics", type=str, help="comma-separated instruments, e.g. DBKGn.DE,SAPG.DE", default="DBKGn.DE")
+    parser.add_argument("--days", type=int, help="number of trading days", default=1)
+    parser.add_argument("--engine", type=str, help="reconstruction engine, numpy or pandas", default="numpy")
+    parser.add_argument("--workers", type=int, help="number of worker processes", default=1)
+    parser.add_argument("--format", type=str, help="output format, csv, parquet or feather", default="csv")
+    parser.add_argument("--path_out", type=str, help="save report, as .csv or .json", default=None)
+
+    # parse args
+    args = parser.parse_args()
+
+    # run benchmark
+    report = benchmark_parser(
+        sizes=args.sizes.split(","),
+        rics=args.rics.split(","),
+        days=args.days,
+        engine=args.engine,
+        workers=args.workers,
+        format=args.format,
+    )
+    print(report.to_string(index=False, float_format="{:.3f}".format))
+
+    # save report
+    if args.path_out is not None:
+        if args.path_out.endswith(".json"):
+            report.to_json(args.path_out, orient="records", indent=4)
+        else:
+            report.to_csv(args.path_out, index=False)
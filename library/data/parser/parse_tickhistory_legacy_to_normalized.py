@@ -4,124 +4,552 @@
 __author__ = "Jonas De Paolis"
 __version__ = "2022-02-23"
 
-# TODO: provide built-in multi-threading
 # TODO: resolve datatable issues
 
 # general imports
 import argparse
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+import contextlib
 import datatable as dt
+import functools
+import glob
+import hashlib
+import json
 import numpy as np
+import os
+import resource
+import shutil
+import socket
+import sys
+import tempfile
+import threading
 import time
+import uuid
 
 # import pandas, suppress prints (None)
 import pandas as pd
 pd.options.mode.chained_assignment = None  # default="warn"
 
+# make library importable if run as script, e.g. `python library/data/parser/parse_tickhistory_legacy_to_normalized.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.data.downloader.downloader import get_file_name, is_url, open_url
+from library.data.features.compute_book_features import compute_book_features
+from library.data.features.summarize_book import save_summary, summarize_book
+from library.data.store.delta_store import write_delta
+from library.parallelization.parallel_map import parallel_map
+from library.utility.compression.compression import get_compression, open_compressed
+from library.utility.hashing.hashing import hash_file
+
 # settings
 DATETIME = "Date-Time"
+DATETIME_FORMAT = "0000-00-00T00:00:00.000000000Z" # '0' is any digit
+NANOSECONDS_PER_DAY = 86_400_000_000_000
+NAT = np.iinfo(np.int64).min # NaT as int64
+ENGINES = ("numpy", "pandas")
+MAX_PRICE_DECIMALS = 9
+FORMATS = ("csv", "parquet", "feather", "delta")
+PARTITIONING = ("RIC", "Date")
+CACHE_VERSION = 3 # increase whenever the reconstructed output changes, e.g. 2: 'Date-Time-Exch' across midnight, 3: 'GMT Offset' as int8
+CACHE_LOCK_TIMEOUT = 300 # seconds without refresh after which a lock is considered stale
+CACHE_LOCK_REFRESH = 30 # seconds between refreshes of the locks held by a running job
+CACHE_POLL_INTERVAL = 1 # seconds between checks of a lock held by another job
+MEMORY_PER_BYTE_GZ = 100 # peak memory per byte of raw .csv.gz (.csv.zst) file, see benchmark_parser
+MEMORY_PER_BYTE_CSV = 15 # peak memory per byte of raw .csv file
+SIDECAR_VERSION = 1 # increase whenever the layout of the binary sidecar changes
+SIDECAR_COLUMNS = ("#RIC", "Date-Time", "GMT Offset", "FID Name", "FID Value")
+CSV_BLOCK_SIZE = 100_000 # number of rows per block written to .csv.gz (.csv.zst)
+
+# map 'FID Name' values to corresponding columns, all items in this dictionary will be considered
+MAPPING_FIDNAME_TO_COLUMN = {
+    # exchange-recorded time in milliseconds, no date
+    "TIMACT_MS": "EXCHANGE_TIME_IN_MILLISECONDS",
+    # limit order book informatiom
+    "BEST_BID1": "L1-BidPrice", 
+    "BEST_BSIZ1": "L1-BidSize", 
+    "NO_BIDORD1": "L1-BuyNo", 
+    "BEST_ASK1": "L1-AskPrice", 
+    "BEST_ASIZ1": "L1-AskSize", 
+    "NO_ASKORD1": "L1-SellNo", 
+    "BEST_BID2": "L2-BidPrice", 
+    "BEST_BSIZ2": "L2-BidSize", 
+    "NO_BIDORD2": "L2-BuyNo", 
+    "BEST_ASK2": "L2-AskPrice", 
+    "BEST_ASIZ2": "L2-AskSize", 
+    "NO_ASKORD2": "L2-SellNo", 
+    "BEST_BID3": "L3-BidPrice", 
+    "BEST_BSIZ3": "L3-BidSize", 
+    "NO_BIDORD3": "L3-BuyNo", 
+    "BEST_ASK3": "L3-AskPrice", 
+    "BEST_ASIZ3": "L3-AskSize", 
+    "NO_ASKORD3": "L3-SellNo", 
+    "BEST_BID4": "L4-BidPrice", 
+    "BEST_BSIZ4": "L4-BidSize", 
+    "NO_BIDORD4": "L4-BuyNo", 
+    "BEST_ASK4": "L4-AskPrice", 
+    "BEST_ASIZ4": "L4-AskSize", 
+    "NO_ASKORD4": "L4-SellNo", 
+    "BEST_BID5": "L5-BidPrice", 
+    "BEST_BSIZ5": "L5-BidSize", 
+    "NO_BIDORD5": "L5-BuyNo", 
+    "BEST_ASK5": "L5-AskPrice", 
+    "BEST_ASIZ5": "L5-AskSize", 
+    "NO_ASKORD5": "L5-SellNo", 
+    "BEST_BID6": "L6-BidPrice", 
+    "BEST_BSIZ6": "L6-BidSize", 
+    "NO_BIDORD6": "L6-BuyNo", 
+    "BEST_ASK6": "L6-AskPrice", 
+    "BEST_ASIZ6": "L6-AskSize", 
+    "NO_ASKORD6": "L6-SellNo", 
+    "BEST_BID7": "L7-BidPrice", 
+    "BEST_BSIZ7": "L7-BidSize", 
+    "NO_BIDORD7": "L7-BuyNo", 
+    "BEST_ASK7": "L7-AskPrice", 
+    "BEST_ASIZ7": "L7-AskSize", 
+    "NO_ASKORD7": "L7-SellNo", 
+    "BEST_BID8": "L8-BidPrice", 
+    "BEST_BSIZ8": "L8-BidSize", 
+    "NO_BIDORD8": "L8-BuyNo", 
+    "BEST_ASK8": "L8-AskPrice", 
+    "BEST_ASIZ8": "L8-AskSize", 
+    "NO_ASKORD8": "L8-SellNo", 
+    "BEST_BID9": "L9-BidPrice", 
+    "BEST_BSIZ9": "L9-BidSize", 
+    "NO_BIDORD9": "L9-BuyNo", 
+    "BEST_ASK9": "L9-AskPrice", 
+    "BEST_ASIZ9": "L9-AskSize", 
+    "NO_ASKORD9": "L9-SellNo", 
+    "BEST_BID10": "L10-BidPrice", 
+    "BEST_BSZ10": "L10-BidSize", 
+    "NO_BIDRD10": "L10-BuyNo", 
+    "BEST_ASK10": "L10-AskPrice", 
+    "BEST_ASZ10": "L10-AskSize", 
+    "NO_ASKRD10": "L10-SellNo", 
+}
+
+# output products besides the book ("book"), all extracted in the same pass over the raw data (see `extract_events`),
+# each maps 'FID Name' values to corresponding columns, the first item is the exchange time in milliseconds
+PRODUCTS = {
+    "trades": {
+        "type": "Trade",
+        "mapping": {
+            "SALTIM_MS": "EXCHANGE_TIME_IN_MILLISECONDS",
+            "TRDPRC_1": "Price",
+            "TRDVOL_1": "Volume",
+            "ACVOL_1": "AccVolume",
+        },
+        "trigger": ["TRDPRC_1"], # UPDATE STATEs that include any of these 'FID Name' values are events
+        "fill": False, # whether to forward-fill missing values with the previous event of the same '#RIC'
+    },
+    "quotes": {
+        "type": "Quote",
+        "mapping": {
+            "QUOTIM_MS": "EXCHANGE_TIME_IN_MILLISECONDS",
+            "BID": "BidPrice",
+            "BIDSIZE": "BidSize",
+            "ASK": "AskPrice",
+            "ASKSIZE": "AskSize",
+        },
+        "trigger": ["BID", "BIDSIZE", "ASK", "ASKSIZE"],
+        "fill": True,
+    },
+}
+
+def select_mapping(depth=None, fields=None):
+    """
+    Select the items of `MAPPING_FIDNAME_TO_COLUMN` to be considered, such
+    that the entire pipeline (reading, reconstruction, duplicate removal) only
+    handles the corresponding 'FID Name' values. TIMACT_MS is always included
+    as it is required for 'Date-Time-Exch'.
+
+    :param depth:
+        int, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, include columns whose field contains any of these strings, e.g.
+        ["Price", "Size"] or ["BidPrice"], default is None (all fields)
+    :return mapping:
+        dict, 'FID Name' values mapped to corresponding columns, TIMACT_MS first
+    """
+
+    # ...
+    assert depth is None or 1 <= depth <= 10, \
+        "(ERROR) depth must be within 1 to 10, you provided value {value}".format(
+            value=depth,
+        )
+
+    # include TIMACT_MS and all selected levels and fields
+    mapping = {}
+    for fidname, col in MAPPING_FIDNAME_TO_COLUMN.items():
+        if fidname != "TIMACT_MS":
+            level, field = col.split("-")
+            if depth is not None and int(level[1:]) > depth:
+                continue
+            if fields is not None and not any(substring in field for substring in fields):
+                continue
+        mapping[fidname] = col
+
+    # ...
+    assert len(mapping) > 1, \
+        "(ERROR) fields must match at least one of BidPrice, BidSize, BuyNo, AskPrice, AskSize, SellNo, you provided value {value}".format(
+            value=fields,
+        )
+
+    return mapping
+
+def select_products(products=None, depth=None, fields=None):
+    """
+    Select the output products to be extracted in a single pass over the raw
+    data, i.e. the book ("book", see `select_mapping`) and any of `PRODUCTS`,
+    or custom products given as dictionaries of the same form.
+
+    :param products:
+        list or dict, names of products, e.g. ["book", "trades", "quotes"], or
+        names mapped to custom products, default is None (book only)
+    :param depth:
+        int, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, include book fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+    :return products:
+        dict, names of products mapped to products, i.e. dictionaries with 'type' and 'mapping'
+    """
+
+    # ...
+    if products is None:
+        products = ["book"]
+    if not isinstance(products, dict):
+        for name in products:
+            assert name == "book" or name in PRODUCTS, \
+                "(ERROR) products must be book or one of {products}, you provided value {value}".format(
+                    products=list(PRODUCTS),
+                    value=name,
+                )
+        products = {name: PRODUCTS.get(name) for name in products}
+
+    # book mapping depends on depth and fields
+    return {name: {"type": "Reconstructed LL2", "mapping": select_mapping(depth=depth, fields=fields)} if name == "book" else product
+        for name, product in products.items()
+    }
+
+class Profiler:
+    """
+    Record wall time, cpu time, input and output rows, rows per second and
+    peak rss (of the process) for each stage of the pipeline, e.g. load_df, chunk, filter,
+    scatter, fill, dedup, merge, timestamp, cast, write. Stages may be nested
+    (e.g. scatter within reconstruct_book within chunk), the peak rss of a
+    stage includes the peak rss of its nested stages.
+
+    The profiler is active within a `with` block. Hooks subscribed via
+    `subscribe` are called with each record as soon as a stage is done, e.g.
+    to display progress in a notebook. Stages executed in worker processes
+    are recorded there and handed over to the profiler of the main process.
+
+    Example:
+        with Profiler() as profiler:
+            profiler.subscribe(lambda record: print(record["stage"], record["wall_seconds"]))
+            data = chunkwise_reconstruct_book(load_df(path))
+        profiler.to_json("report.json")
+    """
+
+    # currently active profiler, if any
+    active = None
+
+    def __init__(self):
+        self.records = []
+        self.hooks = []
+        self._open_records = []
+        self._previous = None
+
+    def __enter__(self):
+        self._previous, Profiler.active = Profiler.active, self
+        return self
+
+    def __exit__(self, *exc_info):
+        Profiler.active = self._previous
+
+    def subscribe(self, hook):
+        """
+        Subscribe to records, hook is called with each record (dict).
+        """
 
-def time_decorator(function):
+        # ...
+        self.hooks.append(hook)
+
+    @contextlib.contextmanager
+    def stage(self, name:str, rows_in=None, **labels):
+        """
+        Record a stage, set `record["rows_out"]` within the `with` block.
+
+        :param name:
+            str, name of the stage
+        :param rows_in:
+            int, number of input rows, default is None
+        :param labels:
+            dict, additional information, e.g. chunk=1, ric="DBKGn.DE"
+        :return record:
+            dict, record of the stage
+        """
+
+        # track peak rss of all open stages, then reset peak rss for this stage
+        self._observe_peak_rss()
+        _reset_peak_rss()
+        record = {"stage": name, "parent": self._open_records[-1]["stage"] if self._open_records else None,
+            "rows_in": rows_in, "rows_out": None, **labels,
+        }
+        record["_peak_rss"] = _get_peak_rss()
+        self._open_records.append(record)
+
+        # ...
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_seconds"] = time.perf_counter() - wall_start
+            record["cpu_seconds"] = time.process_time() - cpu_start
+            self._observe_peak_rss()
+            self._open_records.remove(record)
+            record["peak_rss_mb"] = record.pop("_peak_rss") / 1024**2
+            self.add(record)
+
+    def add(self, record:dict):
+        """
+        Add a finished record, e.g. from a worker process, and call hooks.
+        """
+
+        # ...
+        rows = record["rows_in"] if record["rows_in"] is not None else record["rows_out"]
+        record["rows_per_second"] = rows / record["wall_seconds"] if rows is not None and record["wall_seconds"] > 0 else None
+        self.records.append(record)
+        for hook in self.hooks:
+            hook(record)
+
+    def report(self):
+        """
+        Get all records, one row per stage (and chunk).
+
+        :return report:
+            pd.DataFrame, records in order of completion
+        """
+
+        # ...
+        return pd.DataFrame(self.records)
+
+    def summary(self):
+        """
+        Get totals per stage, i.e. wall and cpu time, rows, and max peak rss.
+
+        :return summary:
+            pd.DataFrame, one row per stage
+        """
+
+        # ...
+        report = self.report()
+        if not len(report):
+            return report
+        report["rows"] = report["rows_in"].fillna(report["rows_out"])
+        summary = report.groupby(["stage"], sort=False).agg(
+            count=("stage", "size"),
+            wall_seconds=("wall_seconds", "sum"),
+            cpu_seconds=("cpu_seconds", "sum"),
+            rows_in=("rows_in", "sum"),
+            rows_out=("rows_out", "sum"),
+            rows=("rows", "sum"),
+            peak_rss_mb=("peak_rss_mb", "max"),
+        )
+        summary["rows_per_second"] = summary.pop("rows") / summary["wall_seconds"]
+
+        return summary
+
+    def to_json(self, path:str):
+        """
+        Save all records and totals per stage as JSON report.
+
+        :param path:
+            str, path to report, as .json
+        """
+
+        # ...
+        report = {
+            "records": self.records,
+            "summary": self.summary().reset_index().to_dict(orient="records"),
+        }
+        with open(path, "w") as file:
+            json.dump(report, file, indent=4, default=str)
+
+    def _observe_peak_rss(self):
+        peak_rss = _get_peak_rss()
+        for record in self._open_records:
+            record["_peak_rss"] = max(record["_peak_rss"], peak_rss)
+
+def profile_stage(name:str, rows_in=None, **labels):
+    """
+    Record a stage with the active profiler (see `Profiler.stage`), or do
+    nothing if there is no active profiler.
+    """
+
+    # ...
+    if Profiler.active is None:
+        return contextlib.nullcontext({})
+
+    return Profiler.active.stage(name, rows_in=rows_in, **labels)
+
+def profile_decorator(function):
+    """
+    Record each call of a function as a stage, the number of input rows is
+    the length of the first DataFrame passed as argument, the number of output
+    rows is the length of the DataFrame returned (first item if tuple).
+    """
 
     # wrapper fn
+    @functools.wraps(function)
     def wrapper(*args, **kwargs):
-        time_start = time.time()
-        result = function(*args, **kwargs)
-        print("{function_name} took {runtime} seconds to execute".format(
-            function_name=function.__name__,
-            runtime=time.time()-time_start,
-        ))
+        df = next((arg for arg in [*args, *kwargs.values()] if isinstance(arg, pd.DataFrame)), None)
+        rows_in = len(df) if df is not None else None
+        with profile_stage(function.__name__, rows_in=rows_in) as record:
+            result = function(*args, **kwargs)
+            output = result[0] if isinstance(result, tuple) else result
+            record["rows_out"] = len(output) if isinstance(output, pd.DataFrame) else rows_in
         return result
 
     return wrapper
 
-@time_decorator
-def reconstruct_book(data:pd.DataFrame):
+def print_progress(record:dict):
+    """
+    Print a record of a main stage (not nested), chunk, block or cache hit,
+    to be subscribed to a `Profiler`.
+    """
+
+    # ...
+    if record["parent"] is not None and record["stage"] not in ("chunk", "block", "cache"):
+        return
+    if record["stage"] == "cache" and not record["rows_out"]:
+        return
+
+    # ...
+    if "chunk" in record:
+        label = " {chunk}/{chunks} {ric} {date}".format(**record)
+    elif "block" in record:
+        label = " {block}".format(**record)
+    else:
+        label = ""
+    print("{stage}{label} took {wall:.3f} seconds ({speed} rows/s, peak rss {peak:.0f} MB)".format(
+        stage=record["stage"],
+        label=label,
+        wall=record["wall_seconds"],
+        speed="{:.0f}".format(record["rows_per_second"]) if record["rows_per_second"] is not None else "-",
+        peak=record["peak_rss_mb"],
+    ))
+
+def _get_peak_rss():
+    """
+    Get the peak rss of this process in bytes, from /proc/self/status (linux)
+    since process start or the last reset, or from resource otherwise.
+    """
+
+    # ...
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def _reset_peak_rss():
+    """
+    Reset the peak rss of this process to its current rss (linux >= 4.0).
+    """
+
+    # ...
+    try:
+        with open("/proc/self/clear_refs", "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+@profile_decorator
+def reconstruct_book(data:pd.DataFrame, engine="numpy", state=None, return_state=False, depth=None, fields=None, features=None,
+    summary=False, compact=False,
+):
     """
     Efficiently reconstruct TRTH book. 
 
     :param data:
         pd.DataFrame, TRTH raw legacy data
+    :param engine:
+        str, either "numpy" (single-pass scatter) or "pandas" (mask/bfill pipeline), default is "numpy"
+    :param state:
+        np.ndarray, CURRENT STATE before the first UPDATE STATE, default is None (empty book)
+    :param return_state:
+        bool, whether to also return the CURRENT STATE after the last UPDATE STATE (numpy engine only)
+    :param depth:
+        int, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, include fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+    :param features:
+        list, append order book features, e.g. ["mid", "spread"] (see `compute_book_features`), default is None
+    :param summary:
+        bool, whether to also return a summary per ('#RIC', date) (numpy engine only, see `summarize_book`)
+    :param compact:
+        bool, whether to return the compact layout, 'Price Decimals' per call (see `compact_book`), default is False
+    :return full:
+        pd.DataFrame, TRTH normalized book data (and np.ndarray, closing state, if return_state)
+        (and pd.DataFrame, summary, if summary)
+    """
+
+    # ...
+    assert engine in ENGINES, \
+        "(ERROR) engine must be one of {engines}, you provided value {value}".format(
+            engines=ENGINES,
+            value=engine,
+        )
+
+    # ...
+    mapping = select_mapping(depth=depth, fields=fields)
+
+    # pandas engine: reference implementation
+    if engine == "pandas":
+        assert not return_state and not summary, \
+            "(ERROR) return_state and summary are supported by the numpy engine only"
+        full = _reconstruct_book_pandas(data, state=state, mapping=mapping)
+        if features:
+            full = pd.concat([full, pd.DataFrame(compute_book_features(full, features=features), index=full.index)], axis=1)
+        return compact_book(full) if compact else full
+
+    return _reconstruct_book_numpy(data, state=state, return_state=return_state, mapping=mapping, features=features, summary=summary,
+        compact=compact,
+    )
+
+def _reconstruct_book_pandas(data:pd.DataFrame, state=None, mapping=MAPPING_FIDNAME_TO_COLUMN):
+    """
+    Reconstruct TRTH book using pandas masks and fills, this is the original
+    implementation and kept as a reference for the numpy engine.
+
+    :param data:
+        pd.DataFrame, TRTH raw legacy data
+    :param state:
+        np.ndarray, CURRENT STATE before the first UPDATE STATE, one value per mapped column, default is None
+    :param mapping:
+        dict, 'FID Name' values mapped to corresponding columns, TIMACT_MS first
     :return full:
         pd.DataFrame, TRTH normalized book data
     """
 
-    # SPECIFY COLUMNS TO INCLUDE . . . . . . . . . . . . . . . . . . . . . . .
-
-    # map 'FID Name' values to corresponding columns, all items in this dictionary will be considered
-    MAPPING_FIDNAME_TO_COLUMN = {
-        # exchange-recorded time in milliseconds, no date
-        "TIMACT_MS": "EXCHANGE_TIME_IN_MILLISECONDS",
-        # limit order book informatiom
-        "BEST_BID1": "L1-BidPrice", 
-        "BEST_BSIZ1": "L1-BidSize", 
-        "NO_BIDORD1": "L1-BuyNo", 
-        "BEST_ASK1": "L1-AskPrice", 
-        "BEST_ASIZ1": "L1-AskSize", 
-        "NO_ASKORD1": "L1-SellNo", 
-        "BEST_BID2": "L2-BidPrice", 
-        "BEST_BSIZ2": "L2-BidSize", 
-        "NO_BIDORD2": "L2-BuyNo", 
-        "BEST_ASK2": "L2-AskPrice", 
-        "BEST_ASIZ2": "L2-AskSize", 
-        "NO_ASKORD2": "L2-SellNo", 
-        "BEST_BID3": "L3-BidPrice", 
-        "BEST_BSIZ3": "L3-BidSize", 
-        "NO_BIDORD3": "L3-BuyNo", 
-        "BEST_ASK3": "L3-AskPrice", 
-        "BEST_ASIZ3": "L3-AskSize", 
-        "NO_ASKORD3": "L3-SellNo", 
-        "BEST_BID4": "L4-BidPrice", 
-        "BEST_BSIZ4": "L4-BidSize", 
-        "NO_BIDORD4": "L4-BuyNo", 
-        "BEST_ASK4": "L4-AskPrice", 
-        "BEST_ASIZ4": "L4-AskSize", 
-        "NO_ASKORD4": "L4-SellNo", 
-        "BEST_BID5": "L5-BidPrice", 
-        "BEST_BSIZ5": "L5-BidSize", 
-        "NO_BIDORD5": "L5-BuyNo", 
-        "BEST_ASK5": "L5-AskPrice", 
-        "BEST_ASIZ5": "L5-AskSize", 
-        "NO_ASKORD5": "L5-SellNo", 
-        "BEST_BID6": "L6-BidPrice", 
-        "BEST_BSIZ6": "L6-BidSize", 
-        "NO_BIDORD6": "L6-BuyNo", 
-        "BEST_ASK6": "L6-AskPrice", 
-        "BEST_ASIZ6": "L6-AskSize", 
-        "NO_ASKORD6": "L6-SellNo", 
-        "BEST_BID7": "L7-BidPrice", 
-        "BEST_BSIZ7": "L7-BidSize", 
-        "NO_BIDORD7": "L7-BuyNo", 
-        "BEST_ASK7": "L7-AskPrice", 
-        "BEST_ASIZ7": "L7-AskSize", 
-        "NO_ASKORD7": "L7-SellNo", 
-        "BEST_BID8": "L8-BidPrice", 
-        "BEST_BSIZ8": "L8-BidSize", 
-        "NO_BIDORD8": "L8-BuyNo", 
-        "BEST_ASK8": "L8-AskPrice", 
-        "BEST_ASIZ8": "L8-AskSize", 
-        "NO_ASKORD8": "L8-SellNo", 
-        "BEST_BID9": "L9-BidPrice", 
-        "BEST_BSIZ9": "L9-BidSize", 
-        "NO_BIDORD9": "L9-BuyNo", 
-        "BEST_ASK9": "L9-AskPrice", 
-        "BEST_ASIZ9": "L9-AskSize", 
-        "NO_ASKORD9": "L9-SellNo", 
-        "BEST_BID10": "L10-BidPrice", 
-        "BEST_BSZ10": "L10-BidSize", 
-        "NO_BIDRD10": "L10-BuyNo", 
-        "BEST_ASK10": "L10-AskPrice", 
-        "BEST_ASZ10": "L10-AskSize", 
-        "NO_ASKRD10": "L10-SellNo", 
-    }
-    
     # FILTER DATA TO INCLUDE ONLY TIMESTAMP OR RELEVANT FID . . . . . . . . . .
     
     # filter for relevant columns
     data = data[["#RIC", "Date-Time", "GMT Offset", "FID Name", "FID Value"]] # possibly omit 'GMT Offset' since 'Date-Time' is already displayed in UTC
     
+    # categoricals (as returned by `load_df`) do not support the 'E' token and fillna(0)
+    data = data.astype({"#RIC": object, "FID Name": object})
+    
     # filter for relevant rows that have (1) a timestamp, or (2) a 'FID Name' value listed in the dictionary keys
     has_timestamp = ~ data["Date-Time"].isna()
-    has_fidname = data["FID Name"].isin(MAPPING_FIDNAME_TO_COLUMN.keys())
+    has_fidname = data["FID Name"].isin(mapping.keys())
     data = data.loc[has_timestamp | has_fidname, :]
     
     # ...
@@ -148,7 +576,7 @@ def reconstruct_book(data:pd.DataFrame):
 
     # create FID dataframe, set all values per row to the corresponding value in RAW['FID Value']
     book = pd.DataFrame({col: data["FID Value"] 
-        for fidname, col in MAPPING_FIDNAME_TO_COLUMN.items()
+        for fidname, col in mapping.items()
     })
     
     """
@@ -171,12 +599,12 @@ def reconstruct_book(data:pd.DataFrame):
 
     # repeat 'FID Name' (matching each column) vertically across all rows
     mask_layer_a = pd.DataFrame({col: pd.Series([fidname]).repeat(len(data.index)) 
-        for fidname, col in MAPPING_FIDNAME_TO_COLUMN.items()
+        for fidname, col in mapping.items()
     }).reset_index(drop=True)
     
     # repeat 'FID Name' horizontally across all columns
     mask_layer_b = pd.DataFrame({col: data["FID Name"] 
-        for fidname, col in MAPPING_FIDNAME_TO_COLUMN.items()
+        for fidname, col in mapping.items()
     }).reset_index(drop=True)
     
     # set mask to True where 'FID Name' values align
@@ -267,8 +695,13 @@ def reconstruct_book(data:pd.DataFrame):
     
     # replace token 'E' in UPDATE STATE with NaN
     book = book.replace({"E": np.nan})
+    # seed: prepend the CURRENT STATE before the first UPDATE STATE, removed after forward-filling
+    if state is not None:
+        book = pd.concat([pd.DataFrame([state], columns=book.columns, index=[-1]), book], axis=0)
     # forward-fill unchanged values with previous value
     book = book.fillna(method="ffill")    
+    if state is not None:
+        book = book.drop(index=-1)
 
     """
     data                                          book
@@ -308,14 +741,13 @@ def reconstruct_book(data:pd.DataFrame):
     has_timestamp_exch = ~ full["EXCHANGE_TIME_IN_MILLISECONDS"].isna()
     full = full.loc[has_timestamp_exch, :]
 
-    # add 'Date-Time-Exch' (integer-based, in milliseconds)
-    date = full["Date-Time"].dt.normalize() # normalize() removes time from timestamp
-    time_delta = pd.to_timedelta(full["EXCHANGE_TIME_IN_MILLISECONDS"].astype(int), unit="milliseconds")
-    full["Date-Time-Exch"] = date + time_delta
+    # make timestamp column timezone-unaware
+    nanoseconds = pd.DatetimeIndex(full["Date-Time"]).tz_localize(None).asi8
+    full["Date-Time"] = nanoseconds.view("datetime64[ns]")
 
-    # make timestamp columns timezone-unaware
-    full["Date-Time"] = pd.DatetimeIndex(full["Date-Time"]).tz_localize(None)
-    full["Date-Time-Exch"] = pd.DatetimeIndex(full["Date-Time-Exch"]).tz_localize(None)
+    # add 'Date-Time-Exch' (integer-based, midnight plus milliseconds)
+    milliseconds = full["EXCHANGE_TIME_IN_MILLISECONDS"].to_numpy().astype(np.int64)
+    full["Date-Time-Exch"] = _get_datetime_exch(nanoseconds, milliseconds).view("datetime64[ns]")
 
     # drop obsolete exchange time information
     full = full.drop(["EXCHANGE_TIME_IN_MILLISECONDS"], axis=1)
@@ -333,8 +765,8 @@ def reconstruct_book(data:pd.DataFrame):
     
     # POST-PROCESS BOOK . . . . . . . . . . . . . . . . . . . . . . . . . . . .
     
-    # columns -61 to -1 are book, -0 is 'Date-Time-Exch'
-    cols_book = list(full.columns[-61:-1]) 
+    # columns -61 to -1 are book (for all 10 levels and fields), -0 is 'Date-Time-Exch'
+    cols_book = list(full.columns[-len(mapping):-1]) 
     # include 'Date-Time-Exch' in cols_base
     cols_base = ["#RIC", "Type", "Date-Time", "Date-Time-Exch", "GMT Offset"] 
     # ensure desired column order
@@ -344,11 +776,8 @@ def reconstruct_book(data:pd.DataFrame):
     cols_book_changed = full[cols_book].shift(-1) != full[cols_book] # use .shift(-1) to keep last
     full = full.loc[cols_book_changed.any(axis=1), :] # keep rows if there has been any change
     
-    # stringify 'GMT Offset' column as in the beginning
-    full["GMT Offset"] = (full["GMT Offset"]
-        .astype(int)
-        .apply(lambda x: f"+{x}" if x >= 0 else f"{x}")
-    )
+    # 'GMT Offset' as small integer, stringified for .csv files only (see `_stringify_gmt_offset`)
+    full["GMT Offset"] = full["GMT Offset"].astype(np.int8)
     
     # fill remaining NaN values with 0
     full = full.fillna(value=0)
@@ -369,90 +798,2413 @@ def reconstruct_book(data:pd.DataFrame):
 
     return full
 
-def chunkwise_reconstruct_book(data:pd.DataFrame):
-    
-    # determine breaking points by day
-    series = data["Date-Time"].fillna(method="ffill").dt.day # processing by the hour would raise problems with forward-fill
-    change = series.shift(1) != series    
-    change_index = np.append(np.flatnonzero(change), len(series.index))
-    # get (start, end) tuples
-    change_index_list = [(change_index[i-1], change_index[i]) 
-        for i in range(1, len(change_index))
+def _reconstruct_book_numpy(data:pd.DataFrame, state=None, return_state=False, mapping=MAPPING_FIDNAME_TO_COLUMN, features=None,
+    summary=False, compact=False,
+):
+    """
+    Reconstruct TRTH book in a single pass. Each 'FID Name' is mapped to an
+    integer column code once, each 'FID Value' is scattered into a
+    preallocated float array (one row per UPDATE STATE), and the CURRENT STATE
+    is obtained by forward-filling this array column by column.
+
+    The output is identical to that of `_reconstruct_book_pandas`, including
+    its quirks: if an 'FID Name' occurs more than once per UPDATE STATE, the
+    first value wins, and an UPDATE STATE without any relevant 'FID Name'
+    takes the values of the next UPDATE STATE that has one.
+
+    In compact layout, the book array is cast to integer ticks, sizes and
+    order counts right after forward-filling, i.e. duplicates are removed
+    and rows are materialized on the integer array. 'Price Decimals' is
+    determined per call, i.e. per partition (see `compact_book` to use the
+    same number of decimals across partitions).
+
+    :param data:
+        pd.DataFrame, TRTH raw legacy data
+    :param state:
+        np.ndarray, CURRENT STATE before the first UPDATE STATE, one value per mapped column, default is None
+    :param return_state:
+        bool, whether to also return the CURRENT STATE after the last UPDATE STATE, default is False
+    :param mapping:
+        dict, 'FID Name' values mapped to corresponding columns, TIMACT_MS first
+    :param features:
+        list, append order book features, computed from the book arrays (see `compute_book_features`), default is None
+    :param summary:
+        bool, whether to also return a summary per ('#RIC', date), counting the UPDATE STATEs removed
+        for missing TIMACT_MS and as duplicates on the way (see `summarize_book`), default is False
+    :param compact:
+        bool, whether to return the compact layout (see `compact_book`), default is False
+    :return full:
+        pd.DataFrame, TRTH normalized book data (and np.ndarray, closing state, if return_state)
+        (and pd.DataFrame, summary, if summary)
+    """
+
+    # FILTER DATA TO INCLUDE ONLY TIMESTAMP OR RELEVANT FID . . . . . . . . . .
+
+    with profile_stage("filter", rows_in=len(data)) as record:
+        # map 'FID Name' values to integer column codes, -1 if not listed in the dictionary keys
+        fidname_list = list(mapping.keys())
+        fidname_code = pd.Categorical(data["FID Name"], categories=fidname_list).codes
+        has_timestamp = data["Date-Time"].notna().to_numpy()
+
+        # filter for relevant rows that have (1) a timestamp, or (2) a 'FID Name' value listed in the dictionary keys
+        is_relevant = has_timestamp | (fidname_code >= 0)
+        # row labels as assigned by `data.reset_index(drop=True)` in the pandas engine
+        row_label = np.cumsum(is_relevant) - 1
+
+        # store information about relevant rows in filtered arrays
+        is_update_state = has_timestamp[is_relevant]
+        fidname_code = fidname_code[is_relevant]
+        fidvalue = pd.to_numeric(data["FID Value"], errors="coerce").to_numpy(dtype=float)[is_relevant]
+
+        # assign each row to its UPDATE STATE, rows before the first UPDATE STATE are disregarded (-1)
+        group = np.cumsum(is_update_state) - 1
+        num_groups = int(is_update_state.sum())
+        num_columns = len(fidname_list)
+        record["rows_out"] = len(fidname_code)
+
+    # SCATTER FID VALUES INTO ONE ROW PER UPDATE STATE . . . . . . . . . . . .
+
+    with profile_stage("scatter", rows_in=len(fidname_code)) as record:
+        # select rows of type FID, keep only the first value per (UPDATE STATE, 'FID Name')
+        fid_index = np.flatnonzero(~is_update_state & (group >= 0))
+        cell = group[fid_index] * num_columns + fidname_code[fid_index]
+        fid_index = fid_index[~pd.Series(cell).duplicated(keep="first").to_numpy()]
+
+        # special case: if 'FID Name' exists and 'FID Value' is NaN, set to 0
+        values = fidvalue[fid_index]
+        values[np.isnan(values)] = 0
+
+        # scatter values only into UPDATE STATEs that have at least one 'FID Name' (non-empty),
+        # row 0 holds the CURRENT STATE before the first UPDATE STATE (seed)
+        is_nonempty = np.bincount(group[fid_index], minlength=num_groups) > 0
+        rank = np.cumsum(is_nonempty)
+        num_nonempty = int(is_nonempty.sum())
+        book = np.full((num_nonempty + 1, num_columns), np.nan, order="F")
+        if state is not None:
+            book[0, :] = state
+        book[rank[group[fid_index]], fidname_code[fid_index]] = values
+        record["rows_out"] = num_nonempty
+
+    # FORWARD-FILL MISSINGS . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    with profile_stage("fill", rows_in=num_nonempty) as record:
+        # forward-fill unchanged values with previous value, column by column
+        row_number = np.arange(num_nonempty + 1)
+        for j in range(num_columns):
+            column = book[:, j]
+            index = np.where(np.isnan(column), 0, row_number)
+            np.maximum.accumulate(index, out=index)
+            book[:, j] = column[index]
+
+        # map each UPDATE STATE to its CURRENT STATE, empty UPDATE STATEs take the next non-empty one,
+        # trailing empty UPDATE STATEs keep the last one
+        source = np.cumsum(is_nonempty) - is_nonempty + 1
+        source = np.minimum(source, num_nonempty)
+        record["rows_out"] = num_groups
+
+    """
+    book (seed + non-empty only)          source (per UPDATE STATE)
+    --------------------------------      -------------------------
+    NaN     NaN     NaN                   -   <- seed, empty book by default
+    123     234     345                   1   <- UPDATE STATE
+    123.1   234     345.1                 2   <- UPDATE STATE, empty
+    123.1   234     345.1                 2   <- UPDATE STATE
+    ...
+
+    Each UPDATE STATE corresponds to a row in the (much smaller) book array,
+    rows are only materialized for the output after filtering below.
+    """
+
+    # CAST TO COMPACT LAYOUT . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    # book levels exclude TIMACT_MS, NaN is kept as a flag per row since integers have no NaN
+    timact, closing = book[:, 0], book[-1, :].copy()
+    book_levels = book[:, 1:]
+    has_nan = np.isnan(book_levels).any(axis=1)
+    if compact:
+        with profile_stage("compact", rows_in=num_nonempty + 1) as record:
+            timact = timact.copy()
+            book_levels, decimals = _compact_book_array(book_levels, list(mapping.values())[1:])
+            book = None # release float array
+            record["rows_out"] = len(book_levels)
+
+    # REMOVE ROWS WITHOUT EXCHANGE-BASED TIMESTAMP AND DUPLICATES . . . . . . .
+
+    with profile_stage("dedup", rows_in=num_groups) as record:
+        # remove rows with missing timestamp (sometimes happens when value for TIMACT_MS is missing)
+        is_missing_timact = np.isnan(timact[source])
+        selected = np.flatnonzero(~is_missing_timact)
+        source = source[selected]
+
+        # compare consecutive CURRENT STATEs (NaN is never equal, as in pandas), exclude TIMACT_MS
+        has_change_next = np.ones(num_nonempty + 1, dtype=bool)
+        has_change_next[:-1] = (book_levels[:-1] != book_levels[1:]).any(axis=1) | has_nan[:-1] | has_nan[1:]
+
+        # remove duplicate book states (sometimes happens in original data), keep last
+        # note that consecutive rows share the same source or have adjacent sources
+        is_last = np.ones(len(source), dtype=bool)
+        is_same_source = source[1:] == source[:-1]
+        is_last[:-1] = np.where(is_same_source, has_nan[source[:-1]], has_change_next[source[:-1]])
+        selected = selected[is_last]
+        source = source[is_last]
+        record["rows_out"] = len(selected)
+
+    # count UPDATE STATEs and those without TIMACT_MS per ('#RIC', calendar date), for the summary
+    if summary:
+        with profile_stage("summary", rows_in=num_groups) as record:
+            header = data[["#RIC", "Date-Time"]].iloc[np.flatnonzero(is_relevant)[is_update_state]]
+            counts = pd.DataFrame({
+                "#RIC": np.asarray(header["#RIC"]).astype(object),
+                "Date": pd.DatetimeIndex(header["Date-Time"]).tz_localize(None).normalize(),
+                "Missing TIMACT_MS": is_missing_timact,
+            })
+            counts = counts.groupby(["#RIC", "Date"], sort=False).agg(**{
+                "Updates": ("Missing TIMACT_MS", "size"),
+                "Missing TIMACT_MS": ("Missing TIMACT_MS", "sum"),
+            }).reset_index()
+            record["rows_out"] = len(counts)
+
+    # MERGE DATA & BOOK COLUMNS . . . . . . . . . . . . . . . . . . . . . . . .
+
+    with profile_stage("merge", rows_in=len(selected)) as record:
+        # filter data rows to include only those of type UPDATE STATE that have been selected
+        data_index = np.flatnonzero(is_relevant)[is_update_state][selected]
+        data = data[["#RIC", "Date-Time", "GMT Offset"]].iloc[data_index]
+        record["rows_out"] = len(data)
+
+    with profile_stage("timestamp", rows_in=len(data)) as record:
+        # make timestamp column timezone-unaware
+        datetime = pd.DatetimeIndex(data["Date-Time"]).tz_localize(None)
+
+        # add 'Date-Time-Exch' (integer-based, midnight plus milliseconds)
+        nanoseconds = datetime.asi8
+        milliseconds = timact[source].astype(np.int64)
+        datetime_exch = _get_datetime_exch(nanoseconds, milliseconds)
+        record["rows_out"] = len(datetime_exch)
+
+    with profile_stage("cast", rows_in=len(data)) as record:
+        # include 'Date-Time-Exch' in cols_base, 'GMT Offset' as small integer, stringified for .csv files only
+        cols_base = {
+            "#RIC": data["#RIC"].to_numpy(),
+            "Type": "Reconstructed LL2",
+            "Date-Time": datetime.to_numpy(),
+            "Date-Time-Exch": datetime_exch.view("datetime64[ns]"),
+            "GMT Offset": data["GMT Offset"].to_numpy().astype(np.int8),
+        }
+        if compact:
+            cols_base["Price Decimals"] = np.full(len(data), decimals, dtype=np.int8)
+
+        # POST-PROCESS BOOK . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+        # columns 1 to 60 are book (for all 10 levels and fields), 0 is TIMACT_MS
+        cols_book = {}
+        for j, col in enumerate(list(mapping.values())[1:]):
+            # compact layout: integers already, NaN is 0
+            if compact:
+                cols_book[col] = book_levels[source, j]
+                continue
+            # fill remaining NaN values with 0
+            values = np.nan_to_num(book_levels[source, j], nan=0)
+            # ensure integer datatype for 'size' and 'no' columns, float datatype for 'price' columns
+            if any(substring in col.lower() for substring in ["size", "no"]):
+                values = values.astype(int)
+            cols_book[col] = values
+
+        # order book features, computed from the book arrays before these are copied into the DataFrame,
+        # in compact layout prices are scaled by 'Price Decimals'
+        cols_feature = compute_book_features({**cols_base, **cols_book}, features=features) if features else {}
+
+        # ensure desired column order
+        full = pd.DataFrame({**cols_base, **cols_book, **cols_feature}, index=row_label[data_index])
+        record["rows_out"] = len(full)
+
+    # . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    # closing state is the CURRENT STATE after the last UPDATE STATE, summary per ('#RIC', calendar date)
+    result = [full]
+    if return_state:
+        result.append(closing)
+    if summary:
+        with profile_stage("summary", rows_in=len(full)) as record:
+            result.append(summarize_book(full, counts=counts))
+            record["rows_out"] = len(result[-1])
+
+    return tuple(result) if len(result) > 1 else full
+
+def _get_datetime_exch(nanoseconds:np.ndarray, milliseconds:np.ndarray):
+    """
+    Construct 'Date-Time-Exch' from 'Date-Time' and TIMACT_MS using integer
+    arithmetic only, i.e. midnight (UTC) of 'Date-Time' plus TIMACT_MS.
+
+    TIMACT_MS is the exchange time since midnight, and 'Date-Time' is
+    recorded slightly after the exchange time, so both may fall on different
+    days around midnight (rollover). If the exchange time is more than half a
+    day after (before) 'Date-Time', it belongs to the previous (next) day.
+
+    :param nanoseconds:
+        np.ndarray, 'Date-Time' (UTC) in nanoseconds since epoch, int64
+    :param milliseconds:
+        np.ndarray, TIMACT_MS in milliseconds since midnight (UTC), int64
+    :return datetime_exch:
+        np.ndarray, 'Date-Time-Exch' (UTC) in nanoseconds since epoch, int64
+    """
+
+    # ...
+    datetime_exch = nanoseconds - nanoseconds % NANOSECONDS_PER_DAY + milliseconds * 1_000_000
+
+    """
+    Date-Time                  TIMACT_MS        Date-Time-Exch
+    -----------------------    -------------    -----------------------
+    2021-01-05 00:00:00.002    86399999         2021-01-04 23:59:59.999    <- previous day
+    2021-01-04 23:59:59.999    1                2021-01-05 00:00:00.001    <- next day (clock skew)
+    """
+
+    # move exchange time to the previous or next day in case of midnight rollover
+    distance = datetime_exch - nanoseconds
+    datetime_exch -= NANOSECONDS_PER_DAY * (distance > NANOSECONDS_PER_DAY // 2)
+    datetime_exch += NANOSECONDS_PER_DAY * (distance < - NANOSECONDS_PER_DAY // 2)
+
+    return datetime_exch
+
+def compact_book(full:pd.DataFrame):
+    """
+    Convert TRTH normalized book data into a compact layout that takes about
+    half the memory. Prices are stored as integer ticks, i.e. price times
+    10**'Price Decimals' where 'Price Decimals' is the smallest number of
+    decimals that represents all prices of a given '#RIC' without loss.
+    Ticks, sizes and order counts are stored as int32 where all values fit,
+    '#RIC' and 'Type' as categoricals, and 'GMT Offset' as int8.
+
+    Data that is in compact layout already, e.g. partitions compacted by the
+    numpy engine with their own 'Price Decimals', is rescaled to the largest
+    number of decimals per '#RIC'.
+
+    :param full:
+        pd.DataFrame, TRTH normalized book data (regular or compact layout)
+    :return full:
+        pd.DataFrame, TRTH normalized book data (compact)
+    """
+
+    # book columns only, order book features (if any) are kept as is
+    full = full.copy(deep=False)
+    cols_book = [col for col in full.columns if col in MAPPING_FIDNAME_TO_COLUMN.values()]
+    cols_price = [col for col in cols_book if "price" in col.lower()]
+    cols_int = [col for col in cols_book 
+        if any(substring in col.lower() for substring in ["size", "no"])
     ]
-    
-    # process chunk by chunk to save memory
-    chunk_list = []    
-    for i, (start_index, end_index) in enumerate(change_index_list, 1):
-        
-        print("process chunk {}".format(i))
-        chunk = data.iloc[start_index:end_index]
-        chunk_list.append(reconstruct_book(chunk))
-    
-    # concatenate
-    data = pd.concat(chunk_list, axis=0)
-    
-    return data
 
-@time_decorator
-def load_df(path:str, nrows=None): # as .csv(.gz)
+    # CATEGORICAL AND SMALL INTEGER BASE COLUMNS . . . . . . . . . . . . . . . .
 
-    # parse nrows string to support both input of form "1000" and "1e3"
-    if nrows is not None:
-        nrows = int(float(nrows))
-    
-    # load df using datatable (multi-threaded!), then transform to pandas
-    df = dt.fread(path, max_nrows=nrows, verbose=False,
-        fill=True, # fill missing fields (happens in RAW LEGACY data)
-        na_strings=[""], # make datatable.fread parse empty strings as NaNs
-    ).to_pandas()
-    
-    # load df using pandas (single-threaded!)
-    # df_cols = pd.read_csv(path, nrows=1).columns # peek at column names
-    # df = pd.read_csv(path, nrows=nrows,
-    #     names=df_cols, header=0, # ensure that all columns are identical per row
-    #     na_values=[""], # make pd.read_csv parse empty strings as NaNs
-    # )
-    
-    # parse datetime using pandas
-    df[DATETIME] = pd.to_datetime(df[DATETIME])
+    # ...
+    full["#RIC"] = full["#RIC"].astype("category")
+    full["Type"] = full["Type"].astype("category")
 
-    return df
+    # parse 'GMT Offset' strings (e.g. '+1') once per unique value
+    gmt_offset = full["GMT Offset"]
+    full["GMT Offset"] = gmt_offset.map({x: int(x) for x in gmt_offset.unique()}).astype(np.int8)
 
-@time_decorator
-def save_df(df:pd.DataFrame, path:str): # as .csv(.gz)
+    # DETERMINE PRICE DECIMALS PER RIC . . . . . . . . . . . . . . . . . . . . .
 
-    # datatable: fast, but may cause error!
-    dt.Frame(df).to_csv(path=path, compression="gzip")
+    # find the smallest number of decimals per row such that all prices are integral, unless compact already
+    is_compact = "Price Decimals" in full.columns
+    if is_compact:
+        decimals = full["Price Decimals"].to_numpy()
+    else:
+        decimals = _get_price_decimals(full[cols_price].to_numpy(dtype=float))
     
-    # pandas: reliable but slow
-    # df.to_csv(path, compression="gzip", index=False)
+    # use the same number of decimals for all rows of a given '#RIC'
+    ric_code = full["#RIC"].cat.codes.to_numpy()
+    decimals_ric = pd.Series(decimals).groupby(ric_code).max()
+    full["Price Decimals"] = decimals_ric.reindex(ric_code).to_numpy().astype(np.int8)
 
-# ...
-if __name__ == "__main__":
-    
-    # instantiate argument parser
-    parser = argparse.ArgumentParser("reconstruct_book")
-    parser.add_argument("--path", type=str, help="specify filepath", default="...")
-    parser.add_argument("--nrows", type=str, help="number of rows to read", default=None)
+    # CAST BOOK COLUMNS . . . . . . . . . . . . . . . . . . . . . . . . . . . .
 
-    # parse args
-    args = parser.parse_args()
+    # prices as integer ticks, column by column to limit peak memory, ticks of fewer decimals are rescaled
+    if is_compact:
+        factor = 10 ** (full["Price Decimals"].to_numpy().astype(np.int64) - decimals)
+        for col in cols_price:
+            full[col] = _downcast_int(full[col].to_numpy().astype(np.int64) * factor)
+    else:
+        scale = 10.0 ** full["Price Decimals"].to_numpy()
+        for col in cols_price:
+            full[col] = _downcast_int(np.rint(full[col].to_numpy() * scale).astype(np.int64))
 
-    # load df
-    data = load_df(
-        path=args.path, # "./test_files/DB_Raw.csv"
-        nrows=int(float(args.nrows)) if args.nrows is not None else None,
-    )
-    
-    # reconstruct book
-    print("start reconstructing LL2 data ...")
-    data = chunkwise_reconstruct_book(data) # data = reconstruct_book(data)
-    print("... done reconstructing LL2 data")
+    # sizes and order counts
+    for col in cols_int:
+        full[col] = _downcast_int(full[col].to_numpy().astype(np.int64))
 
-    # save df into same directory
-    save_df(
-        df=data,
-        path=args.path.replace(".csv.gz", "_reconstructed.csv.gz"),
-    )
+    # ensure desired column order, 'Price Decimals' follows base columns
+    cols_base = ["#RIC", "Type", "Date-Time", "Date-Time-Exch", "GMT Offset", "Price Decimals"]
+    full = full[cols_base + [col for col in full.columns if col not in cols_base]]
+
+    return full
+
+def expand_book(full:pd.DataFrame):
+    """
+    Convert TRTH normalized book data from compact layout (see `compact_book`)
+    back into the regular layout, e.g. to write .csv files. Data that is not
+    in compact layout is returned as is.
+
+    :param full:
+        pd.DataFrame, TRTH normalized book data (compact)
+    :return full:
+        pd.DataFrame, TRTH normalized book data
+    """
+
+    # ...
+    if "Price Decimals" not in full.columns:
+        return full
+    full = full.copy(deep=False)
+    cols_book = [col for col in full.columns if col in MAPPING_FIDNAME_TO_COLUMN.values()]
+    cols_price = [col for col in cols_book if "price" in col.lower()]
+    cols_int = [col for col in cols_book 
+        if any(substring in col.lower() for substring in ["size", "no"])
+    ]
+
+    # prices from integer ticks
+    scale = 10.0 ** full["Price Decimals"].to_numpy()
+    for col in cols_price:
+        full[col] = full[col].to_numpy() / scale
+    for col in cols_int:
+        full[col] = full[col].astype(int)
+
+    # ...
+    full["#RIC"] = full["#RIC"].astype(object)
+    full["Type"] = full["Type"].astype(object)
+    full = full.drop(["Price Decimals"], axis=1)
+
+    return full
+
+def _get_price_decimals(prices:np.ndarray):
+    """
+    Get the smallest number of decimals per row such that all prices of the
+    row are integral, at most MAX_PRICE_DECIMALS. NaN counts as integral.
+
+    :param prices:
+        np.ndarray, float, one row per update and one column per price column
+    :return decimals:
+        np.ndarray, int8, number of decimals per row
+    """
+
+    # ...
+    decimals = np.full(len(prices), MAX_PRICE_DECIMALS, dtype=np.int8)
+    is_open = np.ones(len(prices), dtype=bool)
+    for k in range(MAX_PRICE_DECIMALS):
+        scaled = np.nan_to_num(prices[is_open]) * 10**k
+        is_integral = (np.abs(scaled - np.rint(scaled)) < 1e-6).all(axis=1)
+        decimals[np.flatnonzero(is_open)[is_integral]] = k
+        is_open[np.flatnonzero(is_open)[is_integral]] = False
+
+    return decimals
+
+def _compact_book_array(book_levels:np.ndarray, cols:list):
+    """
+    Cast a book array to compact layout (see `compact_book`), i.e. prices to
+    integer ticks given the smallest number of decimals that represents all
+    of them, NaN to 0. int32 if all values fit, else int64, column by column
+    to limit peak memory.
+
+    :param book_levels:
+        np.ndarray, float, one row per CURRENT STATE and one column per book column, row 0 is the seed,
+        which is not part of the output and hence does not count for 'Price Decimals'
+    :param cols:
+        list, names of the book columns
+    :return book_levels, decimals:
+        np.ndarray, integer; int, 'Price Decimals'
+    """
+
+    # ...
+    # smallest number of decimals across price columns, each column is checked from the decimals found so far
+    is_price = np.array(["price" in col.lower() for col in cols], dtype=bool)
+    decimals = 0
+    for j in np.flatnonzero(is_price):
+        prices = np.nan_to_num(book_levels[1:, j])
+        while decimals < MAX_PRICE_DECIMALS:
+            scaled = prices * 10**decimals
+            if (np.abs(scaled - np.rint(scaled)) < 1e-6).all():
+                break
+            decimals += 1
+    scale = np.where(is_price, 10.0 ** decimals, 1.0)
+
+    # ...
+    maximum = max([np.abs(np.nan_to_num(book_levels[:, j])).max(initial=0) * scale[j] for j in range(len(cols))], default=0)
+    ticks = np.empty(book_levels.shape, dtype=np.int32 if maximum <= np.iinfo(np.int32).max else np.int64, order="F")
+    for j in range(len(cols)):
+        ticks[:, j] = np.rint(np.nan_to_num(book_levels[:, j]) * scale[j])
+
+    return ticks, decimals
+
+def _downcast_int(values:np.ndarray):
+    """
+    Downcast int64 values to int32 if all of them fit.
+    """
+
+    # ...
+    info = np.iinfo(np.int32)
+    if not len(values) or (values.min() >= info.min and values.max() <= info.max):
+        return values.astype(np.int32)
+
+    return values
+
+def _stringify_gmt_offset(full:pd.DataFrame):
+    """
+    Stringify 'GMT Offset' (e.g. 1 as '+1', -5 as '-5') as in TRTH raw data,
+    once per unique value. Applied when writing .csv files only, in memory
+    'GMT Offset' is a small integer.
+    """
+
+    # ...
+    full = full.copy(deep=False)
+    gmt_offset = full["GMT Offset"].astype(int)
+    full["GMT Offset"] = gmt_offset.map({x: f"+{x}" if x >= 0 else f"{x}" for x in gmt_offset.unique()})
+
+    return full
+
+def _reconstruct_chunk_shared(arrays:dict, state, labels, ric_categories:list, engine="numpy", depth=None, fields=None, features=None,
+    summary=False, compact=False,
+):
+    """
+    Reconstruct a chunk of TRTH raw legacy data given as arrays, to be
+    executed within a worker process (see `parallel_map`).
+
+    :param arrays:
+        dict, relevant columns of the chunk, '#RIC' and 'FID Name' as codes, 'Date-Time' as int64
+    :param state:
+        np.ndarray, seed of the partition (see `partition_raw_data`)
+    :param labels:
+        dict, description of the chunk if it is to be profiled, else None
+    :param ric_categories:
+        list, categories of the '#RIC' codes
+    :return (full, summary), record_list:
+        pd.DataFrame, TRTH normalized book data, and summary (or None); list, profiler records
+    """
+
+    # rebuild relevant columns, 'Date-Time' is timezone-unaware already
+    chunk = pd.DataFrame({
+        "#RIC": pd.Categorical.from_codes(arrays["#RIC"], categories=ric_categories),
+        "Date-Time": arrays["Date-Time"].view("datetime64[ns]"),
+        "GMT Offset": arrays["GMT Offset"],
+        "FID Name": pd.Categorical.from_codes(arrays["FID Name"], categories=list(select_mapping(depth, fields).keys())),
+        "FID Value": arrays["FID Value"],
+    })
+
+    # reconstruct, profile within this worker process if requested
+    if labels is None:
+        return _reconstruct_chunk(chunk, engine=engine, state=state, depth=depth, fields=fields, features=features, summary=summary,
+            compact=compact,
+        ), []
+    with Profiler() as profiler:
+        with profiler.stage("chunk", rows_in=len(chunk), pid=os.getpid(), **labels) as record:
+            full, summary = _reconstruct_chunk(chunk, engine=engine, state=state, depth=depth, fields=fields, features=features,
+                summary=summary, compact=compact,
+            )
+            record["rows_out"] = len(full)
+
+    return (full, summary), profiler.records
+
+def _reconstruct_chunk(chunk:pd.DataFrame, summary=False, **kwargs):
+    """
+    Reconstruct a chunk of TRTH raw legacy data (see `reconstruct_book`).
+
+    :return full, summary:
+        pd.DataFrame, TRTH normalized book data; pd.DataFrame, summary (None unless summary)
+    """
+
+    # ...
+    if summary:
+        return reconstruct_book(chunk, summary=True, **kwargs)
+
+    return reconstruct_book(chunk, **kwargs), None
+
+def partition_raw_data(data:pd.DataFrame, seed=True, depth=None, fields=None):
+    """
+    Partition TRTH raw legacy data by ('#RIC', calendar date) so that each
+    partition contains the UPDATE STATEs of a single instrument and day.
+    Partitions are ordered by '#RIC' (order of first appearance) and date.
+
+    Each partition may be seeded with the closing book state of the previous
+    partition of the same '#RIC'. Seeds are computed in a single pass over
+    the last value per 'FID Name' and partition, without reconstructing the
+    book, so that partitions become independent units of work. TIMACT_MS is
+    not carried over as the exchange time of the previous day is meaningless
+    for the next one.
+
+    :param data:
+        pd.DataFrame, TRTH raw legacy data
+    :param seed:
+        bool, whether to seed each partition with the closing book state, default is True
+    :param depth:
+        int, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, include fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+    :return partition_list:
+        list, tuples of (key, row_index, state) where key is ('#RIC', date),
+        row_index the positions of rows in data, and state the seed (or None)
+    """
+
+    # ASSIGN EACH UPDATE STATE TO A PARTITION . . . . . . . . . . . . . . . . .
+
+    # assign each row to its UPDATE STATE, rows before the first UPDATE STATE are disregarded (-1)
+    has_timestamp = data["Date-Time"].notna().to_numpy()
+    header_index = np.flatnonzero(has_timestamp)
+    group = np.cumsum(has_timestamp) - 1
+
+    # partition UPDATE STATEs by '#RIC' (order of first appearance) and calendar date (wall time)
+    ric_code, ric_list = pd.factorize(data["#RIC"].to_numpy()[header_index])
+    date = pd.DatetimeIndex(data["Date-Time"].iloc[header_index]).tz_localize(None).normalize()
+    key = pd.DataFrame({"#RIC": ric_code, "date": date})
+    group_partition = key.groupby(["#RIC", "date"], sort=True).ngroup().to_numpy()
+    partition_key = key.drop_duplicates().sort_values(["#RIC", "date"]).to_numpy()
+
+    # gather rows per partition, preserving their order
+    row_partition = np.where(group >= 0, group_partition[np.maximum(group, 0)], -1)
+    row_index = np.argsort(row_partition, kind="stable")
+    row_index = row_index[row_partition[row_index] >= 0]
+    row_index_list = np.split(row_index, np.cumsum(np.bincount(row_partition[row_index]))[:-1])
+
+    # COMPUTE SEED PER PARTITION . . . . . . . . . . . . . . . . . . . . . . .
+
+    num_partitions = len(partition_key)
+    mapping = select_mapping(depth=depth, fields=fields)
+    num_columns = len(mapping)
+    state = np.full((num_partitions, num_columns), np.nan)
+    if seed and num_partitions:
+
+        # select rows of type FID, keep only the first value per (UPDATE STATE, 'FID Name'), as the engines do
+        fidname_code = pd.Categorical(data["FID Name"], categories=list(mapping.keys())).codes
+        fid_index = np.flatnonzero(~has_timestamp & (group >= 0) & (fidname_code >= 0))
+        fid = pd.DataFrame({
+            "group": group[fid_index],
+            "partition": row_partition[fid_index],
+            "code": fidname_code[fid_index],
+            "value": pd.to_numeric(data["FID Value"].iloc[fid_index], errors="coerce").fillna(0).to_numpy(),
+        })
+        fid = fid.drop_duplicates(["group", "code"], keep="first")
+
+        # keep the last value per (partition, 'FID Name'), i.e. the closing update of each partition
+        fid = fid.drop_duplicates(["partition", "code"], keep="last")
+        closing = np.full((num_partitions, num_columns), np.nan)
+        closing[fid["partition"].to_numpy(), fid["code"].to_numpy()] = fid["value"].to_numpy()
+        closing = pd.DataFrame(closing)
+
+        # seed is the closing state of the previous partition of the same '#RIC'
+        partition_ric = partition_key[:, 0]
+        closing = closing.groupby(partition_ric).ffill()
+        state = closing.groupby(partition_ric).shift(1).to_numpy()
+        state[:, 0] = np.nan # do not carry over TIMACT_MS
+
+    return [((ric_list[ric], date), row_index, state[i] if seed else None)
+        for i, ((ric, date), row_index) in enumerate(zip(partition_key, row_index_list))
+    ]
+
+@profile_decorator
+def chunkwise_reconstruct_book(data:pd.DataFrame, engine="numpy", workers=1, seed=True, compact=False, depth=None, fields=None, cache_dir=None, source=None,
+    features=None, summary=False,
+):
+    """
+    Reconstruct TRTH book partition by partition ('#RIC', calendar date),
+    either serially or using a pool of worker processes. Workers do not
+    receive pickled DataFrames, but attach to the relevant columns encoded as
+    numeric arrays in shared memory, largest partitions are scheduled first.
+    The pool is started and the arrays are copied per call, so workers only
+    pay off if partitions are large and cores are idle. Keep the default
+    unless a profile (see `Profiler`) on the target machine shows a speed-up.
+
+    Optionally, each reconstructed partition is stored in a content-addressed
+    cache directory (e.g. on `/_shared_storage`) as soon as it is done, such
+    that re-runs, other users and interrupted jobs skip partitions that have
+    been reconstructed before (see `_get_cache_path`).
+
+    :param data:
+        pd.DataFrame, TRTH raw legacy data
+    :param engine:
+        str, reconstruction engine, default is "numpy"
+    :param workers:
+        int, number of worker processes, default is 1 (serial, no process pool)
+    :param seed:
+        bool, whether to seed each partition with the closing book state of
+        the previous one, default is True
+    :param compact:
+        bool, whether to return the compact layout (see `compact_book`), default is False
+    :param depth:
+        int, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, include fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+    :param cache_dir:
+        str, path to cache directory, default is None (no cache)
+    :param source:
+        str, identifier of the raw data, e.g. `hash_file(path)`, default is None (hash of data)
+    :param features:
+        list, append order book features per partition, e.g. ["mid", "spread"] (see `compute_book_features`),
+        default is None
+    :param summary:
+        bool, whether to also return a summary per partition, computed while each partition is in memory
+        (numpy engine only, see `summarize_book`), default is False
+    :return data:
+        pd.DataFrame, TRTH normalized book data (and pd.DataFrame, summary, if summary)
+    """
+
+    # determine partitions by ('#RIC', calendar date)
+    partition_list = partition_raw_data(data, seed=seed, depth=depth, fields=fields)
+    chunk_list = [None] * len(partition_list)
+    summary_list = [None] * len(partition_list)
+
+    # without cache, reconstruct all partitions
+    if cache_dir is None:
+        for i, chunk, summary_list[i] in _reconstruct_partitions(data, partition_list, range(len(partition_list)), engine=engine, workers=workers, depth=depth, fields=fields, features=features, summary=summary, compact=compact):
+            chunk_list[i] = chunk
+
+    # with cache, reconstruct only partitions that are not cached, wait for those locked by another job
+    else:
+        if source is None:
+            source = _hash_data(data)
+        mapping = select_mapping(depth=depth, fields=fields)
+        path_list = [_get_cache_path(cache_dir, source, key, seed=seed, mapping=mapping, features=features, compact=compact) for key, _, _ in partition_list]
+        token = _get_lock_token()
+        locked_set = set()
+
+        def read(i):
+            with profile_stage("cache", **_get_chunk_labels(partition_list, i)) as record:
+                chunk_list[i], counts = _read_cache(path_list[i], return_counts=True)
+                if summary and chunk_list[i] is not None:
+                    summary_list[i] = _summarize_cached(chunk_list[i], partition_list[i][0], counts)
+                record["rows_out"] = len(chunk_list[i]) if chunk_list[i] is not None else 0
+            return chunk_list[i] is not None
+
+        try:
+            pending_list = [i for i in range(len(partition_list)) if not read(i)]
+            while pending_list:
+
+                # lock only as many partitions as are reconstructed next, re-read after locking as
+                # another job may have written the entry in the meantime
+                batch_list, waiting_list = [], []
+                for i in pending_list:
+                    if len(batch_list) < max(workers, 1) and _acquire_lock(path_list[i], token):
+                        locked_set.add(path_list[i])
+                        if read(i):
+                            _release_lock(path_list[i], token)
+                            locked_set.discard(path_list[i])
+                        else:
+                            batch_list.append(i)
+                    else:
+                        waiting_list.append(i)
+
+                # store each partition as soon as it is done, so that an interrupted job resumes here
+                if batch_list:
+                    with _refresh_locks(locked_set, token):
+                        for i, chunk, summary_list[i] in _reconstruct_partitions(data, partition_list, batch_list, engine=engine, workers=workers, depth=depth, fields=fields, features=features, summary=summary, compact=compact):
+                            chunk_list[i] = chunk
+                            _write_cache(path_list[i], chunk, summary=summary_list[i])
+                            _release_lock(path_list[i], token)
+                            locked_set.discard(path_list[i])
+
+                # all remaining partitions are locked by another job, wait for one of them
+                elif waiting_list:
+                    _wait_for_lock(path_list[waiting_list[0]])
+
+                # partitions written by another job are done, others are retried (e.g. if that job failed)
+                pending_list = [i for i in waiting_list if not read(i)]
+        finally:
+            for path in locked_set:
+                _release_lock(path, token)
+    
+    # concatenate
+    data = pd.concat(chunk_list, axis=0)
+    
+    # use compact layout, chunks are compact already, price decimals are determined per '#RIC' across all chunks
+    if compact:
+        data = compact_book(data)
+
+    # summary, one row per partition
+    if summary:
+        return data, pd.concat(summary_list, axis=0, ignore_index=True)
+    
+    return data
+
+def _summarize_cached(chunk:pd.DataFrame, key:tuple, counts=None):
+    """
+    Summarize a partition read from the cache, given the counts stored with
+    the cache entry (see `_write_cache`). Entries written without summary do
+    not include counts, these columns are NaN then.
+    """
+
+    # ...
+    ric, date = key
+    counts = counts or {"Updates": np.nan, "Missing TIMACT_MS": np.nan}
+
+    return summarize_book(chunk, counts=pd.DataFrame([{"#RIC": ric, "Date": pd.Timestamp(date), **counts}]))
+
+def _reconstruct_partitions(data:pd.DataFrame, partition_list:list, index_list:list, engine="numpy", workers=1, depth=None, fields=None,
+    features=None, summary=False, compact=False,
+):
+    """
+    Reconstruct the given partitions of TRTH raw legacy data, either serially
+    or using a pool of worker processes (see `chunkwise_reconstruct_book`).
+
+    :param data:
+        pd.DataFrame, TRTH raw legacy data
+    :param partition_list:
+        list, partitions as returned by `partition_raw_data`
+    :param index_list:
+        list, positions of the partitions to reconstruct
+    :param summary:
+        bool, whether to summarize each partition, default is False
+    :param compact:
+        bool, whether to return each partition in compact layout, default is False
+    :return generator:
+        tuples of (position, chunk, summary), in order of index_list, summary is None unless summary
+    """
+
+    # process chunk by chunk to save memory
+    if workers <= 1:
+        for i in index_list:
+            key, row_index, state = partition_list[i]
+            with profile_stage("chunk", rows_in=len(row_index), **_get_chunk_labels(partition_list, i)) as record:
+                chunk = data.iloc[row_index]
+                chunk, chunk_summary = _reconstruct_chunk(chunk, engine=engine, state=state, depth=depth, fields=fields, features=features,
+                    summary=summary, compact=compact,
+                )
+                record["rows_out"] = len(chunk)
+            yield i, chunk, chunk_summary
+        return
+
+    # process chunks in parallel, results are returned in order
+    
+    # reorder rows such that each partition is a contiguous slice
+    row_index = np.concatenate([partition_list[i][1] for i in index_list] + [np.array([], dtype=int)])
+    change_index = np.cumsum([0] + [len(partition_list[i][1]) for i in index_list])
+    
+    ric = pd.Categorical(data["#RIC"])
+    arrays = {
+        "#RIC": ric.codes[row_index],
+        "Date-Time": pd.DatetimeIndex(data["Date-Time"]).tz_localize(None).asi8[row_index],
+        "GMT Offset": data["GMT Offset"].to_numpy(dtype=float)[row_index],
+        "FID Name": pd.Categorical(data["FID Name"], categories=list(select_mapping(depth, fields).keys())).codes[row_index],
+        "FID Value": pd.to_numeric(data["FID Value"], errors="coerce").to_numpy(dtype=float)[row_index],
+    }
+
+    # arrays are shared with the worker processes (see `parallel_map`), release them here
+    result_iter = parallel_map(_reconstruct_chunk_shared, arrays,
+        bounds=list(zip(change_index[:-1], change_index[1:])),
+        chunk_args=[(partition_list[i][2], _get_chunk_labels(partition_list, i) if Profiler.active is not None else None) for i in index_list],
+        workers=workers,
+        submit_order=np.argsort(-np.diff(change_index), kind="stable"),
+        ric_categories=list(ric.categories),
+        engine=engine,
+        depth=depth,
+        fields=fields,
+        features=features,
+        summary=summary,
+        compact=compact,
+    )
+    del arrays
+
+    # submit largest partitions first, but collect results in order, profile workers if profiled here
+    for j, ((chunk, chunk_summary), record_list) in result_iter:
+        for record in record_list:
+            Profiler.active.add(record)
+        yield index_list[j], chunk, chunk_summary
+
+def _get_chunk_labels(partition_list:list, i:int):
+    """
+    Describe a partition for profiler records, e.g. to display progress.
+    """
+
+    # ...
+    (ric, date), _, _ = partition_list[i]
+
+    return {"chunk": i+1, "chunks": len(partition_list), "ric": str(ric), "date": str(pd.Timestamp(date).date())}
+
+def extract_products(data:pd.DataFrame, products=None, depth=None, fields=None, **kwargs):
+    """
+    Extract several output products from the same TRTH raw legacy data, i.e.
+    the book (see `chunkwise_reconstruct_book`) and events such as trades and
+    quotes (see `extract_events`), such that raw data is read and parsed once
+    (see `load_df` with the same products).
+
+    :param data:
+        pd.DataFrame, TRTH raw legacy data, including all 'FID Name' values of the products
+    :param products:
+        list or dict, products to extract (see `select_products`), default is None (book only)
+    :param depth:
+        int, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, include book fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+    :param kwargs:
+        dict, passed on to `chunkwise_reconstruct_book`, e.g. engine, workers, seed, compact, cache_dir, features, summary
+    :return product_dict:
+        dict, names of products mapped to pd.DataFrame, including "summary" of the book if summary
+    """
+
+    # ...
+    product_dict = {}
+    for name, product in select_products(products, depth=depth, fields=fields).items():
+        if name == "book":
+            product_dict[name] = chunkwise_reconstruct_book(data, depth=depth, fields=fields, **kwargs)
+            if kwargs.get("summary"):
+                product_dict[name], product_dict["summary"] = product_dict[name]
+        else:
+            product_dict[name] = extract_events(data, product)
+
+    return product_dict
+
+@profile_decorator
+def extract_events(data:pd.DataFrame, product:dict):
+    """
+    Extract events (e.g. trades, quotes) from TRTH raw legacy data, i.e. one
+    row per UPDATE STATE that includes any of the product's trigger 'FID
+    Name' values, with the values of all mapped 'FID Name's of this UPDATE
+    STATE. As the engines do, the first value per 'FID Name' and UPDATE STATE
+    wins, and missing 'FID Value's are set to 0.
+
+    Missing values are either forward-filled with the previous event of the
+    same '#RIC' (e.g. quotes) or set to 0 (e.g. trades). 'Date-Time-Exch' is
+    NaT where the exchange time is missing, it is never forward-filled.
+
+    :param data:
+        pd.DataFrame, TRTH raw legacy data
+    :param product:
+        dict, product with 'type', 'mapping' (exchange time first) and, optionally, 'trigger' and 'fill' (see `PRODUCTS`)
+    :return events:
+        pd.DataFrame, '#RIC', 'Type', 'Date-Time', 'Date-Time-Exch', 'GMT Offset' and the mapped columns
+    """
+
+    # ...
+    mapping = product["mapping"]
+    fidname_list = list(mapping.keys())
+    num_columns = len(fidname_list)
+    trigger = product.get("trigger") or fidname_list[1:]
+
+    # map 'FID Name' values to integer column codes, assign each row to its UPDATE STATE
+    fidname_code = pd.Categorical(data["FID Name"], categories=fidname_list).codes
+    has_timestamp = data["Date-Time"].notna().to_numpy()
+    header_index = np.flatnonzero(has_timestamp)
+    group = np.cumsum(has_timestamp) - 1
+
+    # select rows of type FID, keep only the first value per (UPDATE STATE, 'FID Name')
+    fid_index = np.flatnonzero(~has_timestamp & (group >= 0) & (fidname_code >= 0))
+    cell = group[fid_index] * num_columns + fidname_code[fid_index]
+    fid_index = fid_index[~pd.Series(cell).duplicated(keep="first").to_numpy()]
+    fid_group, fid_code = group[fid_index], fidname_code[fid_index]
+
+    # special case: if 'FID Name' exists and 'FID Value' is NaN, set to 0
+    values = pd.to_numeric(data["FID Value"], errors="coerce").to_numpy(dtype=float)[fid_index]
+    values[np.isnan(values)] = 0
+
+    # events are UPDATE STATEs that include any trigger 'FID Name'
+    is_event = np.zeros(len(header_index), dtype=bool)
+    is_event[fid_group[np.isin(fid_code, [fidname_list.index(fidname) for fidname in trigger])]] = True
+    rank = np.cumsum(is_event) - 1
+
+    # scatter values into one row per event
+    is_selected = is_event[fid_group]
+    events = np.full((int(is_event.sum()), num_columns), np.nan)
+    events[rank[fid_group[is_selected]], fid_code[is_selected]] = values[is_selected]
+    header = data[["#RIC", "Date-Time", "GMT Offset"]].iloc[header_index[is_event]]
+
+    # forward-fill missing values per '#RIC', except for the exchange time
+    if product.get("fill"):
+        ric_code = pd.factorize(header["#RIC"].to_numpy())[0]
+        events[:, 1:] = pd.DataFrame(events[:, 1:]).groupby(ric_code).ffill().to_numpy()
+
+    # make timestamp column timezone-unaware, add 'Date-Time-Exch' (integer-based, midnight plus milliseconds)
+    datetime = pd.DatetimeIndex(header["Date-Time"])
+    datetime = datetime.tz_convert(None) if datetime.tz is not None else datetime
+    milliseconds = events[:, 0]
+    datetime_exch = _get_datetime_exch(datetime.asi8, np.nan_to_num(milliseconds).astype(np.int64))
+    datetime_exch[np.isnan(milliseconds)] = NAT
+
+    # 'GMT Offset' as small integer, stringified for .csv files only (see `_stringify_gmt_offset`)
+    gmt_offset = pd.Series(header["GMT Offset"].to_numpy()).astype(np.int8)
+
+    # ...
+    cols_base = {
+        "#RIC": header["#RIC"].to_numpy(),
+        "Type": product["type"],
+        "Date-Time": datetime.to_numpy(),
+        "Date-Time-Exch": datetime_exch.view("datetime64[ns]"),
+        "GMT Offset": gmt_offset.to_numpy(),
+    }
+
+    # fill remaining NaN values with 0, ensure integer datatype for 'size', 'volume' and 'no' columns
+    cols_event = {}
+    for j, col in enumerate(list(mapping.values())[1:], 1):
+        values = np.nan_to_num(events[:, j], nan=0)
+        if any(substring in col.lower() for substring in ["size", "volume", "no"]):
+            values = values.astype(int)
+        cols_event[col] = values
+
+    return pd.DataFrame({**cols_base, **cols_event})
+
+def _hash_data(data:pd.DataFrame):
+    """
+    Compute the SHA-256 hash of the columns of TRTH raw legacy data that are
+    relevant for reconstruction, in case the raw file is unknown.
+    """
+
+    # ...
+    cols = ["#RIC", "Date-Time", "GMT Offset", "FID Name", "FID Value"]
+    values = pd.util.hash_pandas_object(data[cols], index=False).to_numpy()
+
+    return hashlib.sha256(values.tobytes()).hexdigest()
+
+def _get_cache_path(cache_dir:str, source:str, key:tuple, seed=True, mapping=MAPPING_FIDNAME_TO_COLUMN, features=None, compact=False):
+    """
+    Get the path of a cache entry, i.e. of a single reconstructed partition.
+    The entry is addressed by the hash of everything that determines its
+    content: raw data, partition ('#RIC', date), seed, mapping, features,
+    layout and CACHE_VERSION. Entries are spread across 256 subdirectories.
+
+    :param cache_dir:
+        str, path to cache directory
+    :param source:
+        str, identifier of the raw data, e.g. `hash_file(path)`
+    :param key:
+        tuple, ('#RIC', date) of the partition
+    :param seed:
+        bool, whether the partition is seeded
+    :param mapping:
+        dict, 'FID Name' values mapped to corresponding columns
+    :param features:
+        list, order book features, default is None
+    :param compact:
+        bool, whether the partition is in compact layout, default is False
+    :return path:
+        str, path to cache entry, as .feather
+    """
+
+    # ...
+    ric, date = key
+    content = [CACHE_VERSION, source, str(ric), str(pd.Timestamp(date).date()), bool(seed), list(mapping.items())]
+    if features:
+        content.append(list(features)) # entries without features keep their path
+    if compact:
+        content.append("compact")
+    content = json.dumps(content)
+    digest = hashlib.sha256(content.encode()).hexdigest()
+
+    return os.path.join(cache_dir, digest[:2], digest + ".feather")
+
+def _read_cache(path:str, return_counts=False):
+    """
+    Read a cache entry, if any.
+
+    Note that we put the import only within the scope of this method as we
+    do not know whether pyarrow is installed on system.
+
+    :param path:
+        str, path to cache entry
+    :param return_counts:
+        bool, whether to also return the counts of the summary stored with the entry (see `_write_cache`)
+    :return chunk:
+        pd.DataFrame, TRTH normalized book data, None if there is no entry
+        (and dict, counts, None if there are none, if return_counts)
+    """
+
+    # import
+    import pyarrow.feather as feather
+
+    # ...
+    if not os.path.exists(path):
+        return (None, None) if return_counts else None
+    table = feather.read_table(path)
+
+    # counts are stored as schema metadata
+    if return_counts:
+        counts = (table.schema.metadata or {}).get(b"counts")
+        return table.to_pandas(), json.loads(counts) if counts is not None else None
+
+    return table.to_pandas()
+
+def _write_cache(path:str, chunk:pd.DataFrame, summary=None):
+    """
+    Write a cache entry atomically, i.e. write to a temporary file in the
+    same directory first, then rename. Readers never see partial entries.
+    Counts of the summary, which cannot be derived from the partition
+    itself, are stored as schema metadata.
+
+    Note that we put the import only within the scope of this method as we
+    do not know whether pyarrow is installed on system.
+
+    :param path:
+        str, path to cache entry
+    :param chunk:
+        pd.DataFrame, TRTH normalized book data
+    :param summary:
+        pd.DataFrame, summary of the partition (see `summarize_book`), default is None
+    """
+
+    # import
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    # ...
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    path_tmp = "{}.{}.{}.tmp".format(path, socket.gethostname(), os.getpid())
+    try:
+        table = pa.Table.from_pandas(chunk, preserve_index=True)
+        if summary is not None and len(summary):
+            counts = {col: int(summary[col].iloc[0]) for col in ("Updates", "Missing TIMACT_MS")}
+            table = table.replace_schema_metadata({**table.schema.metadata, b"counts": json.dumps(counts).encode()})
+        feather.write_feather(table, path_tmp, compression="lz4")
+        os.replace(path_tmp, path)
+    finally:
+        if os.path.exists(path_tmp):
+            os.remove(path_tmp)
+
+def _get_lock_token():
+    """
+    Get a token that identifies the holder of a lock, unique per call.
+    """
+
+    # ...
+    return "{}:{}:{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex)
+
+def _acquire_lock(path:str, token:str):
+    """
+    Acquire the lock of a cache entry by exclusively creating a lock file,
+    which also works across pods on shared storage, and write the token of
+    the holder into it. Locks that have not been refreshed for
+    CACHE_LOCK_TIMEOUT seconds are considered stale (crashed job) and broken.
+
+    :param path:
+        str, path to cache entry
+    :param token:
+        str, token of the holder (see `_get_lock_token`)
+    :return is_acquired:
+        bool, whether the lock has been acquired
+    """
+
+    # ...
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    path_lock = path + ".lock"
+    for _ in range(2):
+        try:
+            fd = os.open(path_lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            if not _is_stale_lock(path_lock):
+                return False
+            _release_lock(path, _read_lock(path)) # only if nobody else broke it in the meantime
+            continue
+        with os.fdopen(fd, "w") as file:
+            file.write(token)
+        return True
+
+    return False
+
+def _read_lock(path:str):
+    """
+    Read the token of the holder of the lock of a cache entry, None if unlocked.
+    """
+
+    # ...
+    try:
+        with open(path + ".lock", "r") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+def _refresh_lock(path:str, token:str):
+    """
+    Refresh the mtime of the lock of a cache entry, if it is held by token.
+    """
+
+    # ...
+    if _read_lock(path) == token:
+        try:
+            os.utime(path + ".lock")
+        except FileNotFoundError:
+            pass
+
+def _release_lock(path:str, token:str):
+    """
+    Release the lock of a cache entry, if it is held by token. A job whose
+    lock has been broken does not remove the lock of its successor.
+    """
+
+    # ...
+    if _read_lock(path) == token:
+        try:
+            os.remove(path + ".lock")
+        except FileNotFoundError:
+            pass
+
+@contextlib.contextmanager
+def _refresh_locks(path_set:set, token:str):
+    """
+    Refresh the locks of all cache entries in path_set every
+    CACHE_LOCK_REFRESH seconds in a background thread, such that long
+    reconstructions are not mistaken for crashed jobs. path_set may change
+    while the context is active.
+    """
+
+    # ...
+    stop = threading.Event()
+    def refresh():
+        while not stop.wait(CACHE_LOCK_REFRESH):
+            for path in list(path_set):
+                _refresh_lock(path, token)
+    thread = threading.Thread(target=refresh, daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def _is_stale_lock(path_lock:str):
+    """
+    Check whether a lock file has not been refreshed for CACHE_LOCK_TIMEOUT seconds.
+    """
+
+    # ...
+    try:
+        return time.time() - os.path.getmtime(path_lock) > CACHE_LOCK_TIMEOUT
+    except FileNotFoundError:
+        return False
+
+def _wait_for_lock(path:str):
+    """
+    Wait until the lock of a cache entry is released or stale.
+    """
+
+    # ...
+    path_lock = path + ".lock"
+    while os.path.exists(path_lock) and not _is_stale_lock(path_lock):
+        time.sleep(CACHE_POLL_INTERVAL)
+
+def parse_datetime(values:np.ndarray):
+    """
+    Parse TRTH 'Date-Time' strings of the fixed format
+    '2021-01-04T07:00:05.472046291Z' (UTC, nanoseconds) to int64 nanoseconds
+    since epoch, using integer arithmetic on the characters of all strings at
+    once. Missing values (NaN, None, empty) are returned as NaT. If any value
+    does not match the fixed format or has a field out of range (e.g. month
+    13, February 30 or hour 24), all values are parsed by pandas instead, i.e. invalid
+    values raise as in `pd.to_datetime`.
+
+    :param values:
+        np.ndarray, 'Date-Time' strings
+    :return nanoseconds:
+        np.ndarray, 'Date-Time' (UTC) in nanoseconds since epoch, int64
+    """
+
+    # ...
+    values = np.asarray(values, dtype=object)
+    nanoseconds = np.full(len(values), NAT, dtype=np.int64)
+    is_valid = pd.notna(values) & (values != "")
+    if not is_valid.any():
+        return nanoseconds
+
+    # one row of characters per string, strings of other length do not match the format
+    chars = values[is_valid].astype("S{}".format(len(DATETIME_FORMAT) + 1)).view(np.uint8)
+    chars = chars.reshape(-1, len(DATETIME_FORMAT) + 1)
+    is_digit = np.array([char == "0" for char in DATETIME_FORMAT])
+    separators = np.frombuffer(DATETIME_FORMAT.encode(), dtype=np.uint8)[~is_digit]
+    is_match = (
+        (chars[:, -1] == 0)
+        & (chars[:, :-1][:, ~is_digit] == separators).all(axis=1)
+        & ((chars[:, :-1][:, is_digit] - ord("0")) <= 9).all(axis=1)
+    )
+
+    # fall back to pandas for any other format
+    def fallback():
+        nanoseconds[is_valid] = pd.DatetimeIndex(pd.to_datetime(values[is_valid], utc=True)).tz_localize(None).asi8
+        return nanoseconds
+    if not is_match.all():
+        return fallback()
+
+    # combine digits to integers, e.g. year from characters 0 to 3
+    digits = chars.astype(np.int64) - ord("0")
+    def number(start, end):
+        return digits[:, start:end] @ (10 ** np.arange(end - start - 1, -1, -1, dtype=np.int64))
+    year, month, day = number(0, 4), number(5, 7), number(8, 10)
+    hour, minute, second, fraction = number(11, 13), number(14, 16), number(17, 19), number(20, 29)
+
+    # fall back to pandas for fields out of range, including days beyond the end of the month, e.g. February 30
+    is_in_range = (
+        (month >= 1) & (month <= 12) & (day >= 1) & (day <= 31)
+        & (hour < 24) & (minute < 60) & (second < 60)
+    )
+    if not is_in_range.all():
+        return fallback()
+    is_leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days_in_month = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])[month - 1] + (is_leap & (month == 2))
+    if not (day <= days_in_month).all():
+        return fallback()
+
+    # days since epoch from civil date (proleptic gregorian calendar), years start in march
+    year = year - (month <= 2)
+    era = year // 400
+    year_of_era = year - era * 400
+    day_of_year = (153 * ((month + 9) % 12) + 2) // 5 + day - 1
+    day_of_era = year_of_era * 365 + year_of_era // 4 - year_of_era // 100 + day_of_year
+    days = era * 146097 + day_of_era - 719468
+
+    # ...
+    seconds = ((days * 24 + hour) * 60 + minute) * 60 + second
+    nanoseconds[is_valid] = seconds * 1_000_000_000 + fraction
+
+    return nanoseconds
+
+@profile_decorator
+def load_df(path:str, nrows=None, prune=True, depth=None, fields=None, sidecar=False, products=None): # as .csv(.gz/.zst)
+    """
+    Load TRTH raw legacy data.
+
+    :param path:
+        str, path to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param nrows:
+        int, number of rows to read, default is None (all rows)
+    :param prune:
+        bool, whether to load only relevant columns and rows (see `_load_df_pruned`), default is True
+    :param depth:
+        int, if prune, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, if prune, include fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+    :param sidecar:
+        bool, if prune and all rows, map the binary sidecar of the raw file in memory, written on first use (see
+        `_load_df_sidecar`), default is False
+    :param products:
+        list or dict, if prune, include the 'FID Name' values of all these products (see `select_products`), default
+        is None (book only)
+    :return df:
+        pd.DataFrame, TRTH raw legacy data
+    """
+
+    # parse nrows string to support both input of form "1000" and "1e3"
+    if nrows is not None:
+        nrows = int(float(nrows))
+
+    # 'FID Name' values of all products, book first
+    mapping = {}
+    for product in select_products(products, depth=depth, fields=fields).values():
+        mapping.update({fidname: col for fidname, col in product["mapping"].items() if fidname not in mapping})
+
+    # load relevant columns and rows from binary sidecar, it covers the 'FID Name' values of the book only
+    if prune and sidecar and nrows is None and set(mapping) <= set(MAPPING_FIDNAME_TO_COLUMN):
+        return _load_df_sidecar(path, mapping=mapping)
+
+    # load relevant columns and rows only
+    if prune:
+        return _load_df_pruned(path, nrows=nrows, mapping=mapping)
+    
+    # load df using datatable (multi-threaded!), then transform to pandas
+    with profile_stage("read") as record:
+        df = _fread(path, max_nrows=nrows, verbose=False,
+            fill=True, # fill missing fields (happens in RAW LEGACY data)
+            na_strings=[""], # make datatable.fread parse empty strings as NaNs
+        ).to_pandas()
+        record["rows_out"] = len(df)
+    
+    # load df using pandas (single-threaded!)
+    # df_cols = pd.read_csv(path, nrows=1).columns # peek at column names
+    # df = pd.read_csv(path, nrows=nrows,
+    #     names=df_cols, header=0, # ensure that all columns are identical per row
+    #     na_values=[""], # make pd.read_csv parse empty strings as NaNs
+    # )
+    
+    # parse datetime, fixed format
+    df[DATETIME] = pd.DatetimeIndex(parse_datetime(df[DATETIME].to_numpy()).view("datetime64[ns]")).tz_localize("UTC")
+
+    return df
+
+def _fread(path:str, **kwargs):
+    """
+    Read TRTH raw legacy data using datatable (multi-threaded!). As datatable
+    decompresses .gz files on a single thread, block-compressed files (BGZF,
+    i.e. written by `open_compressed`) are decompressed on several threads
+    first, unless only the first rows are read. Datatable does not read zstd.
+    Decompressed text goes to a temporary file (see TMPDIR) that datatable
+    maps into memory, i.e. it is never held as a single bytes object.
+
+    Regular (single-member) gzip files, as delivered by TRTH, are read by
+    datatable on a single thread, recompress them to BGZF once to benefit
+    (see `recompress`).
+
+    :param path:
+        str, path to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param kwargs:
+        dict, passed on to `dt.fread`
+    :return frame:
+        dt.Frame, TRTH raw legacy data
+    """
+
+    # ...
+    compression = get_compression(path)
+    if compression == "zstd" or (compression == "bgzf" and kwargs.get("max_nrows") is None):
+        with tempfile.NamedTemporaryFile(suffix=".csv") as file:
+            with open_compressed(path, "rb") as file_in:
+                shutil.copyfileobj(file_in, file, length=2**24)
+            file.flush()
+            return dt.fread(file.name, **kwargs)
+
+    return dt.fread(path, **kwargs)
+
+def _load_df_pruned(path:str, nrows=None, mapping=MAPPING_FIDNAME_TO_COLUMN): # as .csv(.gz/.zst)
+    """
+    Load TRTH raw legacy data, including only the columns required to
+    reconstruct the book, and only rows that have (1) a timestamp, or (2) a
+    'FID Name' value listed in the mapping. Rows are filtered
+    within datatable before anything is transformed to pandas, strings are
+    handed over as categoricals ('#RIC', 'FID Name') or parsed for UPDATE
+    STATEs only ('Date-Time'), i.e. there are no object columns per row.
+
+    :param path:
+        str, path to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param nrows:
+        int, number of rows to read, default is None (all rows)
+    :param mapping:
+        dict, 'FID Name' values mapped to corresponding columns
+    :return df:
+        pd.DataFrame, TRTH raw legacy data with columns '#RIC', 'Date-Time', 'GMT Offset', 'FID Name', 'FID Value'
+    """
+
+    # load relevant columns using datatable (multi-threaded!)
+    with profile_stage("read") as record:
+        frame = _fread(path, max_nrows=nrows, verbose=False,
+            fill=True, # fill missing fields (happens in RAW LEGACY data)
+            na_strings=[""], # make datatable.fread parse empty strings as NaNs
+            columns={"#RIC", "Date-Time", "GMT Offset", "FID Name", "FID Value"},
+        )
+        record["rows_out"] = frame.nrows
+    
+    # encode 'FID Name' as categorical, then translate category codes to column codes (-1 if not relevant)
+    frame[:, dt.update(**{"FID Name": dt.as_type(dt.f["FID Name"], dt.Type.cat32(dt.str32))})]
+    fidname_list = frame[:, dt.categories(dt.f["FID Name"])].to_list()[0]
+    fidname_lookup = pd.Categorical(fidname_list, categories=list(mapping.keys())).codes
+    fidname_code = fidname_lookup[frame[:, dt.codes(dt.f["FID Name"])].to_numpy().ravel()]
+    
+    # filter for relevant rows that have (1) a timestamp, or (2) a 'FID Name' value listed in the dictionary keys
+    has_timestamp = ~ frame[:, dt.isna(dt.f[DATETIME])].to_numpy().ravel()
+    is_relevant = has_timestamp | (fidname_code >= 0)
+    frame = frame[dt.Frame(is_relevant), :]
+    has_timestamp = has_timestamp[is_relevant]
+    fidname_code = fidname_code[is_relevant]
+    
+    # parse datetime, fixed format, for UPDATE STATEs only
+    nanoseconds = np.full(frame.nrows, NAT, dtype=np.int64)
+    nanoseconds[has_timestamp] = parse_datetime(frame[dt.Frame(has_timestamp), DATETIME].to_numpy().ravel())
+    df = pd.DataFrame(index=range(frame.nrows))
+    df["#RIC"] = None
+    df[DATETIME] = pd.DatetimeIndex(nanoseconds.view("datetime64[ns]")).tz_localize("UTC")
+    
+    # encode '#RIC' as categorical, for UPDATE STATEs only
+    ric_code, ric_list = pd.factorize(np.asarray(frame[dt.Frame(has_timestamp), "#RIC"].to_list()[0], dtype=object))
+    code = np.full(frame.nrows, -1, dtype=ric_code.dtype)
+    code[has_timestamp] = ric_code
+    df["#RIC"] = pd.Categorical.from_codes(code, categories=ric_list)
+    
+    # numeric columns, NA as NaN
+    df["GMT Offset"] = frame[:, dt.as_type(dt.f["GMT Offset"], dt.float64)].to_numpy().ravel()
+    df["FID Name"] = pd.Categorical.from_codes(fidname_code, categories=list(mapping.keys()))
+    df["FID Value"] = frame[:, dt.as_type(dt.f["FID Value"], dt.float64)].to_numpy().ravel()
+
+    return df
+
+def _load_df_sidecar(path:str, mapping=MAPPING_FIDNAME_TO_COLUMN):
+    """
+    Load TRTH raw legacy data from its binary sidecar, i.e. a directory next
+    to the raw file (`<path>.sidecar`) with one typed array per column, that
+    is written once using `_load_df_pruned` with the full mapping. The arrays
+    are memory-mapped, i.e. neither decompressed, tokenized nor parsed again,
+    and the DataFrame refers to the mapped arrays without copying them.
+
+    The sidecar is valid as long as size and modification time of the raw
+    file are unchanged, or, if they changed, its SHA-256 hash is unchanged.
+    Since the sidecar covers all 'FID Name' values of the full mapping, it
+    does not depend on depth or fields, 'FID Name' values that are not in the
+    given mapping are encoded as NaN (and disregarded by the engines).
+
+    :param path:
+        str, path to TRTH raw legacy data, as .csv(.gz)
+    :param mapping:
+        dict, 'FID Name' values mapped to corresponding columns
+    :return df:
+        pd.DataFrame, TRTH raw legacy data with columns '#RIC', 'Date-Time' (UTC, timezone-unaware),
+        'GMT Offset', 'FID Name', 'FID Value'
+    """
+
+    # write sidecar, unless valid
+    path_sidecar = path + ".sidecar"
+    meta = _read_sidecar_meta(path, path_sidecar)
+    if meta is None:
+        with profile_stage("sidecar_write") as record:
+            meta = _write_sidecar(path, path_sidecar)
+            record["rows_out"] = meta["nrows"]
+
+    # map arrays, translate 'FID Name' codes from the full mapping to the given mapping
+    with profile_stage("sidecar_read") as record:
+        arrays = {col: np.load(os.path.join(path_sidecar, col + ".npy"), mmap_mode="r") for col in SIDECAR_COLUMNS}
+        fidname_code = arrays["FID Name"]
+        if list(mapping.keys()) != meta["fidnames"]:
+            # code -1 (not relevant) selects the last item, i.e. None
+            fidname_lookup = pd.Categorical(meta["fidnames"] + [None], categories=list(mapping.keys())).codes
+            fidname_code = fidname_lookup[fidname_code]
+        df = pd.DataFrame({
+            "#RIC": pd.Categorical.from_codes(arrays["#RIC"], categories=meta["rics"]),
+            "Date-Time": arrays["Date-Time"].view("datetime64[ns]"),
+            "GMT Offset": arrays["GMT Offset"],
+            "FID Name": pd.Categorical.from_codes(fidname_code, categories=list(mapping.keys())),
+            "FID Value": arrays["FID Value"],
+        }, copy=False)
+        record["rows_out"] = len(df)
+
+    return df
+
+def _read_sidecar_meta(path:str, path_sidecar:str):
+    """
+    Read the meta data of a sidecar, if it is valid for the raw file.
+
+    :param path:
+        str, path to TRTH raw legacy data
+    :param path_sidecar:
+        str, path to sidecar directory
+    :return meta:
+        dict, meta data, None if there is no valid sidecar
+    """
+
+    # ...
+    try:
+        with open(os.path.join(path_sidecar, "meta.json")) as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != SIDECAR_VERSION:
+        return None
+
+    # unchanged size and modification time
+    stat = os.stat(path)
+    if meta["size"] == stat.st_size and meta["mtime_ns"] == stat.st_mtime_ns:
+        return meta
+
+    # unchanged content, e.g. after copying the raw file
+    if meta["size"] == stat.st_size and meta["sha256"] == hash_file(path):
+        meta["mtime_ns"] = stat.st_mtime_ns
+        _write_json_atomic(os.path.join(path_sidecar, "meta.json"), meta)
+        return meta
+
+    return None
+
+def _write_sidecar(path:str, path_sidecar:str):
+    """
+    Write the sidecar of a raw file, i.e. load the raw file using the full
+    mapping and save one array per column: '#RIC' codes (-1 if no UPDATE
+    STATE), 'Date-Time' in nanoseconds since epoch (int64, NaT if no UPDATE
+    STATE), 'GMT Offset' (float64), 'FID Name' codes (-1 if not relevant),
+    'FID Value' (float64). Codes have the integer type pandas uses for the
+    number of categories, so that they can be mapped without conversion. Arrays are written to a temporary
+    directory first, which then replaces any existing sidecar.
+
+    :param path:
+        str, path to TRTH raw legacy data
+    :param path_sidecar:
+        str, path to sidecar directory
+    :return meta:
+        dict, meta data
+    """
+
+    # ...
+    stat = os.stat(path)
+    df = _load_df_pruned(path, mapping=MAPPING_FIDNAME_TO_COLUMN)
+    arrays = {
+        "#RIC": df["#RIC"].cat.codes.to_numpy(),
+        "Date-Time": pd.DatetimeIndex(df["Date-Time"]).tz_localize(None).asi8,
+        "GMT Offset": df["GMT Offset"].to_numpy(dtype=np.float64),
+        "FID Name": df["FID Name"].cat.codes.to_numpy(),
+        "FID Value": df["FID Value"].to_numpy(dtype=np.float64),
+    }
+    meta = {
+        "version": SIDECAR_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": hash_file(path),
+        "nrows": len(df),
+        "rics": [str(ric) for ric in df["#RIC"].cat.categories],
+        "fidnames": list(MAPPING_FIDNAME_TO_COLUMN.keys()),
+    }
+
+    # write to temporary directory, then replace
+    path_tmp = "{}.{}.{}.tmp".format(path_sidecar, socket.gethostname(), os.getpid())
+    os.makedirs(path_tmp, exist_ok=True)
+    try:
+        for col, array in arrays.items():
+            np.save(os.path.join(path_tmp, col + ".npy"), array)
+        _write_json_atomic(os.path.join(path_tmp, "meta.json"), meta)
+        if os.path.isdir(path_sidecar):
+            shutil.rmtree(path_sidecar)
+        os.replace(path_tmp, path_sidecar)
+    finally:
+        if os.path.isdir(path_tmp):
+            shutil.rmtree(path_tmp)
+
+    return meta
+
+def _write_json_atomic(path:str, content:dict):
+    """
+    Write JSON to a temporary file in the same directory first, then rename.
+    """
+
+    # ...
+    path_tmp = "{}.{}.{}.tmp".format(path, socket.gethostname(), os.getpid())
+    with open(path_tmp, "w") as file:
+        json.dump(content, file)
+    os.replace(path_tmp, path)
+
+@profile_decorator
+def save_df(df:pd.DataFrame, path:str, format="csv", compression=None): # as .csv(.gz/.zst), partitioned .parquet/.feather, or .delta
+    """
+    Save TRTH normalized book data, either as a single .csv.gz file or as a
+    columnar dataset that is partitioned by '#RIC' and date, i.e. a directory
+    with one subdirectory per partition, e.g. `RIC=DBKGn.DE/Date=2021-01-04`,
+    or as delta store, i.e. changed book columns per update (see `write_delta`).
+    Csv is compressed on several threads, gzip as BGZF (see `open_compressed`).
+
+    :param df:
+        pd.DataFrame, TRTH normalized book data
+    :param path:
+        str, path to .csv.gz (.csv.zst) file or to dataset directory
+    :param format:
+        str, one of "csv", "parquet", "feather", "delta", default is "csv"
+    :param compression:
+        str, compression codec, default is "gzip" (csv), "zstd" (parquet) or "lz4" (feather), none (delta)
+    """
+
+    # ...
+    assert format in FORMATS, \
+        "(ERROR) format must be one of {formats}, you provided value {value}".format(
+            formats=FORMATS,
+            value=format,
+        )
+
+    # delta store: one header per update, changed book columns only, regular layout
+    if format == "delta":
+        with profile_stage("write", rows_in=len(df)) as record:
+            write_delta(expand_book(df), path)
+            record["rows_out"] = len(df)
+        return
+
+    # columnar: typed columns, partitioned by '#RIC' and date
+    if format != "csv":
+        with profile_stage("write", rows_in=len(df)) as record:
+            _save_df_columnar(df, path, format=format, compression=compression)
+            record["rows_out"] = len(df)
+        return
+
+    # stringify compact layout, if any, and 'GMT Offset'
+    with profile_stage("cast", rows_in=len(df)) as record:
+        df = _stringify_gmt_offset(expand_book(df))
+        record["rows_out"] = len(df)
+
+    # datatable: fast, but may cause error! write block by block, compressed on several threads
+    with profile_stage("write", rows_in=len(df)) as record:
+        frame = dt.Frame(df)
+        with open_compressed(path, "wb", compression=compression or "gzip") as file:
+            for start in range(0, max(frame.nrows, 1), CSV_BLOCK_SIZE):
+                file.write(frame[start:start + CSV_BLOCK_SIZE, :].to_csv(header=start == 0).encode()) # immutable bytes, compressed without copy
+        record["rows_out"] = len(df)
+    
+    # pandas: reliable but slow
+    # df.to_csv(path, compression="gzip", index=False)
+
+def save_product(df:pd.DataFrame, path:str, product="book", format="csv", compression=None):
+    """
+    Save an output product (see `extract_products`), i.e. the summary as
+    small .csv.gz (.csv.zst) file whatever the format (see `save_summary`),
+    and all other products as given (see `save_df`).
+
+    :param df:
+        pd.DataFrame, output product
+    :param path:
+        str, path as returned by `get_output_path` for the product
+    :param product:
+        str, name of the product, default is "book"
+    :param format:
+        str, one of "csv", "parquet", "feather", "delta", default is "csv"
+    :param compression:
+        str, compression codec, default is None (see `save_df`)
+    """
+
+    # ...
+    if product == "summary":
+        save_summary(df, path, compression=compression if format == "csv" else None)
+        return
+
+    save_df(df, path, format=format, compression=compression)
+
+def _save_df_columnar(df:pd.DataFrame, path:str, format="parquet", compression=None):
+    """
+    Save TRTH normalized book data as columnar dataset, partitioned by '#RIC'
+    and date ('Date-Time', UTC). Existing partitions are replaced.
+
+    Note that we put the import only within the scope of this method as we
+    do not know whether pyarrow is installed on system.
+    """
+
+    # import
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    # add partition keys, these are restored from the directory names when reading
+    df = df.assign(**{
+        "RIC": df["#RIC"].astype(str),
+        "Date": df["Date-Time"].dt.strftime("%Y-%m-%d"),
+    })
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    # use small row groups to allow for predicate pushdown by row group statistics
+    if format == "parquet":
+        file_options = ds.ParquetFileFormat().make_write_options(compression=compression or "zstd")
+    else:
+        file_options = ds.IpcFileFormat().make_write_options(compression=compression or "lz4")
+    ds.write_dataset(table, path, format=format, file_options=file_options,
+        partitioning=PARTITIONING, partitioning_flavor="hive",
+        max_rows_per_group=2**16, max_rows_per_file=2**24, min_rows_per_group=2**16,
+        existing_data_behavior="delete_matching",
+    )
+
+def load_reconstructed_df(path:str, format="parquet", columns=None, levels=None, ric=None, start=None, end=None):
+    """
+    Load TRTH normalized book data from a columnar dataset written by
+    `save_df`. Only the requested columns are read (projection), and only
+    partitions and row groups that may contain rows of the requested
+    '#RIC'(s) and time range are read (predicate pushdown).
+
+    Note that we put the import only within the scope of this method as we
+    do not know whether pyarrow is installed on system.
+
+    :param path:
+        str, path to dataset directory
+    :param format:
+        str, one of "parquet", "feather", default is "parquet"
+    :param columns:
+        list, columns to include, default is None (all columns)
+    :param levels:
+        int, include only book columns of levels 1 to levels (e.g. 3 for L1-L3), default is None (all levels)
+    :param ric:
+        str or list, '#RIC'(s) to include, default is None (all)
+    :param start:
+        str or pd.Timestamp, include rows with 'Date-Time' >= start (UTC), default is None
+    :param end:
+        str or pd.Timestamp, include rows with 'Date-Time' < end (UTC), default is None
+    :return df:
+        pd.DataFrame, TRTH normalized book data
+    """
+
+    # import
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+
+    # ...
+    dataset = ds.dataset(path, format=format, partitioning=ds.partitioning(
+        pa.schema([(key, pa.string()) for key in PARTITIONING]), flavor="hive",
+    ))
+
+    # projection: all but partition keys by default, optionally limited to book levels 1 to levels
+    if columns is None:
+        columns = [col for col in dataset.schema.names if col not in PARTITIONING]
+    if levels is not None:
+        columns = [col for col in columns
+            if not col.startswith("L") or int(col.split("-")[0][1:]) <= levels
+        ]
+
+    # predicate: partition keys prune directories, 'Date-Time' prunes row groups
+    expression = None
+    def conjunction(a, b):
+        return b if a is None else a & b
+    if ric is not None:
+        expression = conjunction(expression, ds.field("RIC").isin([ric] if isinstance(ric, str) else list(ric)))
+    if start is not None:
+        start = pd.Timestamp(start)
+        expression = conjunction(expression, ds.field("Date") >= start.strftime("%Y-%m-%d"))
+        expression = conjunction(expression, ds.field("Date-Time") >= pa.scalar(start.value, pa.timestamp("ns")))
+    if end is not None:
+        end = pd.Timestamp(end)
+        expression = conjunction(expression, ds.field("Date") <= end.strftime("%Y-%m-%d"))
+        expression = conjunction(expression, ds.field("Date-Time") < pa.scalar(end.value, pa.timestamp("ns")))
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+def _find_block_cut(block:pd.DataFrame, mapping=MAPPING_FIDNAME_TO_COLUMN):
+    """
+    Find the position at which a block may be cut such that all rows before
+    the cut can be reconstructed without looking ahead. This is the UPDATE
+    STATE that follows the last complete, non-empty UPDATE STATE, i.e. the
+    last (possibly incomplete) UPDATE STATE and any empty UPDATE STATEs just
+    before it remain in the block as they depend on subsequent rows.
+
+    :param block:
+        pd.DataFrame, TRTH raw legacy data
+    :param mapping:
+        dict, 'FID Name' values mapped to corresponding columns
+    :return cut:
+        int, position of the first row to carry over to the next block
+    """
+
+    # assign each row to its UPDATE STATE, rows before the first UPDATE STATE are disregarded (-1)
+    has_timestamp = block[DATETIME].notna().to_numpy()
+    has_fidname = block["FID Name"].isin(mapping.keys()).to_numpy()
+    header_index = np.flatnonzero(has_timestamp)
+    group = np.cumsum(has_timestamp) - 1
+
+    # count relevant 'FID Name' values per UPDATE STATE, exclude the last one (possibly incomplete)
+    is_fid = has_fidname & ~has_timestamp & (group >= 0)
+    count = np.bincount(group[is_fid], minlength=len(header_index))[:-1]
+
+    # carry over the entire block if there is no complete, non-empty UPDATE STATE
+    nonempty_index = np.flatnonzero(count)
+    if not len(nonempty_index):
+        return 0
+
+    return header_index[nonempty_index[-1] + 1]
+
+def _read_raw_blocks(path:str, block_size=1e6, nrows=None): # as .csv(.gz/.zst)
+    """
+    Read relevant columns of TRTH raw legacy data block by block using pandas
+    (datatable does not support streaming), decompressed on several threads.
+    URLs are streamed over http(s) without storing the file (see `open_url`).
+
+    :param path:
+        str, path or http(s) URL to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param block_size:
+        int, number of rows to read per block, default is 1e6
+    :param nrows:
+        int, number of rows to read, default is None (all rows)
+    :return generator:
+        pd.DataFrame, blocks of TRTH raw legacy data, 'Date-Time' parsed (UTC)
+    """
+
+    # ...
+    with (open_url(path) if is_url(path) else open_compressed(path, "rb")) as file_in:
+        reader = pd.read_csv(file_in, nrows=nrows, chunksize=int(float(block_size)),
+            usecols=["#RIC", "Date-Time", "GMT Offset", "FID Name", "FID Value"],
+            keep_default_na=False, na_values=[""], # parse only empty strings as NaNs, as datatable.fread does
+        )
+        for block in reader:
+            with profile_stage("parse", rows_in=len(block)) as record:
+                block[DATETIME] = pd.DatetimeIndex(parse_datetime(block[DATETIME].to_numpy()).view("datetime64[ns]")).tz_localize("UTC")
+                record["rows_out"] = len(block)
+            yield block
+
+def _read_raw_groups(path:str, block_size=1e6, nrows=None): # as .csv(.gz/.zst)
+    """
+    Read TRTH raw legacy data block by block (see `_read_raw_blocks`), such
+    that each block consists of complete UPDATE STATEs, i.e. starts with an
+    UPDATE STATE and ends before the next one. Rows before the first UPDATE
+    STATE of the file are disregarded.
+
+    :return generator:
+        tuples of (block, group_time), where group_time is the 'Date-Time' of
+        the UPDATE STATE of each row, in nanoseconds since epoch
+    """
+
+    # ...
+    carry = None
+    for block in _read_raw_blocks(path, block_size=block_size, nrows=nrows):
+        if carry is not None:
+            block = pd.concat([carry, block], axis=0, ignore_index=True)
+
+        # disregard rows before the first UPDATE STATE, carry over the last (possibly incomplete) UPDATE STATE
+        header_index = np.flatnonzero(block[DATETIME].notna().to_numpy())
+        if not len(header_index):
+            carry = None if carry is None else block
+            continue
+        carry = block.iloc[header_index[-1]:]
+        block = block.iloc[header_index[0]:header_index[-1]]
+        if len(block):
+            yield block, _get_group_time(block)
+
+    # ...
+    if carry is not None:
+        yield carry, _get_group_time(carry)
+
+def _get_group_time(block:pd.DataFrame):
+    """
+    Get the 'Date-Time' of the UPDATE STATE of each row of a block that starts with an UPDATE STATE.
+    """
+
+    # ...
+    datetime = pd.DatetimeIndex(block[DATETIME]).asi8
+    index = np.where(datetime != NAT, np.arange(len(datetime)), 0)
+
+    return datetime[np.maximum.accumulate(index)]
+
+def merge_raw_files(path_list:list, block_size=1e6, nrows=None): # as .csv(.gz/.zst)
+    """
+    Merge TRTH raw legacy data of several files, e.g. the history of a '#RIC'
+    split by month or by request, into a single stream ordered by
+    'Date-Time', without loading the files entirely (k-way merge).
+
+    Each file is read block by block (see `_read_raw_groups`), UPDATE STATEs
+    are merged as a whole, i.e. with all their rows. UPDATE STATEs are
+    emitted up to the watermark, i.e. the smallest 'Date-Time' that has been
+    read last from any file that is not exhausted, as no file can provide an
+    earlier UPDATE STATE later on. The file that determines the watermark is
+    read next. UPDATE STATEs with the same 'Date-Time' are ordered by file,
+    as given, then by their order within the file. Each file must be ordered
+    by 'Date-Time', as TRTH raw legacy data is.
+
+    :param path_list:
+        list, paths to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param block_size:
+        int, number of rows to read per block and file, default is 1e6
+    :param nrows:
+        int, number of rows to read per file, default is None (all rows)
+    :return generator:
+        pd.DataFrame, blocks of complete UPDATE STATEs, 'Date-Time' parsed (UTC)
+    """
+
+    # one stream per file, buffers hold UPDATE STATEs read but not yet emitted
+    stream_list = [_read_raw_groups(path, block_size=block_size, nrows=nrows) for path in path_list]
+    buffer_list = [[] for _ in stream_list]
+    is_open = np.ones(len(stream_list), dtype=bool)
+    last_time = np.full(len(stream_list), NAT, dtype=np.int64)
+
+    # read the file that determines the watermark, starting with all files
+    index_list = list(range(len(stream_list)))
+    while is_open.any() or any(buffer_list):
+        for i in index_list:
+            item = next(stream_list[i], None)
+            if item is None:
+                is_open[i] = False
+            else:
+                buffer_list[i].append(item)
+                last_time[i] = item[1][-1]
+
+        # emit all UPDATE STATEs before the watermark (all of them if all files are exhausted)
+        watermark = last_time[is_open].min() if is_open.any() else np.iinfo(np.int64).max
+        block_list, key_list = [], []
+        for i, buffer in enumerate(buffer_list):
+            if not buffer:
+                continue
+            block = pd.concat([item[0] for item in buffer], axis=0, ignore_index=True) if len(buffer) > 1 else buffer[0][0]
+            group_time = np.concatenate([item[1] for item in buffer]) if len(buffer) > 1 else buffer[0][1]
+            is_later = group_time >= watermark
+            cut = int(np.argmax(is_later)) if is_later.any() else len(block)
+            if cut:
+                block_list.append(block.iloc[:cut])
+                key_list.append((group_time[:cut], np.full(cut, i)))
+            buffer_list[i] = [(block.iloc[cut:], group_time[cut:])] if cut < len(block) else []
+
+        # order rows by 'Date-Time' of their UPDATE STATE, then by file, then by position (stable)
+        if block_list:
+            with profile_stage("merge", rows_in=sum(len(block) for block in block_list)) as record:
+                order = np.lexsort((np.concatenate([key[1] for key in key_list]), np.concatenate([key[0] for key in key_list])))
+                block = pd.concat(block_list, axis=0, ignore_index=True).iloc[order].reset_index(drop=True)
+                record["rows_out"] = len(block)
+            yield block
+
+        # read next from the file that determines the watermark
+        index_list = [int(np.flatnonzero(is_open)[np.argmin(last_time[is_open])])] if is_open.any() else []
+
+def streamwise_reconstruct_book(path, path_out:str, block_size=1e6, nrows=None, engine="numpy", depth=None, fields=None,
+    compression=None, features=None,
+): # as .csv(.gz/.zst)
+    """
+    Reconstruct TRTH book from a file of arbitrary size, reading the input in
+    blocks of `block_size` rows and appending reconstructed rows to the
+    output as it goes, so that peak memory depends on the block size only.
+    Several files, e.g. of the same '#RIC' split by month, are merged by
+    'Date-Time' as they are read (see `merge_raw_files`), such that the
+    CURRENT STATE continues across file boundaries.
+
+    Blocks are cut at UPDATE STATE boundaries and split by ('#RIC', calendar
+    date), as in `partition_raw_data`. The CURRENT STATE is carried over from
+    block to block per '#RIC', and to the next day of the same '#RIC' without
+    TIMACT_MS. The last reconstructed row per '#RIC' is held back until the
+    next block shows whether it is a duplicate book state. The output is
+    identical to `chunkwise_reconstruct_book` applied to the entire file,
+    except that rows are ordered by 'Date-Time' block by block rather than
+    by '#RIC' and date.
+
+    :param path:
+        str or list, path(s) or http(s) URL(s) to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param path_out:
+        str, path to TRTH normalized book data, as .csv.gz (.csv.zst)
+    :param block_size:
+        int, number of rows to read per block (and file), default is 1e6
+    :param nrows:
+        int, number of rows to read (per file), default is None (all rows)
+    :param engine:
+        str, reconstruction engine, must be "numpy" as the CURRENT STATE is carried over
+    :param depth:
+        int, include book levels 1 to depth, default is None (all 10 levels)
+    :param fields:
+        list, include fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+    :param compression:
+        str, output compression, "gzip" or "zstd", default is None ("gzip")
+    :param features:
+        list, append order book features, e.g. ["mid", "spread"] (see `compute_book_features`), default is None
+    """
+
+    # ...
+    assert engine == "numpy", \
+        "(ERROR) streamwise reconstruction requires the numpy engine, you provided value {value}".format(
+            value=engine,
+        )
+
+    # ...
+    mapping = select_mapping(depth=depth, fields=fields)
+
+    # parse strings to support both input of form "1000" and "1e3"
+    block_size = int(float(block_size))
+    if nrows is not None:
+        nrows = int(float(nrows))
+
+    # read relevant columns block by block, merge several files by 'Date-Time'
+    if isinstance(path, str):
+        reader = _read_raw_blocks(path, block_size=block_size, nrows=nrows)
+    else:
+        reader = merge_raw_files(path, block_size=block_size, nrows=nrows)
+
+    # per '#RIC': CURRENT STATE, calendar date, held-back row (and whether its state has NaN), rows carried over
+    state_dict, date_dict, pending_dict, carry_dict = {}, {}, {}, {}
+    carry = None
+    has_header = False
+
+    with open_compressed(path_out, "wb", compression=compression or "gzip") as file:
+
+        def write(df_list):
+            nonlocal has_header
+            df_list = [df for df in df_list if len(df)]
+            if not df_list:
+                return
+            # order rows of several '#RIC's by 'Date-Time', rows of each '#RIC' are already in order
+            df = pd.concat(df_list, axis=0).sort_values("Date-Time", kind="stable")
+            with profile_stage("write", rows_in=len(df)) as record:
+                file.write(dt.Frame(_stringify_gmt_offset(df)).to_csv(header=not has_header).encode())
+                record["rows_out"] = len(df)
+            has_header = True
+
+        def process(ric, data):
+
+            # reconstruct book, starting from the CURRENT STATE of the previous block of the same '#RIC'
+            full, state_dict[ric] = reconstruct_book(data, engine=engine, state=state_dict.get(ric), return_state=True, depth=depth, fields=fields, features=features)
+            if not len(full):
+                return []
+
+            # write held-back row unless it is a duplicate of the first row (NaN is never equal)
+            output = []
+            if ric in pending_dict:
+                pending, pending_has_nan = pending_dict.pop(ric)
+                cols_book = [col for col in full.columns if col in mapping.values()]
+                is_changed = (pending[cols_book].to_numpy() != full[cols_book].iloc[:1].to_numpy()).any()
+                if pending_has_nan or is_changed:
+                    output.append(pending)
+
+            # write all but the last row, hold back the last row
+            output.append(full.iloc[:-1])
+            pending_dict[ric] = (full.iloc[-1:], np.isnan(state_dict[ric][1:]).any())
+            return output
+
+        def close(ric):
+
+            # the partition ('#RIC', date) ends, i.e. process rows carried over, write held-back row
+            output = process(ric, carry_dict.pop(ric)) if ric in carry_dict else []
+            if ric in pending_dict:
+                output.append(pending_dict.pop(ric)[0])
+
+            # seed the next partition of the same '#RIC' without TIMACT_MS, as `partition_raw_data` does
+            if state_dict.get(ric) is not None:
+                state_dict[ric][0] = np.nan
+            del date_dict[ric]
+            return output
+
+        def split(block, is_last=False):
+
+            # process each partition ('#RIC', date) separately, close the previous one of the same '#RIC'
+            output = []
+            for (ric, date), row_index, _ in partition_raw_data(block, seed=False, depth=depth, fields=fields):
+                if ric in date_dict and date_dict[ric] != date:
+                    output.extend(close(ric))
+                date_dict[ric] = date
+
+                # prepend rows carried over for this '#RIC', process all complete UPDATE STATEs, carry over the rest
+                data = block.iloc[row_index]
+                if ric in carry_dict:
+                    data = pd.concat([carry_dict.pop(ric), data], axis=0, ignore_index=True)
+                cut = len(data) if is_last else _find_block_cut(data, mapping=mapping)
+                if cut < len(data):
+                    carry_dict[ric] = data.iloc[cut:]
+                output.extend(process(ric, data.iloc[:cut]))
+            return output
+
+        # process block by block to save memory
+        for i, block in enumerate(reader, 1):
+            with profile_stage("block", rows_in=len(block), block=i):
+
+                # prepend rows carried over from the previous block
+                if carry is not None:
+                    block = pd.concat([carry, block], axis=0, ignore_index=True)
+
+                # carry over the last (possibly incomplete) UPDATE STATE, as its rows of type FID have no '#RIC'
+                header_index = np.flatnonzero(block[DATETIME].notna().to_numpy())
+                if not len(header_index):
+                    carry = block
+                    continue
+                carry = block.iloc[header_index[-1]:]
+                write(split(block.iloc[:header_index[-1]]))
+
+        # process remaining rows, close all partitions
+        output = split(carry, is_last=True) if carry is not None else []
+        for ric in list(date_dict):
+            output.extend(close(ric))
+        write(output)
+
+def get_output_path(path:str, format="csv", compression=None, product="book"):
+    """
+    Get the path of the reconstructed output of a raw file, in the same
+    directory, i.e. a .csv.gz (.csv.zst) file or a dataset directory (columnar formats).
+    Products other than the book are named by product, e.g. `<stem>_trades.csv.gz`.
+
+    :param path:
+        str, path to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param format:
+        str, one of "csv", "parquet", "feather", "delta", default is "csv"
+    :param compression:
+        str, if csv, "gzip" or "zstd", default is None ("gzip")
+    :param product:
+        str, name of the product (see `select_products`) or "summary", default is "book"
+    :return path_out:
+        str, path to TRTH normalized book data
+    """
+
+    # summary is a small csv file next to the output, whatever the format
+    if product == "summary":
+        format, compression = "csv", compression if format == "csv" else None
+
+    # ...
+    for extension in (".csv.gz", ".csv.zst"):
+        if path.endswith(extension):
+            stem = path[:-len(extension)]
+            break
+    else:
+        stem = os.path.splitext(path)[0]
+
+    # ...
+    stem += "_reconstructed" if product == "book" else "_" + product
+    if format == "delta":
+        return stem + ".delta"
+    if format != "csv":
+        return stem
+
+    return stem + (".csv.zst" if compression == "zstd" else ".csv.gz")
+
+def find_raw_files(path:str):
+    """
+    Find TRTH raw legacy files, given a directory or a glob pattern, i.e. all
+    .csv(.gz/.zst) files that are not reconstructed outputs (of any product).
+
+    :param path:
+        str, path to directory or glob pattern
+    :return path_list:
+        list, sorted paths to TRTH raw legacy data
+    """
+
+    # ...
+    if os.path.isdir(path):
+        path = os.path.join(path, "*")
+    suffixes = tuple("_" + product + extension for product in list(PRODUCTS) + ["summary"] for extension in (".csv.gz", ".csv.zst", ".csv"))
+    path_list = [path for path in glob.glob(path)
+        if path.endswith((".csv.gz", ".csv.zst", ".csv")) and "_reconstructed" not in os.path.basename(path)
+        and not path.endswith(suffixes)
+    ]
+
+    return sorted(path_list)
+
+def batch_reconstruct_book(path_list:list, format="csv", compression=None, workers=1, memory_budget=None, overwrite=False,
+    products=None, prune=True, sidecar=False, **kwargs,
+):
+    """
+    Reconstruct TRTH book for many raw files (e.g. one per '#RIC' and month),
+    one file per worker process. Files are scheduled largest first, but only
+    as long as the estimated memory of all running files stays within the
+    memory budget, so that big files do not run at the same time, smaller
+    files fill the remaining budget. Files whose output exists already are
+    skipped, outputs are written to a temporary path first and renamed when
+    complete, so that an interrupted run can simply be restarted.
+
+    :param path_list:
+        list, paths to TRTH raw legacy data, as .csv(.gz/.zst)
+    :param format:
+        str, one of "csv", "parquet", "feather", "delta", default is "csv"
+    :param compression:
+        str, compression codec, default is None (see `save_df`)
+    :param workers:
+        int, number of worker processes, default is 1
+    :param memory_budget:
+        float, memory budget in bytes, default is None (80% of physical memory)
+    :param overwrite:
+        bool, whether to reconstruct files whose output exists already, default is False
+    :param products:
+        list, products to extract in a single pass per file (see `extract_products`), default is None (book only)
+    :param prune:
+        bool, whether to load only relevant columns and rows (see `load_df`), default is True
+    :param sidecar:
+        bool, whether to map the binary sidecar of each raw file in memory (see `load_df`), default is False
+    :param kwargs:
+        dict, passed on to `chunkwise_reconstruct_book`, e.g. engine, seed, compact, depth, fields, cache_dir
+    :return summary:
+        pd.DataFrame, one row per file with status, size, rows and runtime (empty if path_list is empty)
+    """
+
+    # nothing to do, e.g. a glob pattern that matches no files
+    if not len(path_list):
+        print("process 0 files, skip 0 files")
+        return pd.DataFrame(columns=["path", "status", "bytes"])
+
+    # ...
+    if memory_budget is None:
+        memory_budget = 0.8 * os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+
+    # skip files whose outputs exist already
+    result_list = []
+    pending_list = []
+    for path in path_list:
+        if not overwrite and all(os.path.exists(get_output_path(path, format=format, compression=compression, product=product))
+            for product in _get_product_names(products, summary=kwargs.get("summary"))
+        ):
+            result_list.append({"path": path, "status": "skipped", "bytes": os.path.getsize(path)})
+        else:
+            pending_list.append((path, os.path.getsize(path)))
+
+    # largest first
+    pending_list.sort(key=lambda item: -item[1])
+    print("process {} files, skip {} files".format(len(pending_list), len(result_list)))
+
+    # submit largest file that fits the memory budget, at least one file at a time
+    time_start = time.time()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while pending_list or running:
+            memory_used = sum(memory for _, _, memory in running.values())
+            for item in list(pending_list):
+                if len(running) >= workers:
+                    break
+                memory = _estimate_memory(*item)
+                if running and memory_used + memory > memory_budget:
+                    continue
+                pending_list.remove(item)
+                future = executor.submit(_reconstruct_file, (item[0], format, compression, overwrite, products, prune, sidecar, kwargs))
+                running[future] = (item[0], item[1], memory)
+                memory_used += memory
+
+            # collect results as soon as they are done
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, size, _ = running.pop(future)
+                try:
+                    result = {"path": path, "status": "done", "bytes": size, **future.result()}
+                except Exception as exception:
+                    result = {"path": path, "status": "failed", "bytes": size, "error": repr(exception)}
+                result_list.append(result)
+                print("{} {} ({}/{})".format(result["status"], path, len(result_list), len(path_list)))
+
+    # throughput summary
+    runtime = max(time.time() - time_start, 1e-9)
+    summary = pd.DataFrame(result_list)
+    is_done = summary["status"] == "done"
+    rows_in = summary.loc[is_done, "rows_in"].sum() if is_done.any() else 0
+    megabytes = summary.loc[is_done, "bytes"].sum() / 1024**2
+    print("processed {} files ({} skipped, {} failed) in {:.1f} seconds".format(
+        is_done.sum(), (summary["status"] == "skipped").sum(), (summary["status"] == "failed").sum(), runtime,
+    ))
+    print("throughput: {:.1f} MB/s, {:.0f} rows/s".format(megabytes / runtime, rows_in / runtime))
+
+    return summary
+
+def _get_product_names(products=None, summary=False):
+    """
+    Get the names of all outputs of a raw file, i.e. products and summary.
+    """
+
+    # ...
+    return list(products or ["book"]) + (["summary"] if summary else [])
+
+def _estimate_memory(path:str, size:int):
+    """
+    Estimate the peak memory used to reconstruct a raw file from its size on
+    disk, compressed files require about MEMORY_PER_BYTE_GZ bytes per byte.
+    """
+
+    # ...
+    return size * (MEMORY_PER_BYTE_GZ if path.endswith((".gz", ".zst")) else MEMORY_PER_BYTE_CSV)
+
+def _reconstruct_file(task:tuple):
+    """
+    Load, reconstruct and save a single raw file, to be executed within a
+    worker process. Each output (one per product) is written to a temporary
+    path and renamed when complete. Prints are suppressed.
+
+    :param task:
+        tuple, (path, format, compression, overwrite, products, prune, sidecar, kwargs)
+    :return result:
+        dict, number of rows read and written, runtime
+    """
+
+    # ...
+    path, format, compression, overwrite, products, prune, sidecar, kwargs = task
+    path_out_dict = {product: get_output_path(path, format=format, compression=compression, product=product)
+        for product in _get_product_names(products, summary=kwargs.get("summary"))
+    }
+    time_start = time.time()
+
+    # remove leftovers of an interrupted run
+    for path_out in path_out_dict.values():
+        path_tmp = path_out + ".tmp"
+        if os.path.isdir(path_tmp):
+            shutil.rmtree(path_tmp)
+        elif os.path.exists(path_tmp):
+            os.remove(path_tmp)
+
+    # ...
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        data = load_df(path, prune=prune, depth=kwargs.get("depth"), fields=kwargs.get("fields"), sidecar=sidecar, products=products)
+        rows_in = len(data)
+        if kwargs.get("cache_dir") is not None:
+            kwargs = {**kwargs, "source": "{}:{}".format(hash_file(path), None)}
+        product_dict = extract_products(data, products=products, workers=1, **kwargs)
+        del data
+        for product, df in product_dict.items():
+            save_product(df, path_out_dict[product] + ".tmp", product=product, format=format, compression=compression)
+
+    # replace outputs only when complete
+    for path_out in path_out_dict.values():
+        if overwrite and os.path.isdir(path_out):
+            shutil.rmtree(path_out)
+        os.replace(path_out + ".tmp", path_out)
+
+    return {"rows_in": rows_in, "rows_out": sum(len(df) for df in product_dict.values()), "seconds": time.time() - time_start}
+
+# ...
+if __name__ == "__main__":
+    
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("reconstruct_book")
+    parser.add_argument("--path", type=str, help="specify filepath, http(s) URL (streaming), directory or glob pattern (batch mode), .csv(.gz/.zst), "
+        "regular gzip is decompressed on a single thread, recompress to BGZF once to decompress in parallel "
+        "(python library/utility/compression/compression.py --path <in> --path_out <out>)", default="...")
+    parser.add_argument("--nrows", type=str, help="number of rows to read", default=None)
+    parser.add_argument("--engine", type=str, help="reconstruction engine, numpy or pandas", default="numpy")
+    parser.add_argument("--block_size", type=str, help="number of rows per block, enables streaming", default=None)
+    parser.add_argument("--merge", action="store_true", help="merge all files of the directory or glob pattern by 'Date-Time' into a single output, streaming")
+    parser.add_argument("--path_out", type=str, help="output path (merge mode), default is derived from the first file", default=None)
+    parser.add_argument("--workers", type=int, help="number of worker processes, default is 1 (serial), more workers add process "
+        "start-up and copies, check with --profile whether they pay off", default=1)
+    parser.add_argument("--no_seed", action="store_true", help="start each partition with an empty book")
+    parser.add_argument("--format", type=str, help="output format, csv, parquet, feather or delta", default="csv")
+    parser.add_argument("--compression", type=str, help="output compression, e.g. gzip or zstd (csv), default is gzip (csv), zstd (parquet), lz4 (feather)", default=None)
+    parser.add_argument("--no_prune", action="store_true", help="load all columns and rows of the raw data")
+    parser.add_argument("--sidecar", action="store_true", help="memory-map binary sidecar of the raw data, written on first use")
+    parser.add_argument("--compact", action="store_true", help="use compact layout (integer ticks, int32, categoricals)")
+    parser.add_argument("--depth", type=int, help="number of book levels, 1 to 10", default=None)
+    parser.add_argument("--fields", type=str, help="comma-separated fields, e.g. Price,Size", default=None)
+    parser.add_argument("--features", type=str, help="comma-separated order book features, e.g. mid,spread,microprice,imbalance,depth,vwap", default=None)
+    parser.add_argument("--summary", action="store_true", help="write a summary per ('#RIC', date) next to the output, computed during reconstruction")
+    parser.add_argument("--products", type=str, help="comma-separated products extracted in a single pass, e.g. book,trades,quotes, or custom products as .json", default=None)
+    parser.add_argument("--cache_dir", type=str, help="cache directory for reconstructed partitions, e.g. on /_shared_storage", default=None)
+    parser.add_argument("--memory_budget", type=float, help="memory budget in GB for batch mode, default is 80%% of physical memory", default=None)
+    parser.add_argument("--overwrite", action="store_true", help="reconstruct files whose output exists already (batch mode)")
+    parser.add_argument("--profile", type=str, help="save profile of all stages and chunks, as .json", default=None)
+
+    # parse args
+    args = parser.parse_args()
+    fields = args.fields.split(",") if args.fields is not None else None
+    features = args.features.split(",") if args.features is not None else None
+    if args.products is not None and args.products.endswith(".json"):
+        with open(args.products) as file:
+            products = json.load(file)
+    else:
+        products = args.products.split(",") if args.products is not None else None
+
+    # batch: directory or glob pattern, one file per worker process
+    if not args.merge and not is_url(args.path) and (os.path.isdir(args.path) or any(char in args.path for char in "*?[")):
+        path_list = find_raw_files(args.path)
+        assert len(path_list), "(ERROR) no raw files found, you provided value {value}".format(value=args.path)
+        batch_reconstruct_book(
+            path_list=path_list,
+            format=args.format,
+            compression=args.compression,
+            workers=args.workers,
+            memory_budget=args.memory_budget * 1024**3 if args.memory_budget is not None else None,
+            overwrite=args.overwrite,
+            engine=args.engine,
+            seed=not args.no_seed,
+            compact=args.compact,
+            depth=args.depth,
+            fields=fields,
+            cache_dir=args.cache_dir,
+            features=features,
+            summary=args.summary,
+            products=products,
+            prune=not args.no_prune,
+            sidecar=args.sidecar,
+        )
+        sys.exit()
+
+    # profile all stages, print progress
+    profiler = Profiler()
+    profiler.subscribe(print_progress)
+    with profiler:
+
+        # streaming: read, reconstruct and save block by block with bounded memory, merge several files by 'Date-Time',
+        # URLs are streamed without storing the raw file, output goes to the working directory
+        if args.block_size is not None or args.merge or is_url(args.path):
+            assert args.format == "csv", "(ERROR) streaming supports csv output only"
+            assert products is None and not args.summary, "(ERROR) streaming supports the book only"
+            path = find_raw_files(args.path) if args.merge else args.path
+            assert len(path), "(ERROR) no raw files found, you provided value {value}".format(value=args.path)
+            print("start reconstructing LL2 data ...")
+            streamwise_reconstruct_book(
+                path=path,
+                path_out=args.path_out or get_output_path(path[0] if args.merge else get_file_name(path) if is_url(path) else path,
+                    compression=args.compression,
+                ),
+                block_size=args.block_size or 1e6,
+                nrows=args.nrows,
+                engine=args.engine,
+                depth=args.depth,
+                fields=fields,
+                compression=args.compression,
+                features=features,
+            )
+            print("... done reconstructing LL2 data")
+
+        else:
+
+            # load df
+            data = load_df(
+                path=args.path, # "./test_files/DB_Raw.csv"
+                nrows=int(float(args.nrows)) if args.nrows is not None else None,
+                prune=not args.no_prune,
+                depth=args.depth,
+                fields=fields,
+                sidecar=args.sidecar,
+                products=products,
+            )
+    
+            # identify raw data by content and number of rows read, for cache entries
+            source = None
+            if args.cache_dir is not None:
+                source = "{}:{}".format(hash_file(args.path), args.nrows)
+
+            # reconstruct book, extract other products from the same data
+            print("start reconstructing LL2 data ...")
+            product_dict = extract_products(data, products=products, engine=args.engine, workers=args.workers, seed=not args.no_seed, compact=args.compact, depth=args.depth, fields=fields, cache_dir=args.cache_dir, source=source, features=features, summary=args.summary) # data = reconstruct_book(data, engine=args.engine)
+            print("... done reconstructing LL2 data")
+            del data
 
+            # save each product into same directory, columnar formats as partitioned dataset directory
+            for product, df in product_dict.items():
+                save_product(
+                    df=df,
+                    path=get_output_path(args.path, format=args.format, compression=args.compression, product=product),
+                    product=product,
+                    format=args.format,
+                    compression=args.compression,
+                )
 
+    # save profile, print totals per stage
+    if args.profile is not None:
+        profiler.to_json(args.profile)
+        print(profiler.summary().to_string(float_format="{:.3f}".format))
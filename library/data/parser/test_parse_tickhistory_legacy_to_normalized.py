@@ -0,0 +1,549 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: run on real TRTH raw legacy data in addition to synthetic data (see library/conftest.py)
+
+# general imports
+import datatable as dt
+import glob
+import io
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import shutil
+import threading
+import time
+
+# library imports
+from library.conftest import DAYS, RICS, UPDATES_PER_DAY
+from library.data.generator.generate_tickhistory_legacy import generate_raw_legacy
+from library.data.parser.parse_tickhistory_legacy_to_normalized import (
+    CACHE_LOCK_TIMEOUT,
+    CACHE_VERSION,
+    NAT,
+    SIDECAR_VERSION,
+    _acquire_lock,
+    _get_datetime_exch,
+    _get_group_time,
+    _is_stale_lock,
+    _read_cache,
+    _read_raw_blocks,
+    _read_sidecar_meta,
+    _refresh_locks,
+    _release_lock,
+    _stringify_gmt_offset,
+    _write_cache,
+    _write_json_atomic,
+    chunkwise_reconstruct_book,
+    compact_book,
+    expand_book,
+    extract_products,
+    load_df,
+    load_reconstructed_df,
+    parse_datetime,
+    save_df,
+    streamwise_reconstruct_book,
+)
+
+# HELPERS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def _read_csv(path_or_buffer):
+    """
+    Read reconstructed book as strings, ordered by '#RIC' (stable), such that outputs compare as written.
+    """
+
+    # ...
+    df = pd.read_csv(path_or_buffer, dtype=str, keep_default_na=False)
+
+    return df.sort_values("#RIC", kind="stable").reset_index(drop=True)
+
+def _to_csv(full:pd.DataFrame):
+    """
+    Write reconstructed book as written by `streamwise_reconstruct_book` and read it back (see `_read_csv`).
+    """
+
+    # ...
+    return _read_csv(io.StringIO(dt.Frame(_stringify_gmt_offset(full)).to_csv()))
+
+def _get_entries(cache_dir:str):
+    """
+    Get the paths of all cache entries, sorted.
+    """
+
+    # ...
+    return sorted(glob.glob(os.path.join(cache_dir, "*", "*.feather")))
+
+def _tamper(path:str):
+    """
+    Overwrite the 'L1-BidPrice' of a cache entry with -1, such that results served from the entry are recognized.
+    """
+
+    # ...
+    chunk = _read_cache(path)
+    chunk["L1-BidPrice"] = -1.0
+    _write_cache(path, chunk)
+
+    return len(chunk)
+
+def _sort_by_ric(full:pd.DataFrame, reference:pd.DataFrame):
+    """
+    Order rows by '#RIC' as in the reference (stable), i.e. rows of each '#RIC' keep their order.
+    """
+
+    # ...
+    order = {ric: i for i, ric in enumerate(pd.unique(reference["#RIC"]))}
+
+    return full.sort_values("#RIC", kind="stable", key=lambda ric: ric.map(order)).reset_index(drop=True)
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_numpy_equals_pandas(data, reference):
+    """
+    The numpy engine equals the pandas engine (reference implementation), partitions seeded alike.
+    """
+
+    pd.testing.assert_frame_equal(chunkwise_reconstruct_book(data, engine="pandas"), reference)
+
+def test_serial_equals_workers(data, reference):
+    """
+    Reconstruction by several worker processes equals serial reconstruction.
+    """
+
+    pd.testing.assert_frame_equal(chunkwise_reconstruct_book(data, workers=2), reference)
+
+def test_pruned_equals_unpruned(path_list, reference):
+    """
+    Loading only relevant columns and 'FID Name' rows does not change the book.
+    """
+
+    # ...
+    data = pd.concat([load_df(path, prune=False) for path in path_list], axis=0, ignore_index=True)
+
+    pd.testing.assert_frame_equal(chunkwise_reconstruct_book(data), reference)
+
+def test_compact_round_trip(reference):
+    """
+    Expanding the compact layout restores the regular layout, including dtypes.
+    """
+
+    # ...
+    compact = compact_book(reference)
+
+    assert compact["L1-BidPrice"].dtype == np.int32 and compact["GMT Offset"].dtype == np.int8
+    pd.testing.assert_frame_equal(expand_book(compact), reference)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_compact_engine_equals_compact_book(data, reference, workers):
+    """
+    Compacting within the engine, partition by partition, equals compacting the regular layout afterwards.
+    """
+
+    pd.testing.assert_frame_equal(chunkwise_reconstruct_book(data, compact=True, workers=workers), compact_book(reference))
+
+def test_merge_equals_concatenation(path_list, merged, reference):
+    """
+    Merging files by 'Date-Time' equals concatenating them and ordering UPDATE STATEs by 'Date-Time' and file.
+    """
+
+    # concatenate files, order rows by 'Date-Time' of their UPDATE STATE, then by file, then by position (stable)
+    block_list = [pd.concat(_read_raw_blocks(path, block_size=10**9), axis=0, ignore_index=True) for path in path_list]
+    group_time = np.concatenate([_get_group_time(block) for block in block_list])
+    file_index = np.concatenate([np.full(len(block), i) for i, block in enumerate(block_list)])
+    concatenated = pd.concat(block_list, axis=0, ignore_index=True).iloc[np.lexsort((file_index, group_time))]
+
+    pd.testing.assert_frame_equal(merged, concatenated.reset_index(drop=True))
+
+    # the order of '#RIC's in the input does not matter
+    pd.testing.assert_frame_equal(_sort_by_ric(chunkwise_reconstruct_book(merged), reference), reference.reset_index(drop=True))
+
+def test_streaming_equals_full(tmp_path):
+    """
+    Streaming a single file of several '#RIC's and days, one after another, equals chunkwise reconstruction.
+    """
+
+    # ...
+    path = os.path.join(tmp_path, "raw.csv.gz")
+    generate_raw_legacy(path, rics=RICS, days=DAYS, updates_per_day=UPDATES_PER_DAY)
+    path_out = os.path.join(tmp_path, "book.csv.gz")
+    streamwise_reconstruct_book(path, path_out, block_size=10_000)
+
+    pd.testing.assert_frame_equal(_read_csv(path_out), _to_csv(chunkwise_reconstruct_book(load_df(path))))
+
+@pytest.mark.parametrize("block_size", [997, 10_000, 1_000_000])
+def test_streaming_equals_chunkwise(path_list, reference, tmp_path, block_size):
+    """
+    Streaming several files of several '#RIC's and days (merged by 'Date-Time') equals chunkwise reconstruction.
+    """
+
+    # ...
+    path_out = os.path.join(tmp_path, "book.csv.gz")
+    streamwise_reconstruct_book(path_list, path_out, block_size=block_size)
+
+    pd.testing.assert_frame_equal(_read_csv(path_out), _to_csv(reference))
+
+# CACHE . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_cache_hit_and_miss(data, reference, tmp_path, monkeypatch):
+    """
+    Cached partitions are served from the cache, a new CACHE_VERSION misses all of them.
+    """
+
+    # first run, all partitions are missing
+    cache_dir = os.path.join(tmp_path, "cache")
+    pd.testing.assert_frame_equal(chunkwise_reconstruct_book(data, cache_dir=cache_dir), reference)
+    entry_list = _get_entries(cache_dir)
+    assert len(entry_list) == len(reference.groupby(["#RIC", reference["Date-Time"].dt.date]))
+    assert not glob.glob(os.path.join(cache_dir, "*", "*.lock"))
+
+    # hit, i.e. the tampered entry is served
+    num_rows = _tamper(entry_list[0])
+    full = chunkwise_reconstruct_book(data, cache_dir=cache_dir)
+    assert (full["L1-BidPrice"] == -1).sum() == num_rows
+
+    # miss, entries of the previous version are ignored
+    monkeypatch.setattr("library.data.parser.parse_tickhistory_legacy_to_normalized.CACHE_VERSION", CACHE_VERSION + 1)
+    pd.testing.assert_frame_equal(chunkwise_reconstruct_book(data, cache_dir=cache_dir), reference)
+    assert len(_get_entries(cache_dir)) == 2 * len(entry_list)
+
+def test_cache_resume(data, reference, tmp_path):
+    """
+    An interrupted job, i.e. some entries missing and a stale lock left behind, resumes with the missing partitions.
+    """
+
+    # ...
+    cache_dir = os.path.join(tmp_path, "cache")
+    chunkwise_reconstruct_book(data, cache_dir=cache_dir)
+    entry_list = _get_entries(cache_dir)
+    for path in entry_list[::2]:
+        os.remove(path)
+
+    # cached entries are kept, the lock of the crashed job is broken
+    num_rows = _tamper(entry_list[1])
+    _acquire_lock(entry_list[0], "crashed")
+    os.utime(entry_list[0] + ".lock", (0, 0))
+    full = chunkwise_reconstruct_book(data, cache_dir=cache_dir)
+
+    assert (full["L1-BidPrice"] == -1).sum() == num_rows
+    pd.testing.assert_frame_equal(full.loc[full["L1-BidPrice"] != -1], reference.loc[full["L1-BidPrice"].to_numpy() != -1])
+    assert _get_entries(cache_dir) == entry_list
+    assert not glob.glob(os.path.join(cache_dir, "*", "*.lock"))
+
+def test_cache_wait_for_other_job(data, tmp_path, monkeypatch):
+    """
+    A partition locked by another job is not reconstructed, but read once the other job has written it.
+    """
+
+    # ...
+    monkeypatch.setattr("library.data.parser.parse_tickhistory_legacy_to_normalized.CACHE_POLL_INTERVAL", 0.05)
+    cache_dir = os.path.join(tmp_path, "cache")
+    chunkwise_reconstruct_book(data, cache_dir=cache_dir)
+    path = _get_entries(cache_dir)[0]
+    chunk = _read_cache(path)
+    chunk["L1-BidPrice"] = -1.0
+    os.remove(path)
+
+    # the other job writes the entry some time after the lock has been taken
+    _acquire_lock(path, "other")
+    def other():
+        time.sleep(0.5)
+        _write_cache(path, chunk)
+        _release_lock(path, "other")
+    thread = threading.Thread(target=other)
+    thread.start()
+    full = chunkwise_reconstruct_book(data, cache_dir=cache_dir)
+    thread.join()
+
+    assert (full["L1-BidPrice"] == -1).sum() == len(chunk)
+
+def test_lock(tmp_path, monkeypatch):
+    """
+    Locks are exclusive, released only by their holder, refreshed while held and broken once stale.
+    """
+
+    # ...
+    path = os.path.join(tmp_path, "entry.feather")
+    assert _acquire_lock(path, "a")
+    assert not _acquire_lock(path, "b")
+    _release_lock(path, "b")
+    assert os.path.exists(path + ".lock")
+
+    # refreshed while held
+    monkeypatch.setattr("library.data.parser.parse_tickhistory_legacy_to_normalized.CACHE_LOCK_REFRESH", 0.05)
+    os.utime(path + ".lock", (0, 0))
+    assert _is_stale_lock(path + ".lock")
+    with _refresh_locks({path}, "a"):
+        time.sleep(0.5)
+    assert not _is_stale_lock(path + ".lock")
+
+    # stale, broken by another job whose lock is not released by the previous holder
+    os.utime(path + ".lock", (0, time.time() - CACHE_LOCK_TIMEOUT - 1))
+    assert _acquire_lock(path, "b")
+    _release_lock(path, "a")
+    assert os.path.exists(path + ".lock")
+    _release_lock(path, "b")
+    assert not os.path.exists(path + ".lock")
+
+# PRODUCTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def _get_raw_events():
+    """
+    TRTH raw legacy data (as loaded by `load_df`) with trades and quotes of two '#RIC's, one UPDATE STATE per
+    list item, i.e. ('#RIC', 'Date-Time', [('FID Name', 'FID Value'), ...]).
+    """
+
+    # ...
+    update_list = [
+        ("A.DE", "2021-01-04 07:00:00.000", [("TIMACT_MS", 25_200_000), ("BEST_BID1", 10.0)]), # book only
+        ("A.DE", "2021-01-04 07:00:01.000", [("SALTIM_MS", 25_201_000), ("TRDPRC_1", 10.5), ("TRDVOL_1", 100), ("TRDPRC_1", 11.0)]), # trade, first value wins
+        ("A.DE", "2021-01-04 07:00:02.000", [("QUOTIM_MS", 25_202_000), ("BID", 10.4), ("BIDSIZE", 50)]), # quote
+        ("B.DE", "2021-01-04 07:00:03.000", [("QUOTIM_MS", 25_203_000), ("ASK", 20.0), ("ASKSIZE", 10)]), # quote of another '#RIC'
+        ("A.DE", "2021-01-04 07:00:04.000", [("QUOTIM_MS", 25_204_000), ("ASK", 10.6)]), # quote, bid forward-filled
+        ("A.DE", "2021-01-04 07:00:05.000", [("TRDVOL_1", 200), ("ACVOL_1", 300)]), # no trigger, no trade
+        ("B.DE", "2021-01-04 07:00:06.000", [("TRDPRC_1", np.nan)]), # trade without exchange time, price missing
+    ]
+    row_list = []
+    for ric, datetime, fid_list in update_list:
+        row_list.append((ric, pd.Timestamp(datetime, tz="UTC"), 1.0, None, np.nan))
+        row_list.extend((None, pd.NaT, np.nan, fidname, value) for fidname, value in fid_list)
+    df = pd.DataFrame(row_list, columns=["#RIC", "Date-Time", "GMT Offset", "FID Name", "FID Value"])
+    df["#RIC"] = df["#RIC"].astype("category")
+    df["FID Name"] = df["FID Name"].astype("category")
+
+    return df
+
+def test_extract_events():
+    """
+    One event per UPDATE STATE that includes a trigger, first value wins, quotes are forward-filled per '#RIC'.
+    """
+
+    # ...
+    data = _get_raw_events()
+    product_dict = extract_products(data, products=["book", "trades", "quotes"])
+    trades, quotes = product_dict["trades"], product_dict["quotes"]
+
+    assert list(product_dict) == ["book", "trades", "quotes"]
+    pd.testing.assert_frame_equal(product_dict["book"], chunkwise_reconstruct_book(data))
+    assert trades["#RIC"].tolist() == ["A.DE", "B.DE"] and (trades["Type"] == "Trade").all()
+    assert trades["Price"].tolist() == [10.5, 0.0] and trades["Volume"].tolist() == [100, 0]
+    assert trades["Date-Time-Exch"].iloc[0] == pd.Timestamp("2021-01-04 07:00:01") and pd.isna(trades["Date-Time-Exch"].iloc[1])
+    assert quotes["#RIC"].tolist() == ["A.DE", "B.DE", "A.DE"] and (quotes["Type"] == "Quote").all()
+    assert quotes["BidPrice"].tolist() == [10.4, 0.0, 10.4] and quotes["BidSize"].tolist() == [50, 0, 50]
+    assert quotes["AskPrice"].tolist() == [0.0, 20.0, 10.6] and quotes["AskSize"].tolist() == [0, 10, 0]
+    assert quotes["GMT Offset"].dtype == np.int8 and quotes["BidSize"].dtype.kind == "i"
+
+def test_extract_products_book(data, reference):
+    """
+    The book extracted with other products equals the book reconstructed alone, synthetic data has no events.
+    """
+
+    # ...
+    product_dict = extract_products(data, products=["book", "trades", "quotes"])
+
+    pd.testing.assert_frame_equal(product_dict["book"], reference)
+    assert len(product_dict["trades"]) == len(product_dict["quotes"]) == 0
+
+# COLUMNAR . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.mark.parametrize("format", ["parquet", "feather"])
+def test_columnar_round_trip(reference, tmp_path, format):
+    """
+    Saving as partitioned dataset and loading all columns restores the book, regular or compact layout, including dtypes.
+    """
+
+    # we do not know whether pyarrow is installed on system
+    pytest.importorskip("pyarrow")
+
+    # ...
+    path = os.path.join(tmp_path, "book.{}".format(format))
+    save_df(reference, path, format=format)
+    df = load_reconstructed_df(path, format=format)
+
+    assert sorted(os.listdir(path)) == ["RIC={}".format(ric) for ric in sorted(RICS)]
+    pd.testing.assert_frame_equal(_sort_by_ric(df, reference), reference.reset_index(drop=True), check_categorical=False)
+
+    # compact layout, integer prices and 'Price Decimals' are kept
+    compact = compact_book(reference)
+    save_df(compact, path, format=format)
+    df = load_reconstructed_df(path, format=format)
+    pd.testing.assert_frame_equal(_sort_by_ric(df, compact), compact.reset_index(drop=True), check_categorical=False)
+
+def test_columnar_projection(reference, tmp_path):
+    """
+    Loading selected columns, levels, '#RIC's and time range (end exclusive) equals selecting them from the book.
+    """
+
+    # we do not know whether pyarrow is installed on system
+    pytest.importorskip("pyarrow")
+
+    # ...
+    path = os.path.join(tmp_path, "book.parquet")
+    save_df(reference, path, format="parquet")
+    ric = RICS[1]
+    start, end = reference["Date-Time"].quantile([0.25, 0.75])
+    is_selected = (reference["#RIC"] == ric) & (reference["Date-Time"] >= start) & (reference["Date-Time"] < end)
+
+    # levels 1 to 2 of all columns
+    df = load_reconstructed_df(path, levels=2, ric=ric, start=start, end=end)
+    columns = [col for col in reference.columns if not col.startswith("L") or int(col.split("-")[0][1:]) <= 2]
+    assert "L2-AskSize" in df.columns and "L3-BidPrice" not in df.columns and "L10-BidPrice" not in df.columns
+    pd.testing.assert_frame_equal(df, reference.loc[is_selected, columns].reset_index(drop=True), check_categorical=False)
+
+    # given columns, limited to levels 1 to 1
+    df = load_reconstructed_df(path, columns=["Date-Time", "L1-BidPrice", "L2-BidPrice"], levels=1, ric=[ric], start=start, end=end)
+    pd.testing.assert_frame_equal(df, reference.loc[is_selected, ["Date-Time", "L1-BidPrice"]].reset_index(drop=True))
+
+# SIDECAR . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.fixture
+def path_copy(path_list, tmp_path):
+    """
+    Copy of a raw file, such that its sidecar is written next to it and the file can be changed.
+    """
+
+    # ...
+    path = os.path.join(tmp_path, os.path.basename(path_list[0]))
+    shutil.copy(path_list[0], path)
+
+    return path
+
+def test_sidecar_equals_pruned(path_copy, reference):
+    """
+    Loading from the sidecar, when written and when mapped, equals loading pruned, except for 'Date-Time' as
+    UTC (timezone-unaware), and reconstructs the same book, also for a subset of the mapping.
+    """
+
+    # ...
+    expected = load_df(path_copy)
+    expected["Date-Time"] = expected["Date-Time"].dt.tz_localize(None)
+    for _ in range(2):
+        pd.testing.assert_frame_equal(load_df(path_copy, sidecar=True), expected)
+    assert os.path.isdir(path_copy + ".sidecar")
+
+    ric = expected["#RIC"].dropna().iloc[0]
+    pd.testing.assert_frame_equal(
+        chunkwise_reconstruct_book(load_df(path_copy, sidecar=True)).reset_index(drop=True),
+        reference[reference["#RIC"] == ric].reset_index(drop=True),
+        check_categorical=False,
+    )
+    pd.testing.assert_frame_equal(
+        chunkwise_reconstruct_book(load_df(path_copy, sidecar=True, depth=2, fields=["Price"])),
+        chunkwise_reconstruct_book(load_df(path_copy, depth=2, fields=["Price"])),
+    )
+
+def test_sidecar_invalidated(path_copy):
+    """
+    A sidecar is kept while size and modification time, or else content, of the raw file are unchanged, and
+    rewritten once the raw file has changed.
+    """
+
+    # ...
+    load_df(path_copy, sidecar=True)
+    path_meta = os.path.join(path_copy + ".sidecar", "meta.json")
+    meta = _read_sidecar_meta(path_copy, path_copy + ".sidecar")
+    assert meta["version"] == SIDECAR_VERSION
+
+    # modification time changed, content unchanged: kept, modification time updated
+    path_array = os.path.join(path_copy + ".sidecar", "FID Value.npy")
+    written_ns = os.stat(path_array).st_mtime_ns
+    os.utime(path_copy, ns=(0, 0))
+    assert _read_sidecar_meta(path_copy, path_copy + ".sidecar")["mtime_ns"] == 0
+    load_df(path_copy, sidecar=True)
+    assert os.stat(path_array).st_mtime_ns == written_ns
+
+    # size changed, i.e. fewer rows: rewritten
+    df = load_df(path_copy, prune=False)
+    dt.Frame(df.iloc[:len(df) // 2].assign(**{"Date-Time": df["Date-Time"].dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")})).to_csv(path_copy, compression="gzip")
+    assert _read_sidecar_meta(path_copy, path_copy + ".sidecar") is None
+    expected = load_df(path_copy)
+    expected["Date-Time"] = expected["Date-Time"].dt.tz_localize(None)
+    pd.testing.assert_frame_equal(load_df(path_copy, sidecar=True), expected)
+    assert _read_sidecar_meta(path_copy, path_copy + ".sidecar")["nrows"] == len(expected)
+
+    # outdated version: rewritten
+    meta = _read_sidecar_meta(path_copy, path_copy + ".sidecar")
+    _write_json_atomic(path_meta, dict(meta, version=SIDECAR_VERSION - 1))
+    assert _read_sidecar_meta(path_copy, path_copy + ".sidecar") is None
+    load_df(path_copy, sidecar=True)
+    assert _read_sidecar_meta(path_copy, path_copy + ".sidecar")["version"] == SIDECAR_VERSION
+
+# TIMESTAMPS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_parse_datetime_equals_pandas():
+    """
+    Parsing 'Date-Time' by integer arithmetic equals `pd.to_datetime`, including leap days and years before 1970.
+    """
+
+    # ...
+    rng = np.random.default_rng(0)
+    nanoseconds = rng.integers(pd.Timestamp("1900-01-01").value, pd.Timestamp("2100-01-01").value, 10_000)
+    nanoseconds = np.r_[nanoseconds, [pd.Timestamp(value).value for value in ("2000-02-29", "2020-02-29 23:59:59.999999999", "1970-01-01")]]
+    values = pd.DatetimeIndex(nanoseconds).strftime("%Y-%m-%dT%H:%M:%S.%fZ").to_numpy(dtype=object)
+    values = np.array(["{}{:03d}Z".format(value[:-1], ns % 1000) for value, ns in zip(values, nanoseconds)], dtype=object)
+
+    np.testing.assert_array_equal(parse_datetime(values), pd.DatetimeIndex(pd.to_datetime(values, utc=True)).tz_localize(None).asi8)
+    np.testing.assert_array_equal(parse_datetime(values), nanoseconds)
+
+def test_parse_datetime_missing():
+    """
+    Missing values (NaN, None, empty) are NaT, other values are parsed.
+    """
+
+    # ...
+    values = np.array([np.nan, "2021-01-04T07:00:05.472046291Z", None, ""], dtype=object)
+
+    np.testing.assert_array_equal(parse_datetime(values), [NAT, pd.Timestamp("2021-01-04T07:00:05.472046291").value, NAT, NAT])
+    np.testing.assert_array_equal(parse_datetime(np.array([np.nan, ""], dtype=object)), [NAT, NAT])
+
+@pytest.mark.parametrize("value", [
+    "2021-13-04T07:00:05.472046291Z", # month
+    "2021-00-04T07:00:05.472046291Z",
+    "2021-01-32T07:00:05.472046291Z", # day
+    "2021-02-29T07:00:05.472046291Z", # no leap year
+    "2021-01-04T24:00:05.472046291Z", # hour
+    "2021-01-04T07:60:05.472046291Z", # minute
+    "2021-01-04T07:00:60.472046291Z", # second, a leap second is accepted by pandas
+])
+def test_parse_datetime_out_of_range(value):
+    """
+    Fields out of range are not wrapped around, but parsed by pandas, i.e. raise where `pd.to_datetime` raises.
+    """
+
+    # ...
+    values = np.array(["2021-01-04T07:00:05.472046291Z", value], dtype=object)
+    try:
+        expected = pd.DatetimeIndex(pd.to_datetime(values, utc=True)).tz_localize(None).asi8
+    except ValueError:
+        with pytest.raises(ValueError):
+            parse_datetime(values)
+    else:
+        np.testing.assert_array_equal(parse_datetime(values), expected)
+
+def test_parse_datetime_other_format():
+    """
+    Values of another format are parsed by pandas.
+    """
+
+    # ...
+    values = np.array(["2021-01-04 07:00:05.472", "2021-01-04 23:59:59.000"], dtype=object)
+
+    np.testing.assert_array_equal(parse_datetime(values), pd.DatetimeIndex(pd.to_datetime(values, utc=True)).tz_localize(None).asi8)
+
+@pytest.mark.parametrize("datetime, milliseconds, datetime_exch", [
+    ("2021-01-05 00:00:00.002", 86_399_999, "2021-01-04 23:59:59.999"), # previous day
+    ("2021-01-04 23:59:59.999", 1, "2021-01-05 00:00:00.001"), # next day (clock skew)
+    ("2021-01-04 07:00:05.472", 25_205_470, "2021-01-04 07:00:05.470"), # same day
+])
+def test_get_datetime_exch_rollover(datetime, milliseconds, datetime_exch):
+    """
+    'Date-Time-Exch' rolls over to the previous or next day around midnight (see `_get_datetime_exch`).
+    """
+
+    # ...
+    result = _get_datetime_exch(np.array([pd.Timestamp(datetime).value]), np.array([milliseconds]))
+
+    assert result[0] == pd.Timestamp(datetime_exch).value
@@ -0,0 +1,548 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: order book features per snapshot (see `compute_book_features`)
+
+# general imports
+import argparse
+from collections import namedtuple
+import numpy as np
+import os
+import pandas as pd
+import sys
+import time
+
+# make library importable if run as script, e.g. `python library/data/replay/book_reconstructor.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.data.parser.parse_tickhistory_legacy_to_normalized import NANOSECONDS_PER_DAY, NAT, _get_datetime_exch, select_mapping
+
+# settings
+OUTPUTS = ("snapshot", "delta")
+BATCH_SIZE = 100_000 # number of messages per array pushed, see command line interface
+
+# emitted book state, columns are column codes (all columns for snapshots, changed columns for deltas)
+Snapshot = namedtuple("Snapshot", ["ric", "sequence", "datetime", "datetime_exch", "gmt_offset", "columns", "values"])
+
+class _Instrument:
+    """
+    State of a single '#RIC': CURRENT STATE, calendar date of the current
+    partition, empty UPDATE STATEs that wait for the next non-empty one, the
+    held-back row (may be a duplicate of the next one) and the last emitted
+    book (for deltas). Rows are (sequence, 'Date-Time', 'GMT Offset') arrays.
+    """
+
+    __slots__ = ("ric", "book", "day", "waiting", "pending", "last")
+
+    def __init__(self, ric, num_columns:int):
+        self.ric = ric
+        self.book = np.full(num_columns, np.nan)
+        self.day = None
+        self.waiting = []
+        self.pending = None
+        self.last = np.full(num_columns, np.nan)
+
+class BookReconstructor:
+
+    def __init__(self, depth=None, fields=None, seed=True, output="snapshot"):
+        """
+        Reconstruct TRTH book incrementally, message by message (`push`) or
+        array by array (`push_arrays`), e.g. to replay raw legacy data in a
+        backtest. Messages are rows of TRTH raw legacy data, i.e. either an
+        UPDATE STATE ('#RIC', 'Date-Time', 'GMT Offset') or a 'FID Name' and
+        'FID Value' that belong to the preceding UPDATE STATE.
+
+        Emitted rows agree exactly with `chunkwise_reconstruct_book` applied
+        to the same messages, including its quirks (first value per 'FID
+        Name' wins, empty UPDATE STATEs take the next non-empty one, rows
+        without TIMACT_MS are removed, duplicate book states are removed, and
+        partitions per '#RIC' and calendar date are seeded). Hence, a row is
+        emitted once the next row of the same '#RIC' shows that it is not a
+        duplicate, or once its partition is complete (see `flush`).
+
+        Messages of several instruments may be interleaved, the calendar
+        date of the UPDATE STATEs of each '#RIC' must not decrease.
+
+        :param depth:
+            int, include book levels 1 to depth, default is None (all 10 levels)
+        :param fields:
+            list, include fields matching any of these, e.g. ["Price", "Size"], default is None (all fields)
+        :param seed:
+            bool, whether to seed each partition with the closing book state of the previous one, default is True
+        :param output:
+            str, either "snapshot" (all columns per row) or "delta" (changed columns per row), default is "snapshot"
+        """
+
+        # ...
+        assert output in OUTPUTS, \
+            "(ERROR) output must be one of {outputs}, you provided value {value}".format(
+                outputs=OUTPUTS,
+                value=output,
+            )
+
+        # 'FID Name' values mapped to column codes, TIMACT_MS is column 0
+        self.mapping = select_mapping(depth=depth, fields=fields)
+        self.columns = list(self.mapping.values())
+        self.codes = {fidname: j for j, fidname in enumerate(self.mapping)}
+        self.seed = seed
+        self.output = output
+
+        # state per '#RIC', open UPDATE STATE (its '#RIC' and header) and its values (first value per column)
+        self.instruments = {}
+        self.sequence = 0
+        self.group = None
+        self.group_values = np.full(len(self.columns), np.nan)
+        self.group_count = 0
+
+    def push(self, ric, datetime, gmt_offset, fidname, value):
+        """
+        Push a single message, i.e. a row of TRTH raw legacy data. Values of
+        the open UPDATE STATE are applied once the next UPDATE STATE arrives.
+
+        :param ric:
+            str, '#RIC' (UPDATE STATE only)
+        :param datetime:
+            int, 'Date-Time' in nanoseconds since epoch (UTC), None for 'FID Name' messages
+        :param gmt_offset:
+            int, 'GMT Offset' (UPDATE STATE only)
+        :param fidname:
+            str, 'FID Name' (None for UPDATE STATEs)
+        :param value:
+            float, 'FID Value'
+        :return snapshot_list:
+            list, emitted rows (Snapshot), often empty
+        """
+
+        # 'FID Name' of the open UPDATE STATE, first value per column wins, missing value is 0
+        if datetime is None or datetime == NAT:
+            code = self.codes.get(fidname)
+            if code is None or self.group is None:
+                return []
+            if self.group_values[code] != self.group_values[code]:
+                self.group_values[code] = 0 if value is None or value != value else value
+                self.group_count += 1
+            return []
+
+        # UPDATE STATE, closes the open one
+        batch_list = self._close_group()
+        batch_list.extend(self._open_group(ric, datetime, gmt_offset))
+
+        return self._to_snapshots(batch_list)
+
+    def push_arrays(self, ric, datetime, gmt_offset, fidname, value):
+        """
+        Push an array of messages, i.e. rows of TRTH raw legacy data, all at
+        once. The state is the same as if the messages were pushed one by
+        one, but complete UPDATE STATEs are applied vectorized.
+
+        :param ric:
+            array-like, '#RIC' per message (relevant for UPDATE STATEs only)
+        :param datetime:
+            array-like, 'Date-Time' in nanoseconds since epoch (UTC), int64 or datetime64, NaT for 'FID Name' messages
+        :param gmt_offset:
+            array-like, 'GMT Offset' per message (relevant for UPDATE STATEs only)
+        :param fidname:
+            array-like, 'FID Name' per message
+        :param value:
+            array-like, 'FID Value' per message, float
+        :return full:
+            pd.DataFrame, emitted rows, in the layout of `reconstruct_book` (snapshot) or one row per changed column (delta)
+        """
+
+        # ...
+        datetime = np.asarray(datetime)
+        datetime = datetime.astype("datetime64[ns]").view(np.int64) if datetime.dtype.kind == "M" else datetime.astype(np.int64)
+        code = pd.Categorical(fidname, categories=list(self.codes)).codes
+        value = np.asarray(value, dtype=np.float64)
+        header_index = np.flatnonzero(datetime != NAT)
+
+        # messages before the first UPDATE STATE belong to the open one
+        first = header_index[0] if len(header_index) else len(code)
+        self._apply_values(code[:first], value[:first])
+        if not len(header_index):
+            return self._to_frame([])
+        batch_list = self._close_group()
+
+        # assign messages to UPDATE STATEs, the last one stays open
+        group = np.cumsum(datetime != NAT) - 1
+        last = header_index[-1]
+        group_ric = np.asarray(ric, dtype=object)[header_index[:-1]]
+        group_datetime = datetime[header_index[:-1]]
+        group_gmt_offset = np.asarray(gmt_offset)[header_index[:-1]]
+
+        # select relevant messages of complete UPDATE STATEs, keep only the first value per (UPDATE STATE, column)
+        fid_index = np.flatnonzero((code >= 0) & (group >= 0) & (datetime == NAT))
+        fid_index = fid_index[fid_index < last]
+        cell = group[fid_index] * len(self.columns) + code[fid_index]
+        fid_index = fid_index[~pd.Series(cell).duplicated(keep="first").to_numpy()]
+        fid_group, fid_code = group[fid_index], code[fid_index]
+        fid_value = value[fid_index]
+        fid_value[np.isnan(fid_value)] = 0
+        is_nonempty = np.bincount(fid_group, minlength=len(header_index) - 1) > 0
+
+        # apply complete UPDATE STATEs per '#RIC' and calendar date, in order
+        sequence = self.sequence + np.arange(len(header_index) - 1)
+        ric_code, ric_list = pd.factorize(group_ric)
+        day = group_datetime // NANOSECONDS_PER_DAY
+        for i, value_ric in enumerate(ric_list):
+            group_index = np.flatnonzero(ric_code == i)
+            change = np.flatnonzero(np.diff(day[group_index])) + 1
+            for first, end in zip(np.r_[0, change], np.r_[change, len(group_index)]):
+                run = group_index[first:end]
+                is_run = np.isin(fid_group, run)
+                instrument, batch_list_day = self._get_instrument(value_ric, int(day[run[0]]))
+                batch_list.extend(batch_list_day)
+                batch_list.append(self._apply_run(instrument,
+                    sequence[run], group_datetime[run], group_gmt_offset[run], is_nonempty[run],
+                    np.searchsorted(run, fid_group[is_run]), fid_code[is_run], fid_value[is_run],
+                ))
+        self.sequence += len(header_index) - 1
+
+        # open the last UPDATE STATE, apply its values
+        batch_list.extend(self._open_group(np.asarray(ric, dtype=object)[last], int(datetime[last]), np.asarray(gmt_offset)[last]))
+        self._apply_values(code[last + 1:], value[last + 1:])
+
+        return self._to_frame(batch_list)
+
+    def push_df(self, data:pd.DataFrame):
+        """
+        Push TRTH raw legacy data, e.g. as returned by `load_df`, see `push_arrays`.
+        """
+
+        # ...
+        datetime = pd.DatetimeIndex(data["Date-Time"])
+        datetime = datetime.tz_convert(None) if datetime.tz is not None else datetime
+
+        return self.push_arrays(data["#RIC"].to_numpy(), datetime.asi8, data["GMT Offset"].to_numpy(),
+            data["FID Name"].to_numpy(), pd.to_numeric(data["FID Value"], errors="coerce").to_numpy(dtype=np.float64),
+        )
+
+    def flush(self, as_frame=True):
+        """
+        Close the open UPDATE STATE and complete all partitions, i.e. emit
+        all rows that are held back, e.g. at the end of the input.
+
+        :param as_frame:
+            bool, whether to return a DataFrame (see `push_arrays`) or a list of Snapshot (see `push`), default is True
+        :return full:
+            pd.DataFrame or list, emitted rows
+        """
+
+        # ...
+        batch_list = self._close_group()
+        for instrument in self.instruments.values():
+            batch_list.extend(self._complete_partition(instrument))
+        self.group = None
+
+        return self._to_frame(batch_list) if as_frame else self._to_snapshots(batch_list)
+
+    def get_book(self, ric):
+        """
+        Get the CURRENT STATE of a '#RIC', i.e. after its last complete,
+        non-empty UPDATE STATE (NaN where a column has never been updated).
+
+        :param ric:
+            str, '#RIC'
+        :return book:
+            pd.Series, one value per column, TIMACT_MS first
+        """
+
+        # ...
+        instrument = self.instruments.get(ric)
+        book = instrument.book if instrument is not None else np.full(len(self.columns), np.nan)
+
+        return pd.Series(book, index=self.columns)
+
+    def _get_instrument(self, ric, day:int):
+        """
+        Get the state of a '#RIC', complete its partition if the calendar
+        date changes, i.e. emit held-back rows and seed the next partition.
+        """
+
+        # ...
+        instrument = self.instruments.get(ric)
+        if instrument is None:
+            instrument = self.instruments[ric] = _Instrument(ric, len(self.columns))
+        batch_list = self._complete_partition(instrument) if instrument.day is not None and instrument.day != day else []
+        instrument.day = day
+
+        return instrument, batch_list
+
+    def _open_group(self, ric, datetime:int, gmt_offset):
+        """
+        Open an UPDATE STATE, return the rows emitted by completing the previous partition of its '#RIC', if any.
+        """
+
+        # ...
+        instrument, batch_list = self._get_instrument(ric, datetime // NANOSECONDS_PER_DAY)
+        self.group = (instrument, self.sequence, datetime, gmt_offset)
+        self.sequence += 1
+        self.group_values[:] = np.nan
+        self.group_count = 0
+
+        return batch_list
+
+    def _apply_values(self, code:np.ndarray, value:np.ndarray):
+        """
+        Apply values to the open UPDATE STATE, first value per column wins, missing value is 0.
+        """
+
+        # ...
+        is_relevant = code >= 0
+        if self.group is None or not is_relevant.any():
+            return
+        code, value = code[is_relevant], value[is_relevant]
+        code, index = np.unique(code, return_index=True)
+        is_new = np.isnan(self.group_values[code])
+        self.group_values[code[is_new]] = np.nan_to_num(value[index[is_new]], nan=0)
+        self.group_count += int(is_new.sum())
+
+    def _close_group(self):
+        """
+        Close the open UPDATE STATE, i.e. apply its values to the CURRENT
+        STATE of its '#RIC', or let it wait for the next non-empty one.
+        """
+
+        # ...
+        if self.group is None:
+            return []
+        instrument, sequence, datetime, gmt_offset = self.group
+        self.group = None
+        if not self.group_count:
+            instrument.waiting.append((sequence, datetime, gmt_offset))
+            return []
+
+        # all waiting UPDATE STATEs take the new CURRENT STATE
+        instrument.book = np.where(np.isnan(self.group_values), instrument.book, self.group_values)
+        rows = instrument.waiting + [(sequence, datetime, gmt_offset)]
+        instrument.waiting = []
+
+        batch = self._emit(instrument, *map(np.array, zip(*rows)), np.tile(instrument.book, (len(rows), 1)))
+
+        return [batch] if batch else []
+
+    def _apply_run(self, instrument:_Instrument, sequence, datetime, gmt_offset, is_nonempty, fid_group, fid_code, fid_value):
+        """
+        Apply complete UPDATE STATEs of a single '#RIC' and calendar date
+        vectorized, as `_reconstruct_book_numpy` does, starting from the
+        CURRENT STATE and the waiting UPDATE STATEs of the instrument.
+        """
+
+        # prepend waiting UPDATE STATEs (empty)
+        if instrument.waiting:
+            waiting = tuple(map(np.array, zip(*instrument.waiting)))
+            sequence = np.r_[waiting[0], sequence]
+            datetime = np.r_[waiting[1], datetime]
+            gmt_offset = np.r_[waiting[2], gmt_offset]
+            is_nonempty = np.r_[np.zeros(len(instrument.waiting), dtype=bool), is_nonempty]
+            fid_group = fid_group + len(instrument.waiting)
+
+        # scatter values of non-empty UPDATE STATEs, row 0 is the CURRENT STATE, forward-fill column by column
+        rank = np.cumsum(is_nonempty)
+        num_nonempty = int(rank[-1])
+        book = np.full((num_nonempty + 1, len(self.columns)), np.nan)
+        book[0, :] = instrument.book
+        book[rank[fid_group], fid_code] = fid_value
+        row_number = np.arange(num_nonempty + 1)
+        for j in range(len(self.columns)):
+            index = np.where(np.isnan(book[:, j]), 0, row_number)
+            np.maximum.accumulate(index, out=index)
+            book[:, j] = book[index, j]
+
+        # each UPDATE STATE takes the next non-empty one, trailing empty ones keep waiting
+        source = rank - is_nonempty + 1
+        is_resolved = source <= num_nonempty
+        instrument.waiting = list(zip(sequence[~is_resolved].tolist(), datetime[~is_resolved].tolist(), gmt_offset[~is_resolved].tolist()))
+        instrument.book = book[-1].copy()
+
+        return self._emit(instrument, sequence[is_resolved], datetime[is_resolved], gmt_offset[is_resolved], book[source[is_resolved]])
+
+    def _complete_partition(self, instrument:_Instrument):
+        """
+        Complete the partition of an instrument: waiting UPDATE STATEs keep
+        the CURRENT STATE, the held-back row is emitted, and the CURRENT
+        STATE becomes the seed of the next partition (without TIMACT_MS).
+        """
+
+        # ...
+        rows = instrument.waiting
+        instrument.waiting = []
+        if rows:
+            batch = self._emit(instrument, *map(np.array, zip(*rows)), np.tile(instrument.book, (len(rows), 1)), final=True)
+        else:
+            batch = self._emit(instrument, np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.array([]),
+                np.empty((0, len(self.columns))), final=True,
+            )
+
+        # seed
+        if self.seed:
+            instrument.book = instrument.book.copy()
+            instrument.book[0] = np.nan
+        else:
+            instrument.book = np.full(len(self.columns), np.nan)
+
+        return [batch] if batch else []
+
+    def _emit(self, instrument:_Instrument, sequence, datetime, gmt_offset, book, final=False):
+        """
+        Remove rows without TIMACT_MS and duplicate book states (keep last,
+        NaN is never equal), hold back the last row unless final.
+
+        :return batch:
+            tuple, (instrument, sequence, datetime, gmt_offset, book) of emitted rows, or None
+        """
+
+        # remove rows without TIMACT_MS, prepend held-back row
+        is_valid = ~np.isnan(book[:, 0])
+        sequence, datetime, gmt_offset, book = sequence[is_valid], datetime[is_valid], gmt_offset[is_valid], book[is_valid]
+        if instrument.pending is not None:
+            sequence, datetime, gmt_offset, book = (np.concatenate([pending, value])
+                for pending, value in zip(instrument.pending, (sequence, datetime, gmt_offset, book))
+            )
+            instrument.pending = None
+        if not len(sequence):
+            return None
+
+        # keep rows whose book state differs from the next one, hold back the last row
+        is_kept = np.ones(len(sequence), dtype=bool)
+        is_kept[:-1] = (book[:-1, 1:] != book[1:, 1:]).any(axis=1)
+        if not final:
+            instrument.pending = (sequence[-1:], datetime[-1:], gmt_offset[-1:], book[-1:])
+            is_kept[-1] = False
+        if not is_kept.any():
+            return None
+
+        return (instrument, sequence[is_kept], datetime[is_kept], gmt_offset[is_kept], book[is_kept])
+
+    def _get_changed(self, instrument:_Instrument, book:np.ndarray):
+        """
+        Mask of changed columns of emitted rows, compared to the previous
+        emitted row of the same '#RIC' (NaN equals NaN), update the last emitted row.
+        """
+
+        # ...
+        previous = np.concatenate([instrument.last[None, :], book[:-1]])
+        is_changed = (book != previous) & ~(np.isnan(book) & np.isnan(previous))
+        instrument.last = book[-1].copy()
+
+        return is_changed
+
+    def _to_snapshots(self, batch_list:list):
+        """
+        Convert emitted rows into a list of Snapshot, in order of emission.
+        """
+
+        # ...
+        snapshot_list = []
+        codes = np.arange(len(self.columns))
+        for instrument, sequence, datetime, gmt_offset, book in filter(None, batch_list):
+            is_changed = self._get_changed(instrument, book) if self.output == "delta" else None
+            for i in range(len(sequence)):
+                datetime_exch = _get_datetime_exch(int(datetime[i]), int(book[i, 0]))
+                if is_changed is None:
+                    columns, values = codes, book[i]
+                else:
+                    columns = np.flatnonzero(is_changed[i])
+                    values = book[i, columns]
+                snapshot_list.append(Snapshot(instrument.ric, int(sequence[i]), int(datetime[i]), datetime_exch,
+                    gmt_offset[i], columns, values,
+                ))
+
+        return snapshot_list
+
+    def _to_frame(self, batch_list:list):
+        """
+        Convert emitted rows into a DataFrame, in the layout of
+        `reconstruct_book` (snapshot) or with one row per changed column
+        (delta), in order of emission.
+        """
+
+        # ...
+        batch_list = [batch for batch in batch_list if batch]
+        ric = np.concatenate([np.full(len(batch[1]), batch[0].ric, dtype=object) for batch in batch_list] + [np.array([], dtype=object)])
+        sequence, datetime, gmt_offset = (np.concatenate([batch[k] for batch in batch_list] + [np.array([], dtype=np.int64)]).astype(np.int64)
+            for k in (1, 2, 3)
+        )
+        book = np.concatenate([batch[4] for batch in batch_list] + [np.empty((0, len(self.columns)))])
+        datetime_exch = _get_datetime_exch(datetime, book[:, 0].astype(np.int64))
+        gmt_offset = gmt_offset.astype(np.int8)
+
+        # ...
+        cols_base = {
+            "#RIC": ric,
+            "Type": "Reconstructed LL2",
+            "Date-Time": datetime.view("datetime64[ns]"),
+            "Date-Time-Exch": datetime_exch.view("datetime64[ns]"),
+            "GMT Offset": gmt_offset,
+        }
+
+        # delta: one row per changed column
+        if self.output == "delta":
+            is_changed = np.concatenate([self._get_changed(batch[0], batch[4]) for batch in batch_list] + [np.empty((0, len(self.columns)), dtype=bool)])
+            row, column = np.nonzero(is_changed)
+            return pd.DataFrame({
+                **{col: values[row] if isinstance(values, np.ndarray) else values for col, values in cols_base.items()},
+                "Column": np.array(self.columns, dtype=object)[column],
+                "Value": book[row, column],
+            }, index=sequence[row])
+
+        # snapshot: fill remaining NaN values with 0, ensure integer datatype for 'size' and 'no' columns, as the engines do
+        cols_book = {}
+        for j, col in enumerate(self.columns[1:], 1):
+            values = np.nan_to_num(book[:, j], nan=0)
+            if any(substring in col.lower() for substring in ["size", "no"]):
+                values = values.astype(int)
+            cols_book[col] = values
+
+        return pd.DataFrame({**cols_base, **cols_book}, index=sequence)
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("book_reconstructor")
+    parser.add_argument("--path", type=str, help="TRTH raw legacy data, as .csv(.gz/.zst)", default=None)
+    parser.add_argument("--batch_size", type=int, help="number of messages per array pushed, 1 pushes message by message", default=BATCH_SIZE)
+    parser.add_argument("--check", action="store_true", help="compare with `chunkwise_reconstruct_book`")
+
+    # parse args
+    args = parser.parse_args()
+
+    # load raw data once
+    from library.data.parser.parse_tickhistory_legacy_to_normalized import chunkwise_reconstruct_book, load_df
+    data = load_df(args.path)
+    datetime = pd.DatetimeIndex(data["Date-Time"]).tz_convert(None).asi8
+    ric, gmt_offset = data["#RIC"].to_numpy(), data["GMT Offset"].to_numpy()
+    fidname, value = data["FID Name"].to_numpy(), data["FID Value"].to_numpy(dtype=np.float64)
+
+    # replay
+    reconstructor = BookReconstructor()
+    time_start = time.perf_counter()
+    if args.batch_size <= 1:
+        snapshot_list = []
+        for i in range(len(data)):
+            snapshot_list.extend(reconstructor.push(ric[i], datetime[i] if datetime[i] != NAT else None, gmt_offset[i], fidname[i], value[i]))
+        full_list = [reconstructor._to_frame([])] + [reconstructor.flush()]
+        num_rows = len(snapshot_list) + len(full_list[-1])
+    else:
+        full_list = [reconstructor.push_arrays(ric[i:i + args.batch_size], datetime[i:i + args.batch_size], gmt_offset[i:i + args.batch_size],
+            fidname[i:i + args.batch_size], value[i:i + args.batch_size]) for i in range(0, len(data), args.batch_size)
+        ] + [reconstructor.flush()]
+        num_rows = sum(len(full) for full in full_list)
+    seconds = time.perf_counter() - time_start
+    print("replayed {} messages in {:.3f} seconds ({:.0f} messages/s), emitted {} rows".format(len(data), seconds, len(data) / seconds, num_rows))
+
+    # compare with batch output, per '#RIC' in order of emission
+    if args.check:
+        assert args.batch_size > 1, "(ERROR) check requires batch_size > 1"
+        full = pd.concat(full_list, axis=0)
+        reference = chunkwise_reconstruct_book(data)
+        full = full.sort_values("#RIC", kind="stable", key=lambda ric: ric.map({value: i for i, value in enumerate(pd.unique(reference["#RIC"]))}))
+        pd.testing.assert_frame_equal(full.reset_index(drop=True), reference.reset_index(drop=True), check_dtype=False)
+        print("identical to chunkwise_reconstruct_book")
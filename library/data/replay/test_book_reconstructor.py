@@ -0,0 +1,67 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import numpy as np
+import pandas as pd
+
+# library imports
+from library.data.parser.parse_tickhistory_legacy_to_normalized import NAT
+from library.data.replay.book_reconstructor import BookReconstructor
+
+# HELPERS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def _sort_by_ric(full:pd.DataFrame, reference:pd.DataFrame):
+    """
+    Order rows by '#RIC' as in the reference (stable), i.e. rows of each '#RIC' keep their order.
+    """
+
+    # ...
+    order = {ric: i for i, ric in enumerate(pd.unique(reference["#RIC"]))}
+
+    return full.sort_values("#RIC", kind="stable", key=lambda ric: ric.map(order)).reset_index(drop=True)
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_push_arrays_equals_chunkwise(merged, reference):
+    """
+    Incremental reconstruction, array by array (interleaved '#RIC's), equals chunkwise reconstruction.
+    """
+
+    # ...
+    reconstructor = BookReconstructor()
+    full_list = [reconstructor.push_df(merged.iloc[i:i + 7_919]) for i in range(0, len(merged), 7_919)]
+    full = pd.concat(full_list + [reconstructor.flush()], axis=0).sort_index(kind="stable")
+
+    pd.testing.assert_frame_equal(_sort_by_ric(full, reference), reference.reset_index(drop=True), check_dtype=False)
+
+def test_push_equals_chunkwise(merged, reference):
+    """
+    Incremental reconstruction, message by message (interleaved '#RIC's), equals chunkwise reconstruction.
+    """
+
+    # ...
+    datetime = pd.DatetimeIndex(merged["Date-Time"]).tz_convert(None).asi8
+    ric, gmt_offset = merged["#RIC"].to_numpy(), merged["GMT Offset"].to_numpy()
+    fidname, value = merged["FID Name"].to_numpy(), pd.to_numeric(merged["FID Value"], errors="coerce").to_numpy(dtype=np.float64)
+    reconstructor = BookReconstructor()
+    snapshot_list = []
+    for i in range(len(merged)):
+        snapshot_list.extend(reconstructor.push(ric[i], datetime[i] if datetime[i] != NAT else None, gmt_offset[i], fidname[i], value[i]))
+    snapshot_list.extend(reconstructor.flush(as_frame=False))
+    snapshot_list.sort(key=lambda snapshot: snapshot.sequence)
+
+    # compare '#RIC', 'Date-Time' and book per row
+    full = pd.DataFrame({
+        "#RIC": [snapshot.ric for snapshot in snapshot_list],
+        "Date-Time": np.array([snapshot.datetime for snapshot in snapshot_list], dtype="datetime64[ns]"),
+        **{col: np.nan_to_num([snapshot.values[j] for snapshot in snapshot_list], nan=0)
+            for j, col in enumerate(reconstructor.columns[1:], 1)
+        },
+    })
+    reference = reference.reset_index(drop=True)[full.columns]
+
+    pd.testing.assert_frame_equal(_sort_by_ric(full, reference), reference, check_dtype=False)
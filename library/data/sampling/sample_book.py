@@ -0,0 +1,306 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: sample trading sessions (e.g. 09:00 to 17:30 local time) rather than first to last update per day
+
+# general imports
+import argparse
+import numpy as np
+import os
+import pandas as pd
+import sys
+
+# make library importable if run as script, e.g. `python library/data/sampling/sample_book.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.utility.compression.compression import open_compressed
+
+# settings
+TIME_COLUMN = "Date-Time-Exch"
+SAMPLE_COLUMN = "Date-Time-Sample"
+BATCH_SIZE = 1_000_000 # number of sample points per DataFrame yielded
+NANOSECONDS_PER_DAY = 86_400_000_000_000
+
+class BookSampler:
+
+    def __init__(self, full:pd.DataFrame, time_column=TIME_COLUMN, columns=None):
+        """
+        Sample TRTH normalized book data, i.e. get the book state that is
+        valid at given points in time (as-of), or on a fixed grid of points
+        in time, per '#RIC'. Rows are sorted by '#RIC' and time once, sample
+        points are then located by binary search, and only the rows that are
+        sampled are copied, batch by batch, i.e. no join is materialized.
+
+        Among rows with equal timestamps, the last one is the valid book state
+        (rows keep their order, as the sort is stable). Samples without a
+        preceding book state are NaN, in which case integer columns of that
+        batch are float.
+
+        :param full:
+            pd.DataFrame, TRTH normalized book data, e.g. as returned by `chunkwise_reconstruct_book`
+        :param time_column:
+            str, column of book timestamps, default is TIME_COLUMN ('Date-Time-Exch')
+        :param columns:
+            list, columns to sample, default is None (all columns)
+        """
+
+        # ...
+        ric = pd.Categorical(full["#RIC"])
+        self.rics = list(ric.categories)
+        self.time_column = time_column
+
+        # sort by '#RIC', then time (stable), keep the segment boundaries per '#RIC'
+        times = _to_nanoseconds(full[time_column])
+        self.order = np.lexsort((times, ric.codes))
+        self.times = times[self.order]
+        self.bounds = np.searchsorted(ric.codes[self.order], np.arange(len(self.rics) + 1))
+
+        # keep columns as arrays, without copy, '#RIC' is given per sample
+        if columns is None:
+            columns = list(full.columns)
+        self.arrays = {col: full[col].array if isinstance(full[col].dtype, pd.api.extensions.ExtensionDtype)
+            else full[col].to_numpy() for col in columns if col != "#RIC"
+        }
+
+    def locate(self, ric:str, times, strict=False, tolerance=None):
+        """
+        Locate the book state that is valid at each point in time for a
+        single '#RIC', i.e. the last row with a timestamp before or at (if
+        not strict) the given time.
+
+        :param ric:
+            str, '#RIC'
+        :param times:
+            array-like, points in time, UTC, in any order
+        :param strict:
+            bool, whether to take the last row strictly before (e.g. before a trade), default is False
+        :param tolerance:
+            str or pd.Timedelta, maximum age of the book state, default is None (any)
+        :return positions:
+            np.ndarray, row positions in `full`, -1 if there is no valid book state
+        """
+
+        # ...
+        times = _to_nanoseconds(times)
+        if ric not in self.rics:
+            return np.full(len(times), -1, dtype=np.int64)
+        code = self.rics.index(ric)
+        start, end = self.bounds[code], self.bounds[code + 1]
+        segment = self.times[start:end]
+
+        # binary search, last row before (or at) each point in time
+        index = np.searchsorted(segment, times, side="left" if strict else "right") - 1
+        is_valid = index >= 0
+        index = np.maximum(index, 0)
+        if tolerance is not None and len(segment):
+            is_valid &= times - segment[index] <= pd.Timedelta(tolerance).value
+
+        return np.where(is_valid, self.order[start + index], -1)
+
+    def iter_asof(self, ric, times, strict=False, tolerance=None, batch_size=BATCH_SIZE):
+        """
+        Sample the book as-of given points in time, e.g. trade timestamps,
+        batch by batch, in the order of the given points in time.
+
+        :param ric:
+            str or array-like, '#RIC' of all points in time, or one per point in time
+        :param times:
+            array-like, points in time, UTC
+        :param strict:
+            bool, whether to take the last book state strictly before, default is False
+        :param tolerance:
+            str or pd.Timedelta, maximum age of the book state, default is None (any)
+        :param batch_size:
+            int, number of points in time per DataFrame, default is BATCH_SIZE
+        :return generator:
+            pd.DataFrame, '#RIC', 'Date-Time-Sample' and the sampled columns, one row per point in time
+        """
+
+        # ...
+        times = _to_nanoseconds(times)
+        rics = np.full(len(times), ric, dtype=object) if isinstance(ric, str) else np.asarray(ric, dtype=object)
+        assert len(rics) == len(times), "(ERROR) ric must be a single '#RIC' or one per point in time"
+
+        # locate per '#RIC' within each batch
+        for start in range(0, len(times), batch_size):
+            batch_rics, batch_times = rics[start:start + batch_size], times[start:start + batch_size]
+            positions = np.full(len(batch_times), -1, dtype=np.int64)
+            codes, uniques = pd.factorize(batch_rics)
+            for code, value in enumerate(uniques):
+                is_ric = codes == code
+                positions[is_ric] = self.locate(value, batch_times[is_ric], strict=strict, tolerance=tolerance)
+            yield self._take(positions, batch_rics, batch_times)
+
+    def sample_asof(self, ric, times, strict=False, tolerance=None):
+        """
+        Sample the book as-of given points in time, see `iter_asof`.
+
+        :return sample:
+            pd.DataFrame, '#RIC', 'Date-Time-Sample' and the sampled columns, one row per point in time
+        """
+
+        # ...
+        return _concat(self.iter_asof(ric, times, strict=strict, tolerance=tolerance))
+
+    def iter_grid(self, interval, ric=None, start=None, end=None, per_day=True, batch_size=BATCH_SIZE):
+        """
+        Sample the book on a fixed grid of points in time, e.g. every 100ms,
+        batch by batch, per '#RIC'. Grid points are multiples of the interval
+        (e.g. full seconds), from the first to the last update of each day
+        (or of the entire data, if not per_day), within start and end.
+
+        :param interval:
+            str or pd.Timedelta, e.g. "100ms", "1s", "5min"
+        :param ric:
+            str or list, '#RIC'(s) to sample, default is None (all)
+        :param start:
+            str or pd.Timestamp, first grid point at or after start (UTC), default is None
+        :param end:
+            str or pd.Timestamp, last grid point before end (UTC), default is None
+        :param per_day:
+            bool, whether to sample each day from its first to its last update only, default is True
+        :param batch_size:
+            int, number of grid points per DataFrame, default is BATCH_SIZE
+        :return generator:
+            pd.DataFrame, '#RIC', 'Date-Time-Sample' and the sampled columns, one row per grid point
+        """
+
+        # ...
+        interval = pd.Timedelta(interval).value
+        assert interval > 0, "(ERROR) interval must be positive, you provided value {value}".format(value=interval)
+        rics = self.rics if ric is None else [ric] if isinstance(ric, str) else list(ric)
+
+        # ...
+        for ric in rics:
+            if ric not in self.rics:
+                continue
+            code = self.rics.index(ric)
+            segment = self.times[self.bounds[code]:self.bounds[code + 1]]
+            if not len(segment):
+                continue
+
+            # time ranges to sample: each day, or the entire data
+            if per_day:
+                days = segment // NANOSECONDS_PER_DAY
+                change = np.flatnonzero(np.diff(days)) + 1
+                first, last = segment[np.r_[0, change]], segment[np.r_[change - 1, len(segment) - 1]]
+            else:
+                first, last = segment[:1], segment[-1:]
+            if start is not None:
+                first = np.maximum(first, _to_nanoseconds([start])[0])
+            if end is not None:
+                last = np.minimum(last, _to_nanoseconds([end])[0] - 1)
+
+            # grid points are multiples of the interval, generated batch by batch
+            for range_first, range_last in zip(first, last):
+                grid_first = -(-range_first // interval) * interval
+                num_points = max(0, (range_last - grid_first) // interval + 1)
+                for offset in range(0, num_points, batch_size):
+                    grid = grid_first + interval * np.arange(offset, min(offset + batch_size, num_points), dtype=np.int64)
+                    positions = self.locate(ric, grid)
+                    yield self._take(positions, np.full(len(grid), ric, dtype=object), grid)
+
+    def sample_grid(self, interval, ric=None, start=None, end=None, per_day=True):
+        """
+        Sample the book on a fixed grid of points in time, see `iter_grid`.
+
+        :return sample:
+            pd.DataFrame, '#RIC', 'Date-Time-Sample' and the sampled columns, one row per grid point
+        """
+
+        # ...
+        return _concat(self.iter_grid(interval, ric=ric, start=start, end=end, per_day=per_day))
+
+    def _take(self, positions:np.ndarray, rics:np.ndarray, times:np.ndarray):
+        """
+        Copy the sampled rows, NaN (NaT) where there is no valid book state.
+
+        :param positions:
+            np.ndarray, row positions, -1 if there is no valid book state
+        :param rics:
+            np.ndarray, '#RIC' per sample
+        :param times:
+            np.ndarray, points in time per sample, in nanoseconds
+        :return sample:
+            pd.DataFrame, '#RIC', 'Date-Time-Sample' and the sampled columns
+        """
+
+        # ...
+        has_missing = bool((positions < 0).any())
+        sample = {"#RIC": rics, SAMPLE_COLUMN: times.view("datetime64[ns]")}
+        for col, values in self.arrays.items():
+            if has_missing:
+                sample[col] = pd.api.extensions.take(values, positions, allow_fill=True)
+            else:
+                sample[col] = values[positions]
+
+        return pd.DataFrame(sample)
+
+def _to_nanoseconds(times):
+    """
+    Convert points in time to nanoseconds since epoch, timezone-aware
+    points in time are converted to UTC, timezone-unaware are taken as UTC.
+
+    :param times:
+        array-like, points in time
+    :return nanoseconds:
+        np.ndarray, int64
+    """
+
+    # ...
+    if isinstance(times, np.ndarray) and times.dtype == np.int64:
+        return times
+    index = pd.DatetimeIndex(times)
+    if index.tz is not None:
+        index = index.tz_convert(None)
+
+    return index.as_unit("ns").asi8 if hasattr(index, "as_unit") else index.asi8
+
+def _concat(generator):
+    """
+    Concatenate the DataFrames of a generator, an empty DataFrame if there are none.
+    """
+
+    # ...
+    sample_list = list(generator)
+    if not sample_list:
+        return pd.DataFrame(columns=["#RIC", SAMPLE_COLUMN])
+
+    return pd.concat(sample_list, axis=0, ignore_index=True)
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("sample_book")
+    parser.add_argument("--path", type=str, help="TRTH normalized book data, as .csv(.gz/.zst) or dataset directory", default=None)
+    parser.add_argument("--path_out", type=str, help="sampled book data, as .csv(.gz/.zst)", default=None)
+    parser.add_argument("--format", type=str, help="input format, csv, parquet or feather", default="csv")
+    parser.add_argument("--interval", type=str, help="grid interval, e.g. 100ms, 1s, 5min", default="1s")
+    parser.add_argument("--ric", type=str, help="comma-separated instruments, default is all", default=None)
+    parser.add_argument("--start", type=str, help="first grid point at or after start (UTC)", default=None)
+    parser.add_argument("--end", type=str, help="last grid point before end (UTC)", default=None)
+
+    # parse args
+    args = parser.parse_args()
+    rics = args.ric.split(",") if args.ric is not None else None
+
+    # load book data
+    if args.format == "csv":
+        with open_compressed(args.path, "rb") as file:
+            full = pd.read_csv(file, parse_dates=["Date-Time", "Date-Time-Exch"])
+    else:
+        from library.data.parser.parse_tickhistory_legacy_to_normalized import load_reconstructed_df
+        full = load_reconstructed_df(args.path, format=args.format, ric=rics)
+
+    # sample on grid, write batch by batch
+    sampler = BookSampler(full)
+    with open_compressed(args.path_out, "wb") as file:
+        for i, sample in enumerate(sampler.iter_grid(args.interval, ric=rics, start=args.start, end=args.end)):
+            file.write(sample.to_csv(index=False, header=i == 0).encode())
@@ -0,0 +1,134 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# library imports
+from library.data.sampling.sample_book import NANOSECONDS_PER_DAY, SAMPLE_COLUMN, BookSampler, _to_nanoseconds
+
+# settings
+NUM_POINTS = 500
+
+# FIXTURES . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.fixture(scope="module")
+def sampler(reference):
+    """
+    Sampler of the reference book, all columns.
+    """
+
+    return BookSampler(reference)
+
+# HELPERS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def _get_points(reference:pd.DataFrame, ric:str, seed=0):
+    """
+    Random points in time around the updates of a '#RIC', including timestamps of updates (ties) and points
+    before the first update.
+    """
+
+    # ...
+    rng = np.random.default_rng(seed)
+    times = _to_nanoseconds(reference.loc[reference["#RIC"] == ric, "Date-Time-Exch"])
+    points = rng.integers(times.min() - 10**9, times.max() + 10**9, NUM_POINTS)
+
+    return np.r_[points, rng.choice(times, NUM_POINTS), times.min() - 1]
+
+def _locate_naive(reference:pd.DataFrame, ric:str, points:np.ndarray, strict=False):
+    """
+    Locate by searchsorted on the rows of a '#RIC' sorted by time (stable), independent of `BookSampler`.
+    """
+
+    # ...
+    positions = np.flatnonzero((reference["#RIC"] == ric).to_numpy())
+    times = _to_nanoseconds(reference["Date-Time-Exch"].iloc[positions])
+    order = np.argsort(times, kind="stable")
+    index = np.searchsorted(times[order], points, side="left" if strict else "right") - 1
+
+    return np.where(index >= 0, positions[order][np.maximum(index, 0)], -1)
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.mark.parametrize("strict", [False, True])
+def test_locate_equals_searchsorted(sampler, reference, strict):
+    """
+    Located rows equal searchsorted per '#RIC', the last of equal timestamps, -1 before the first update.
+    """
+
+    # ...
+    for i, ric in enumerate(sampler.rics):
+        points = _get_points(reference, ric, seed=i)
+        positions = sampler.locate(ric, points, strict=strict)
+        np.testing.assert_array_equal(positions, _locate_naive(reference, ric, points, strict=strict))
+        assert positions[-1] == -1
+
+    # each located row is the last row of its '#RIC' at or before the point in time
+    times = _to_nanoseconds(reference["Date-Time-Exch"])
+    is_ric = (reference["#RIC"] == ric).to_numpy()
+    for point, position in zip(points, positions):
+        is_before = is_ric & ((times < point) if strict else (times <= point))
+        assert position == (np.flatnonzero(is_before & (times == times[is_before].max()))[-1] if is_before.any() else -1)
+
+def test_locate_tolerance(sampler, reference):
+    """
+    Book states older than the tolerance are not valid, unknown '#RIC's have no valid book state.
+    """
+
+    # ...
+    ric = sampler.rics[1]
+    points = _get_points(reference, ric)
+    times = _to_nanoseconds(reference["Date-Time-Exch"])
+    positions = sampler.locate(ric, points)
+    positions_tolerance = sampler.locate(ric, points, tolerance="1s")
+    is_fresh = (positions >= 0) & (points - times[positions] <= 10**9)
+
+    np.testing.assert_array_equal(positions_tolerance, np.where(is_fresh, positions, -1))
+    assert (sampler.locate("UNKNOWN.DE", points) == -1).all()
+
+def test_sample_asof(sampler, reference):
+    """
+    Samples of several '#RIC's, in the order of the points in time, equal the located rows, NaN if there are none.
+    """
+
+    # ...
+    rics = np.repeat(sampler.rics, 2 * NUM_POINTS + 1)
+    points = np.concatenate([_get_points(reference, ric, seed=i) for i, ric in enumerate(sampler.rics)])
+    order = np.random.default_rng(0).permutation(len(points))
+    sample = pd.concat(sampler.iter_asof(rics[order], points[order], batch_size=NUM_POINTS), axis=0, ignore_index=True)
+    positions = np.concatenate([_locate_naive(reference, ric, points[rics == ric]) for ric in sampler.rics])[order]
+
+    assert sample["#RIC"].tolist() == rics[order].tolist()
+    np.testing.assert_array_equal(sample[SAMPLE_COLUMN].to_numpy().view(np.int64), points[order])
+    is_valid = positions >= 0
+    assert sample.loc[~is_valid, "L1-BidPrice"].isna().all()
+    expected = reference.iloc[positions[is_valid]].drop(columns="#RIC").reset_index(drop=True)
+    pd.testing.assert_frame_equal(sample.loc[is_valid, expected.columns].reset_index(drop=True), expected, check_dtype=False)
+
+@pytest.mark.parametrize("per_day", [True, False])
+def test_sample_grid(sampler, reference, per_day):
+    """
+    Grid points are multiples of the interval between the first and the last update (of each day), sampled as-of.
+    """
+
+    # ...
+    ric = sampler.rics[0]
+    interval = pd.Timedelta("1min").value
+    sample = sampler.sample_grid("1min", ric=ric, per_day=per_day)
+    points = sample[SAMPLE_COLUMN].to_numpy().view(np.int64)
+    times = _to_nanoseconds(reference.loc[reference["#RIC"] == ric, "Date-Time-Exch"])
+    ranges = pd.Series(times).groupby(times // NANOSECONDS_PER_DAY if per_day else np.zeros(len(times))).agg(["min", "max"])
+
+    assert (points % interval == 0).all() and (np.diff(points) > 0).all()
+    assert len(points) == sum(int(last // interval - -(-first // interval) + 1) for first, last in ranges.to_numpy())
+    np.testing.assert_array_equal(sample["L1-BidPrice"].to_numpy(), reference["L1-BidPrice"].to_numpy()[_locate_naive(reference, ric, points)])
+
+    # within start and end (exclusive)
+    start, end = pd.Timestamp(points[10]), pd.Timestamp(points[20])
+    sample = sampler.sample_grid("1min", ric=ric, start=start, end=end, per_day=per_day)
+    np.testing.assert_array_equal(sample[SAMPLE_COLUMN].to_numpy().view(np.int64), points[10:20])
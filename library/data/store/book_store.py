@@ -0,0 +1,359 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: support zstd outputs, e.g. using the zstd seekable format
+
+# general imports
+import argparse
+import glob
+import io
+import json
+import numpy as np
+import os
+import pandas as pd
+import sys
+
+# make library importable if run as script, e.g. `python library/data/store/book_store.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.utility.compression.compression import get_compression, iter_bgzf_blocks, read_bgzf_range, recompress
+
+# settings
+INDEX_VERSION = 1 # increase whenever the layout of the index changes
+INDEX_EXTENSION = ".index.json"
+INDEX_BLOCK_SIZE = 2**20 # decompressed bytes per index entry (at most, plus one row), i.e. granularity of range queries
+TIME_COLUMNS = ("Date-Time", "Date-Time-Exch")
+INDEX_COLUMNS = ["RIC", "Start", "Size", "Rows", "Offset", "Skip"] \
+    + ["{}-{}".format(bound, col) for col in TIME_COLUMNS for bound in ("First", "Last")]
+
+def build_index(path:str, threads=None, recompress_gzip=False):
+    """
+    Build a sparse block index for TRTH normalized book data saved as
+    .csv.gz (BGZF, see `save_df`), next to the file (`<path>.index.json`).
+    Files that are regular gzip (e.g. written by earlier versions) are
+    rejected, unless recompress_gzip, then they are recompressed as BGZF
+    first, in place, i.e. their bytes change. The file is decompressed once, as
+    a stream, and split into ranges of about INDEX_BLOCK_SIZE bytes at row
+    boundaries, and wherever '#RIC' changes.
+
+    Each index entry holds '#RIC', first and last timestamp, number of rows,
+    and where the range starts, i.e. the position of its BGZF block in the
+    file (offset) and its position within the decompressed block (skip), such
+    that range queries decompress only the blocks they touch.
+
+    RIC         First-Date-Time-Exch       Last-Date-Time-Exch        Rows    Offset    Skip     Size
+    --------    -----------------------    -----------------------    ----    ------    -----    -------
+    DBKGn.DE    2021-01-04 08:00:00.012    2021-01-04 08:03:12.345    3532    0         512      1048598
+    DBKGn.DE    2021-01-04 08:03:12.345    2021-01-04 08:07:01.002    3541    302194    10834    1048660
+    ...
+
+    :param path:
+        str, path to TRTH normalized book data, as .csv.gz
+    :param threads:
+        int, number of threads for decompression, default is None (number of cores)
+    :param recompress_gzip:
+        bool, whether to recompress regular gzip files as BGZF in place, default is False
+    :return index:
+        pd.DataFrame, index entries
+    """
+
+    # ...
+    compression = get_compression(path)
+    assert compression == "bgzf" or (compression == "gzip" and recompress_gzip), \
+        "(ERROR) random access requires .csv.gz (BGZF), you provided a file with compression {value}, " \
+        "recompress regular gzip files with recompress_gzip=True (--recompress)".format(
+            value=compression,
+        )
+    if compression == "gzip":
+        print("(INFO) recompress {} as BGZF".format(path))
+        recompress(path, path + ".tmp", compression="gzip", threads=threads)
+        os.replace(path + ".tmp", path)
+
+    # decompress block by block, keep the positions of all blocks in the file and in the decompressed data
+    block_offsets, block_starts = [], []
+    entry_list = []
+    header = None
+    buffer = bytearray()
+    position = 0 # position of buffer in decompressed data
+    for offset, data in iter_bgzf_blocks(path, threads=threads):
+        if not data:
+            continue
+        block_offsets.append(offset)
+        block_starts.append(position + len(buffer))
+        buffer += data
+
+        # header is the first line
+        if header is None:
+            if buffer.find(b"\n") < 0:
+                continue
+            cut = buffer.find(b"\n") + 1
+            header = buffer[:cut].decode().rstrip("\r\n").split(",")
+            del buffer[:cut]
+            position += cut
+
+        # index complete rows of about INDEX_BLOCK_SIZE bytes
+        while len(buffer) > INDEX_BLOCK_SIZE and buffer.find(b"\n", INDEX_BLOCK_SIZE) >= 0:
+            cut = buffer.find(b"\n", INDEX_BLOCK_SIZE) + 1
+            entry_list.extend(_index_range(bytes(buffer[:cut]), position, header))
+            del buffer[:cut]
+            position += cut
+
+    # remaining rows
+    if buffer.strip():
+        entry_list.extend(_index_range(bytes(buffer), position, header))
+
+    # locate each range by its BGZF block, i.e. the last block that starts before (or at) the range
+    index = pd.DataFrame(entry_list, columns=[col for col in INDEX_COLUMNS if col not in ("Offset", "Skip")])
+    block = np.searchsorted(np.array(block_starts, dtype=np.int64), index["Start"].to_numpy(dtype=np.int64), side="right") - 1
+    index["Offset"] = np.array(block_offsets, dtype=np.int64)[block]
+    index["Skip"] = index["Start"].to_numpy(dtype=np.int64) - np.array(block_starts, dtype=np.int64)[block]
+    index = index[INDEX_COLUMNS]
+
+    # save index with the size and modification time of the file it refers to
+    stat = os.stat(path)
+    content = {
+        "version": INDEX_VERSION,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "header": header,
+        "entries": {col: index[col].tolist() for col in INDEX_COLUMNS},
+    }
+    path_tmp = path + INDEX_EXTENSION + ".tmp"
+    with open(path_tmp, "w") as file:
+        json.dump(content, file)
+    os.replace(path_tmp, path + INDEX_EXTENSION)
+
+    return index
+
+def _index_range(data:bytes, position:int, header:list):
+    """
+    Index a range of complete rows, split wherever '#RIC' changes.
+
+    :param data:
+        bytes, complete rows of csv data, without header
+    :param position:
+        int, position of the range in the decompressed data
+    :param header:
+        list, column names
+    :return entry_list:
+        list, tuples of ('#RIC', start, size, rows, first and last timestamp per TIME_COLUMNS)
+    """
+
+    # start of each row
+    row_ends = np.flatnonzero(np.frombuffer(data, dtype=np.uint8) == ord("\n")) + 1
+    if not len(row_ends) or row_ends[-1] != len(data):
+        row_ends = np.append(row_ends, len(data))
+    row_starts = np.r_[0, row_ends[:-1]]
+
+    # parse '#RIC' and timestamps only
+    usecols = ["#RIC"] + [col for col in TIME_COLUMNS if col in header]
+    df = pd.read_csv(io.BytesIO(data), header=None, names=header, usecols=usecols, dtype=str, keep_default_na=False)
+    assert len(df) == len(row_starts), "(ERROR) rows must not contain line breaks"
+    rics = df["#RIC"].to_numpy()
+    times = {col: _to_nanoseconds(df[col]) if col in df.columns else np.zeros(len(df), dtype=np.int64)
+        for col in TIME_COLUMNS
+    }
+
+    # split wherever '#RIC' changes
+    entry_list = []
+    change = np.flatnonzero(rics[1:] != rics[:-1]) + 1
+    for first, last in zip(np.r_[0, change], np.r_[change, len(rics)]):
+        bounds = []
+        for col in TIME_COLUMNS:
+            bounds.extend([int(times[col][first:last].min()), int(times[col][first:last].max())])
+        start = position + int(row_starts[first])
+        size = int(row_ends[last - 1] - row_starts[first])
+        entry_list.append((str(rics[first]), start, size, int(last - first), *bounds))
+
+    return entry_list
+
+class BookStore:
+
+    def __init__(self, path:str):
+        """
+        Random access to TRTH normalized book data saved as .csv.gz (BGZF)
+        with a sparse block index (see `build_index`). Queries by '#RIC' and
+        time range decompress and parse only the index ranges they touch.
+
+        :param path:
+            str, path to TRTH normalized book data, as .csv.gz
+        """
+
+        # ...
+        path_index = path + INDEX_EXTENSION
+        assert os.path.exists(path_index), \
+            "(ERROR) no index found for {path}, build it using `build_index`".format(path=path)
+        with open(path_index) as file:
+            content = json.load(file)
+
+        # ...
+        stat = os.stat(path)
+        assert content["version"] == INDEX_VERSION and (content["size"], content["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns), \
+            "(ERROR) index of {path} is outdated, rebuild it using `build_index`".format(path=path)
+        self.path = path
+        self.header = content["header"]
+        self.index = pd.DataFrame(content["entries"], columns=INDEX_COLUMNS)
+
+    @property
+    def rics(self):
+        """
+        '#RIC's in the store, in order of appearance.
+        """
+        return list(pd.unique(self.index["RIC"]))
+
+    def select(self, ric=None, start=None, end=None, time_column="Date-Time-Exch"):
+        """
+        Select the index entries that may contain rows of the given '#RIC'(s)
+        and time range.
+
+        :param ric:
+            str or list, '#RIC'(s) to include, default is None (all)
+        :param start:
+            str or pd.Timestamp, include rows with time_column >= start (UTC), default is None
+        :param end:
+            str or pd.Timestamp, include rows with time_column < end (UTC), default is None
+        :param time_column:
+            str, one of TIME_COLUMNS, default is "Date-Time-Exch"
+        :return index:
+            pd.DataFrame, selected index entries
+        """
+
+        # ...
+        assert time_column in TIME_COLUMNS, \
+            "(ERROR) time_column must be one of {columns}, you provided value {value}".format(
+                columns=TIME_COLUMNS,
+                value=time_column,
+            )
+
+        # ...
+        is_selected = np.ones(len(self.index), dtype=bool)
+        if ric is not None:
+            is_selected &= self.index["RIC"].isin([ric] if isinstance(ric, str) else list(ric)).to_numpy()
+        if start is not None:
+            is_selected &= self.index["Last-" + time_column].to_numpy() >= _to_nanoseconds([start])[0]
+        if end is not None:
+            is_selected &= self.index["First-" + time_column].to_numpy() < _to_nanoseconds([end])[0]
+
+        return self.index[is_selected]
+
+    def read(self, ric=None, start=None, end=None, columns=None, time_column="Date-Time-Exch"):
+        """
+        Read TRTH normalized book data of the given '#RIC'(s) and time range.
+        Adjacent index entries are read at once, only the rows within the
+        time range are returned. Timestamps are returned as UTC (tz-naive),
+        'GMT Offset' as int8, as reconstructed in memory.
+
+        :param ric:
+            str or list, '#RIC'(s) to include, default is None (all)
+        :param start:
+            str or pd.Timestamp, include rows with time_column >= start (UTC), default is None
+        :param end:
+            str or pd.Timestamp, include rows with time_column < end (UTC), default is None
+        :param columns:
+            list, columns to include, default is None (all columns)
+        :param time_column:
+            str, one of TIME_COLUMNS, default is "Date-Time-Exch"
+        :return df:
+            pd.DataFrame, TRTH normalized book data
+        """
+
+        # ...
+        index = self.select(ric=ric, start=start, end=end, time_column=time_column)
+        usecols = None if columns is None else list(dict.fromkeys(["#RIC", time_column] + list(columns)))
+        if not len(index):
+            return pd.DataFrame(columns=columns if columns is not None else self.header)
+
+        # merge adjacent entries into a single range
+        starts = index["Start"].to_numpy()
+        ends = starts + index["Size"].to_numpy()
+        is_first = np.r_[True, starts[1:] != ends[:-1]]
+        group = np.cumsum(is_first) - 1
+
+        # read and parse range by range
+        df_list = []
+        with open(self.path, "rb") as file:
+            for i in range(int(group[-1]) + 1):
+                entries = index[group == i]
+                data = read_bgzf_range(file, int(entries["Offset"].iloc[0]), int(entries["Skip"].iloc[0]), int(entries["Size"].sum()))
+                df_list.append(pd.read_csv(io.BytesIO(data), header=None, names=self.header, usecols=usecols, keep_default_na=False, na_values=[""]))
+        df = pd.concat(df_list, axis=0, ignore_index=True)
+
+        # parse timestamps, 'GMT Offset' as int8 (as reconstructed in memory), select rows exactly
+        for col in TIME_COLUMNS:
+            if col in df.columns:
+                df[col] = _to_nanoseconds(df[col]).view("datetime64[ns]")
+        if "GMT Offset" in df.columns:
+            df["GMT Offset"] = df["GMT Offset"].astype(np.int8)
+        is_selected = np.ones(len(df), dtype=bool)
+        if ric is not None:
+            is_selected &= df["#RIC"].isin([ric] if isinstance(ric, str) else list(ric)).to_numpy()
+        if start is not None:
+            is_selected &= df[time_column].to_numpy().view(np.int64) >= _to_nanoseconds([start])[0]
+        if end is not None:
+            is_selected &= df[time_column].to_numpy().view(np.int64) < _to_nanoseconds([end])[0]
+        df = df[is_selected].reset_index(drop=True)
+
+        return df[columns] if columns is not None else df
+
+    def read_arrays(self, ric=None, start=None, end=None, columns=None, time_column="Date-Time-Exch"):
+        """
+        Read TRTH normalized book data of the given '#RIC'(s) and time range
+        as arrays, see `read`.
+
+        :return arrays:
+            dict, columns mapped to np.ndarray
+        """
+
+        # ...
+        df = self.read(ric=ric, start=start, end=end, columns=columns, time_column=time_column)
+
+        return {col: df[col].to_numpy() for col in df.columns}
+
+def _to_nanoseconds(values):
+    """
+    Parse timestamps (ISO 8601, as written by `save_df`) to nanoseconds since
+    epoch, timezone-aware timestamps are converted to UTC.
+
+    :param values:
+        array-like, timestamps
+    :return nanoseconds:
+        np.ndarray, int64
+    """
+
+    # fraction of seconds has varying number of digits
+    try:
+        index = pd.DatetimeIndex(pd.to_datetime(values, format="ISO8601"))
+    except (TypeError, ValueError):
+        index = pd.DatetimeIndex(pd.to_datetime(values)) # pandas < 2.0
+    if index.tz is not None:
+        index = index.tz_convert(None)
+
+    return index.asi8
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("build_index")
+    parser.add_argument("--path", type=str, help="specify filepath, directory or glob pattern of *_reconstructed.csv.gz", default="...")
+    parser.add_argument("--overwrite", action="store_true", help="rebuild existing indexes")
+    parser.add_argument("--threads", type=int, help="number of threads, default is number of cores", default=None)
+    parser.add_argument("--recompress", action="store_true", help="recompress regular gzip files as BGZF in place (their bytes change)")
+
+    # parse args
+    args = parser.parse_args()
+
+    # ...
+    path = os.path.join(args.path, "*_reconstructed.csv.gz") if os.path.isdir(args.path) else args.path
+    for path in sorted(glob.glob(path)):
+        if not args.overwrite and os.path.exists(path + INDEX_EXTENSION):
+            print("skip {}".format(path))
+            continue
+        index = build_index(path, threads=args.threads, recompress_gzip=args.recompress)
+        print("indexed {} ({} entries, {} rows)".format(path, len(index), index["Rows"].sum()))
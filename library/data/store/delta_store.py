@@ -0,0 +1,445 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: append to an existing delta store, e.g. day by day
+
+# general imports
+import argparse
+import json
+import numpy as np
+import os
+import pandas as pd
+import shutil
+import socket
+import sys
+
+# make library importable if run as script, e.g. `python library/data/store/delta_store.py --help`
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..")))
+
+# library imports
+from library.utility.compression.compression import BGZF_BLOCK_SIZE, get_bgzf_offsets, open_compressed, read_bgzf_range
+
+# settings
+DELTA_VERSION = 3 # increase whenever the layout of the delta store changes
+KEYFRAME_INTERVAL = 1000 # maximum number of updates between keyframes, i.e. of updates replayed per query
+BATCH_SIZE = 1_000_000 # number of snapshots per DataFrame yielded
+BASE_COLUMNS = ("#RIC", "Type", "Date-Time", "Date-Time-Exch", "GMT Offset") # stored once per update, as header
+ENCODED_ARRAYS = BASE_COLUMNS + ("Offset",) # delta-encoded and compressed, read as a whole
+DELTA_ARRAYS = ("Keyframe",) # memory-mapped
+COMPRESSED_ARRAYS = {"Column": np.uint8, "Value": np.float64} # BGZF, i.e. compressed, read by range
+
+def write_delta(full:pd.DataFrame, path:str, keyframe_interval=KEYFRAME_INTERVAL):
+    """
+    Save TRTH normalized book data as delta store, i.e. a directory with one
+    header row per update ('#RIC', 'Type', timestamps, 'GMT Offset') and
+    one delta per changed book column (column code and new value), instead
+    of all book columns per update. Full snapshots are kept as keyframes at
+    the first update of each '#RIC' and day, and at least every
+    keyframe_interval updates, such that snapshots of any range are
+    materialized by replaying at most keyframe_interval updates before it
+    (see `DeltaStore`).
+
+    Deltas are stored like a sparse matrix in CSR layout, i.e. the deltas of
+    update i are Column[Offset[i]:Offset[i+1]] and Value[Offset[i]:Offset[i+1]].
+    Column and Value are compressed as BGZF (.gz) with the positions of
+    their blocks (.index.npy), such that a range of deltas is read by
+    decompressing the blocks that overlap it only. Header arrays and Offset
+    change little from one update to the next, they are delta-encoded (see
+    `_encode_array`) and compressed as a whole. Keyframe is saved as .npy.
+
+    Update    Offset    Column            Value
+    ------    ------    --------------    ---------------------------------
+    0         0         0, 1, ..., 59     10.005, 1000, ..., 7    <- keyframe
+    1         60        1                 1200
+    2         61        3, 4              10.01, 500
+    ...
+
+    :param full:
+        pd.DataFrame, TRTH normalized book data (regular layout, see `expand_book`), sorted by '#RIC'
+    :param path:
+        str, path to delta store directory, replaced if it exists
+    :param keyframe_interval:
+        int, maximum number of updates between keyframes, default is KEYFRAME_INTERVAL
+    :return meta:
+        dict, meta data
+    """
+
+    # ...
+    assert keyframe_interval >= 1, \
+        "(ERROR) keyframe_interval must be positive, you provided value {value}".format(
+            value=keyframe_interval,
+        )
+    cols_book = [col for col in full.columns if col not in BASE_COLUMNS]
+    assert len(cols_book) <= 256, "(ERROR) delta store supports up to 256 book columns"
+
+    # HEADER PER UPDATE . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    ric = pd.Categorical(full["#RIC"])
+    type_ = pd.Categorical(full["Type"])
+    datetime = pd.DatetimeIndex(full["Date-Time"]).asi8
+    arrays = {
+        "#RIC": ric.codes.astype(np.int32),
+        "Type": type_.codes.astype(np.int8),
+        "Date-Time": datetime,
+        "Date-Time-Exch": pd.DatetimeIndex(full["Date-Time-Exch"]).asi8,
+        "GMT Offset": full["GMT Offset"].to_numpy().astype(np.int8),
+    }
+
+    # KEYFRAMES AND DELTAS . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+    # keyframe at the first update of each '#RIC' and day, then every keyframe_interval updates
+    num_rows = len(full)
+    day = datetime // 86_400_000_000_000
+    is_keyframe = np.ones(num_rows, dtype=bool)
+    is_keyframe[1:] = (arrays["#RIC"][1:] != arrays["#RIC"][:-1]) | (day[1:] != day[:-1])
+    segment_start = np.maximum.accumulate(np.where(is_keyframe, np.arange(num_rows), 0))
+    is_keyframe |= (np.arange(num_rows) - segment_start) % keyframe_interval == 0
+
+    # changed columns per update (NaN equals NaN, e.g. features), all columns at keyframes, column by column to limit peak memory
+    book = np.empty((num_rows, len(cols_book)), dtype=np.float64)
+    is_changed = np.empty((num_rows, len(cols_book)), dtype=bool)
+    for j, col in enumerate(cols_book):
+        book[:, j] = full[col].to_numpy(dtype=np.float64)
+        is_nan = np.isnan(book[:, j])
+        is_changed[1:, j] = (book[1:, j] != book[:-1, j]) & ~(is_nan[1:] & is_nan[:-1])
+    is_changed[is_keyframe, :] = True
+
+    # row-major order, i.e. deltas sorted by update, then column
+    row, column = np.nonzero(is_changed)
+    arrays["Keyframe"] = np.flatnonzero(is_keyframe)
+    arrays["Offset"] = np.r_[0, np.cumsum(is_changed.sum(axis=1))].astype(np.int64)
+    arrays["Column"] = column.astype(np.uint8)
+    arrays["Value"] = book[row, column]
+    meta = {
+        "version": DELTA_VERSION,
+        "nrows": num_rows,
+        "ndeltas": len(row),
+        "keyframe_interval": keyframe_interval,
+        "rics": [str(value) for value in ric.categories],
+        "types": [str(value) for value in type_.categories],
+        "columns": cols_book,
+        "dtypes": [full[col].dtype.str for col in cols_book],
+        "encoding": {}, # dtype and scale per encoded array
+    }
+
+    # write to temporary directory, then replace
+    path_tmp = "{}.{}.{}.tmp".format(path.rstrip(os.sep), socket.gethostname(), os.getpid())
+    os.makedirs(path_tmp, exist_ok=True)
+    try:
+        for col, array in arrays.items():
+            if col in COMPRESSED_ARRAYS:
+                path_col = os.path.join(path_tmp, col + ".gz")
+                with open_compressed(path_col, "wb", compression="gzip") as file:
+                    file.write(array.tobytes())
+                np.save(os.path.join(path_tmp, col + ".index.npy"), np.array(get_bgzf_offsets(path_col), dtype=np.int64))
+            elif col in ENCODED_ARRAYS:
+                data, meta["encoding"][col] = _encode_array(array)
+                with open_compressed(os.path.join(path_tmp, col + ".gz"), "wb", compression="gzip") as file:
+                    file.write(data)
+            else:
+                np.save(os.path.join(path_tmp, col + ".npy"), array)
+        with open(os.path.join(path_tmp, "meta.json"), "w") as file:
+            json.dump(meta, file)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.replace(path_tmp, path)
+    finally:
+        if os.path.isdir(path_tmp):
+            shutil.rmtree(path_tmp)
+
+    return meta
+
+class DeltaStore:
+
+    def __init__(self, path:str):
+        """
+        Read TRTH normalized book data from a delta store (see `write_delta`).
+        Header arrays and Offset are decoded into memory (30 bytes per
+        update), deltas are decompressed by range, snapshots are materialized
+        lazily, i.e. only for the updates requested, by replaying the deltas
+        from the nearest keyframe before them.
+
+        :param path:
+            str, path to delta store directory
+        """
+
+        # ...
+        with open(os.path.join(path, "meta.json")) as file:
+            self.meta = json.load(file)
+        assert self.meta["version"] == DELTA_VERSION, \
+            "(ERROR) delta store {path} has version {value}, rewrite it using `write_delta`".format(
+                path=path,
+                value=self.meta["version"],
+            )
+        self.path = path
+        self.columns = self.meta["columns"]
+        self.arrays = {col: np.load(os.path.join(path, col + ".npy"), mmap_mode="r") for col in DELTA_ARRAYS}
+        for col in ENCODED_ARRAYS:
+            with open_compressed(os.path.join(path, col + ".gz"), "rb") as file:
+                self.arrays[col] = _decode_array(file.read(), *self.meta["encoding"][col])
+        self.index = {col: np.load(os.path.join(path, col + ".index.npy")) for col in COMPRESSED_ARRAYS}
+
+    def __len__(self):
+        return self.meta["nrows"]
+
+    def locate(self, ric=None, start=None, end=None, time_column="Date-Time-Exch"):
+        """
+        Locate the updates of the given '#RIC'(s) and time range, using the
+        header arrays only.
+
+        :param ric:
+            str or list, '#RIC'(s) to include, default is None (all)
+        :param start:
+            str or pd.Timestamp, include updates with time_column >= start (UTC), default is None
+        :param end:
+            str or pd.Timestamp, include updates with time_column < end (UTC), default is None
+        :param time_column:
+            str, either "Date-Time" or "Date-Time-Exch", default is "Date-Time-Exch"
+        :return positions:
+            np.ndarray, positions of updates, ascending
+        """
+
+        # ...
+        is_selected = np.ones(len(self), dtype=bool)
+        if ric is not None:
+            rics = [ric] if isinstance(ric, str) else list(ric)
+            codes = [self.meta["rics"].index(value) for value in rics if value in self.meta["rics"]]
+            is_selected &= np.isin(self.arrays["#RIC"], codes)
+        if start is not None:
+            is_selected &= self.arrays[time_column] >= _to_nanoseconds(start)
+        if end is not None:
+            is_selected &= self.arrays[time_column] < _to_nanoseconds(end)
+
+        return np.flatnonzero(is_selected)
+
+    def materialize(self, first:int, last:int, columns=None):
+        """
+        Materialize the snapshots of updates first to last (exclusive), i.e.
+        replay the deltas from the nearest keyframe at or before first.
+
+        :param first:
+            int, position of first update
+        :param last:
+            int, position of last update (exclusive)
+        :param columns:
+            list, book columns to materialize, default is None (all)
+        :return book:
+            np.ndarray, float64, one row per update and column
+        """
+
+        # ...
+        codes = np.arange(len(self.columns)) if columns is None else np.array([self.columns.index(col) for col in columns], dtype=int)
+        if last <= first:
+            return np.empty((0, len(codes)))
+
+        # nearest keyframe at or before first
+        keyframe = self.arrays["Keyframe"]
+        origin = int(keyframe[np.searchsorted(keyframe, first, side="right") - 1])
+
+        # scatter deltas of the replayed updates, keep requested columns only
+        offset = np.asarray(self.arrays["Offset"][origin:last + 1])
+        row = np.repeat(np.arange(last - origin), np.diff(offset))
+        column = self._read_deltas("Column", int(offset[0]), int(offset[-1]))
+        value = self._read_deltas("Value", int(offset[0]), int(offset[-1]))
+        lookup = np.full(len(self.columns), -1)
+        lookup[codes] = np.arange(len(codes))
+        is_requested = lookup[column] >= 0
+        replay = np.full((last - origin, len(codes)), np.nan)
+        is_set = np.zeros((last - origin, len(codes)), dtype=bool)
+        replay[row[is_requested], lookup[column[is_requested]]] = value[is_requested]
+        is_set[row[is_requested], lookup[column[is_requested]]] = True
+
+        # forward-fill unchanged values with previous value, column by column, the keyframe is complete
+        row_number = np.arange(len(replay))
+        for j in range(len(codes)):
+            index = np.where(is_set[:, j], row_number, 0)
+            np.maximum.accumulate(index, out=index)
+            replay[:, j] = replay[index, j]
+
+        return replay[first - origin:]
+
+    def read(self, ric=None, start=None, end=None, columns=None, time_column="Date-Time-Exch"):
+        """
+        Read TRTH normalized book data of the given '#RIC'(s) and time range,
+        i.e. materialize the snapshots of the selected updates only.
+
+        :param ric:
+            str or list, '#RIC'(s) to include, default is None (all)
+        :param start:
+            str or pd.Timestamp, include updates with time_column >= start (UTC), default is None
+        :param end:
+            str or pd.Timestamp, include updates with time_column < end (UTC), default is None
+        :param columns:
+            list, book columns to include, default is None (all)
+        :param time_column:
+            str, either "Date-Time" or "Date-Time-Exch", default is "Date-Time-Exch"
+        :return df:
+            pd.DataFrame, TRTH normalized book data
+        """
+
+        # ...
+        positions = self.locate(ric=ric, start=start, end=end, time_column=time_column)
+
+        # materialize the range of selected updates, per '#RIC' if several are selected
+        if not len(positions):
+            return self._to_frame(positions, np.empty((0, len(columns or self.columns))), columns=columns)
+        change = np.flatnonzero(np.diff(self.arrays["#RIC"][positions])) + 1
+        book_list = []
+        for first, last in zip(np.r_[0, change], np.r_[change, len(positions)]):
+            selected = positions[first:last]
+            book = self.materialize(int(selected[0]), int(selected[-1]) + 1, columns=columns)
+            book_list.append(book[selected - selected[0]])
+
+        return self._to_frame(positions, np.concatenate(book_list, axis=0), columns=columns)
+
+    def iter_read(self, batch_size=BATCH_SIZE, columns=None):
+        """
+        Read all TRTH normalized book data, batch by batch, e.g. to replay
+        the book without materializing all snapshots at once.
+
+        :param batch_size:
+            int, number of updates per DataFrame, default is BATCH_SIZE
+        :param columns:
+            list, book columns to include, default is None (all)
+        :return generator:
+            pd.DataFrame, TRTH normalized book data
+        """
+
+        # ...
+        for first in range(0, len(self), batch_size):
+            last = min(first + batch_size, len(self))
+            book = self.materialize(first, last, columns=columns)
+            yield self._to_frame(np.arange(first, last), book, columns=columns)
+
+    def deltas(self, first=0, last=None):
+        """
+        Get the deltas of updates first to last (exclusive), one row per
+        changed column, as stored (keyframes include all columns).
+
+        :param first:
+            int, position of first update, default is 0
+        :param last:
+            int, position of last update (exclusive), default is None (last update)
+        :return deltas:
+            pd.DataFrame, 'Update' (position), 'Column' and 'Value'
+        """
+
+        # ...
+        last = len(self) if last is None else last
+        offset = self.arrays["Offset"]
+        start, end = int(offset[first]), int(offset[last])
+
+        return pd.DataFrame({
+            "Update": np.repeat(np.arange(first, last), np.diff(offset[first:last + 1])),
+            "Column": np.array(self.columns, dtype=object)[self._read_deltas("Column", start, end)],
+            "Value": self._read_deltas("Value", start, end),
+        })
+
+    def _read_deltas(self, col:str, start:int, end:int):
+        """
+        Read deltas start to end (exclusive) of a compressed array, i.e.
+        decompress only the BGZF blocks that overlap them.
+        """
+
+        # ...
+        dtype = np.dtype(COMPRESSED_ARRAYS[col])
+        if end <= start:
+            return np.empty(0, dtype=dtype)
+        block, skip = divmod(start * dtype.itemsize, BGZF_BLOCK_SIZE)
+        with open(os.path.join(self.path, col + ".gz"), "rb") as file:
+            data = read_bgzf_range(file, int(self.index[col][block]), skip, (end - start) * dtype.itemsize)
+
+        return np.frombuffer(data, dtype=dtype)
+
+    def _to_frame(self, positions:np.ndarray, book:np.ndarray, columns=None):
+        """
+        Combine the header of the given updates with their snapshots, cast
+        book columns to their original dtypes.
+        """
+
+        # ...
+        df = pd.DataFrame({
+            "#RIC": np.array(self.meta["rics"], dtype=object)[self.arrays["#RIC"][positions]],
+            "Type": np.array(self.meta["types"], dtype=object)[self.arrays["Type"][positions]],
+            "Date-Time": self.arrays["Date-Time"][positions].view("datetime64[ns]"),
+            "Date-Time-Exch": self.arrays["Date-Time-Exch"][positions].view("datetime64[ns]"),
+            "GMT Offset": self.arrays["GMT Offset"][positions],
+        })
+        dtypes = dict(zip(self.columns, self.meta["dtypes"]))
+        for j, col in enumerate(columns or self.columns):
+            df[col] = book[:, j].astype(dtypes[col])
+
+        return df
+
+def _encode_array(array:np.ndarray):
+    """
+    Delta-encode an integer array, i.e. store the differences between
+    consecutive values divided by their greatest common divisor (e.g. 10**6
+    for timestamps in milliseconds), with the bytes of all values shuffled,
+    i.e. first bytes first, last bytes last, such that the mostly zero high
+    bytes of small differences compress well. Overflow wraps around, i.e.
+    differences to NaT are decoded exactly.
+
+    :param array:
+        np.ndarray, integer values
+    :return data:
+        bytes, encoded values (and list, dtype and scale, see `_decode_array`)
+    """
+
+    # ...
+    diff = np.diff(array, prepend=array.dtype.type(0))
+    scale = int(np.gcd.reduce(diff)) if len(diff) else 1
+    if scale < 1 or not np.array_equal(diff // scale * scale, diff): # e.g. NaT
+        scale = 1
+    diff //= scale
+    data = diff.view(np.uint8).reshape(len(diff), diff.itemsize).T.tobytes()
+
+    return data, [array.dtype.str, scale]
+
+def _decode_array(data:bytes, dtype:str, scale:int):
+    """
+    Decode an integer array encoded by `_encode_array`.
+    """
+
+    # ...
+    dtype = np.dtype(dtype)
+    diff = np.frombuffer(data, dtype=np.uint8).reshape(dtype.itemsize, -1).T.copy().view(dtype).ravel()
+
+    return np.cumsum(diff, dtype=dtype) * dtype.type(scale)
+
+def _to_nanoseconds(value):
+    """
+    Convert a point in time to nanoseconds since epoch, timezone-aware points
+    in time are converted to UTC, timezone-unaware are taken as UTC.
+    """
+
+    # ...
+    value = pd.Timestamp(value)
+    if value.tz is not None:
+        value = value.tz_convert(None)
+
+    return value.value
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("write_delta")
+    parser.add_argument("--path", type=str, help="TRTH normalized book data, as .csv(.gz/.zst)", default=None)
+    parser.add_argument("--path_out", type=str, help="delta store directory, default is <stem>.delta", default=None)
+    parser.add_argument("--keyframe_interval", type=int, help="maximum number of updates between keyframes", default=KEYFRAME_INTERVAL)
+
+    # parse args
+    args = parser.parse_args()
+    path_out = args.path_out or args.path.split(".csv")[0] + ".delta"
+
+    # ...
+    with open_compressed(args.path, "rb") as file:
+        full = pd.read_csv(file, parse_dates=["Date-Time", "Date-Time-Exch"])
+    meta = write_delta(full, path_out, keyframe_interval=args.keyframe_interval)
+    print("wrote {} ({} updates, {} deltas)".format(path_out, meta["nrows"], meta["ndeltas"]))
@@ -0,0 +1,132 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import gzip
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+# library imports
+from library.data.parser.parse_tickhistory_legacy_to_normalized import save_df
+from library.data.store import book_store
+from library.data.store.book_store import BookStore, build_index
+from library.utility.compression.compression import open_compressed
+
+# settings
+INDEX_BLOCK_SIZE = 2**16 # small, such that each '#RIC' spans several index entries
+
+# FIXTURES . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.fixture(scope="module")
+def store(reference, tmp_path_factory):
+    """
+    Book store of the reference book, saved as .csv.gz (BGZF) and indexed.
+    """
+
+    # ...
+    path = os.path.join(tmp_path_factory.mktemp("book"), "book_reconstructed.csv.gz")
+    save_df(reference, path)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(book_store, "INDEX_BLOCK_SIZE", INDEX_BLOCK_SIZE)
+        build_index(path)
+
+    return BookStore(path)
+
+@pytest.fixture(scope="module")
+def expected(reference):
+    """
+    Reference book with timestamps as UTC (tz-naive), as returned by `BookStore.read`.
+    """
+
+    # ...
+    df = reference.reset_index(drop=True)
+    for col in ["Date-Time", "Date-Time-Exch"]:
+        if getattr(df[col].dtype, "tz", None) is not None:
+            df[col] = df[col].dt.tz_convert(None)
+
+    return df
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_build_index(store, reference):
+    """
+    Index entries cover the decompressed data without gaps, split wherever '#RIC' changes.
+    """
+
+    # ...
+    index = store.index
+    assert len(index) > len(store.rics) == reference["#RIC"].nunique()
+    assert index["Rows"].sum() == len(reference)
+    np.testing.assert_array_equal(index["Start"].iloc[1:], (index["Start"] + index["Size"]).iloc[:-1])
+    assert (index.groupby("RIC", sort=False)["Rows"].sum() == reference.groupby("#RIC", sort=False, observed=True).size()).all()
+
+def test_index_outdated(store, tmp_path):
+    """
+    An index whose file has changed is rejected, a regular gzip file is rejected unless recompressed.
+    """
+
+    # ...
+    path = os.path.join(tmp_path, "book_reconstructed.csv.gz")
+    with open_compressed(store.path, "rb") as file, open(path, "wb") as file_out:
+        file_out.write(gzip.compress(file.read()))
+    with pytest.raises(AssertionError, match="random access requires"):
+        build_index(path)
+    build_index(path, recompress_gzip=True)
+    BookStore(path)
+
+    os.utime(path, ns=(0, 0))
+    with pytest.raises(AssertionError, match="is outdated"):
+        BookStore(path)
+
+@pytest.mark.parametrize("ric", [None, 0, -1])
+def test_read(store, expected, ric):
+    """
+    Reading a '#RIC' and time range (end exclusive) equals selecting it from the book written.
+    """
+
+    # ...
+    ric = None if ric is None else store.rics[ric]
+    start, end = expected["Date-Time-Exch"].quantile([0.25, 0.75])
+    df = store.read(ric=ric, start=start, end=end)
+    is_selected = (expected["Date-Time-Exch"] >= start) & (expected["Date-Time-Exch"] < end)
+    if ric is not None:
+        is_selected &= expected["#RIC"] == ric
+
+    assert len(df) and df["GMT Offset"].dtype == np.int8
+    pd.testing.assert_frame_equal(df, expected[is_selected].reset_index(drop=True), check_dtype=False, check_categorical=False)
+
+def test_read_end_exclusive(store, expected):
+    """
+    Rows at end are excluded, rows at start are included, an empty range returns no rows.
+    """
+
+    # ...
+    ric = store.rics[0]
+    times = expected.loc[expected["#RIC"] == ric, "Date-Time-Exch"]
+    start, end = times.iloc[10], times.iloc[20]
+    df = store.read(ric=ric, start=start, end=end, columns=["Date-Time-Exch"])
+
+    assert df["Date-Time-Exch"].min() == start and df["Date-Time-Exch"].max() < end
+    assert len(df) == ((times >= start) & (times < end)).sum()
+    assert not len(store.read(ric=ric, start=end, end=end, columns=["Date-Time-Exch"]))
+
+def test_read_arrays(store, expected):
+    """
+    Arrays equal the columns read as DataFrame.
+    """
+
+    # ...
+    ric = store.rics[1]
+    columns = ["Date-Time-Exch", "GMT Offset", "L1-BidPrice"]
+    arrays = store.read_arrays(ric=ric, columns=columns)
+    df = store.read(ric=ric, columns=columns)
+
+    assert list(arrays) == columns
+    for col in columns:
+        np.testing.assert_array_equal(arrays[col], df[col].to_numpy())
+    assert len(arrays["L1-BidPrice"]) == (expected["#RIC"] == ric).sum()
@@ -0,0 +1,90 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import numpy as np
+import os
+import pandas as pd
+import pytest
+
+# library imports
+from library.data.parser.parse_tickhistory_legacy_to_normalized import NAT
+from library.data.store.delta_store import DeltaStore, _decode_array, _encode_array, write_delta
+
+# settings
+KEYFRAME_INTERVAL = 100 # small, such that ranges start between keyframes
+
+# FIXTURES . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.fixture(scope="module")
+def store(reference, tmp_path_factory):
+    """
+    Delta store of the reference book.
+    """
+
+    # ...
+    path = os.path.join(tmp_path_factory.mktemp("delta"), "book.delta")
+    write_delta(reference, path, keyframe_interval=KEYFRAME_INTERVAL)
+
+    return DeltaStore(path)
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.mark.parametrize("array", [
+    np.array([NAT, 5_000_000, NAT, 7_000_000], dtype=np.int64), # NaT, differences overflow
+    np.arange(0, 10**10, 10**6, dtype=np.int64), # scaled by 10**6
+    np.array([3, 1, -2], dtype=np.int8),
+    np.zeros(2, dtype=np.int32),
+    np.array([], dtype=np.int64),
+])
+def test_encode_array(array):
+    """
+    Delta-encoded arrays decode to the original values and dtype.
+    """
+
+    # ...
+    data, (dtype, scale) = _encode_array(array)
+    decoded = _decode_array(data, dtype, scale)
+
+    assert decoded.dtype == array.dtype
+    np.testing.assert_array_equal(decoded, array)
+
+def test_round_trip(store, reference):
+    """
+    Reading the whole store, batch by batch, equals the book written.
+    """
+
+    # ...
+    df = pd.concat(store.iter_read(batch_size=1_000), axis=0, ignore_index=True)
+
+    pd.testing.assert_frame_equal(df, reference.reset_index(drop=True), check_dtype=False)
+
+def test_materialize_random_ranges(store, reference):
+    """
+    Snapshots of random ranges, i.e. starting between keyframes and crossing BGZF blocks, equal the book written.
+    """
+
+    # ...
+    book = reference[store.columns].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(0)
+    for first in rng.integers(0, len(store), 50):
+        last = min(int(first) + int(rng.integers(1, 3 * KEYFRAME_INTERVAL)), len(store))
+        np.testing.assert_array_equal(store.materialize(int(first), last), book[first:last])
+
+def test_read(store, reference):
+    """
+    Reading a '#RIC' and time range (end exclusive) equals selecting it from the book written.
+    """
+
+    # ...
+    ric = reference["#RIC"].iloc[-1]
+    start, end = reference["Date-Time-Exch"].quantile([0.25, 0.75])
+    df = store.read(ric=ric, start=start, end=end, columns=["L1-BidPrice", "L1-AskPrice"])
+    is_selected = (reference["#RIC"] == ric) & (reference["Date-Time-Exch"] >= start) & (reference["Date-Time-Exch"] < end)
+    expected = reference.loc[is_selected, ["#RIC", "Type", "Date-Time", "Date-Time-Exch", "GMT Offset", "L1-BidPrice", "L1-AskPrice"]]
+
+    assert len(df)
+    pd.testing.assert_frame_equal(df, expected.reset_index(drop=True), check_dtype=False)
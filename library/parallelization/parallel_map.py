@@ -0,0 +1,511 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import argparse
+import collections
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+import numpy as np
+import os
+import pandas as pd
+import signal
+import time
+import uuid
+
+# settings
+CHUNKS_PER_WORKER = 4 # number of chunks per worker process if neither chunk_size nor bounds are given
+IN_FLIGHT_PER_WORKER = 2 # number of chunks submitted but not yet yielded per worker process, see max_in_flight
+
+def parallel_map(function, data, chunk_size=None, bounds=None, chunk_args=None, workers=1, ordered=True,
+    max_in_flight=None, submit_order=None, share_results=True, **kwargs,
+):
+    """
+    Apply a function to chunks of rows of an array, a DataFrame or a dict of
+    arrays (columns of equal length) using a pool of worker processes. The
+    input is copied into shared memory once, each worker attaches to it and
+    copies only the rows of its chunk. Results (arrays, DataFrames, or tuples,
+    lists and dicts of them) are returned through shared memory as well, i.e.
+    neither inputs nor results are pickled, except for object columns other
+    than strings.
+
+    Results are yielded as soon as they are available, either in order of the
+    chunks (ordered) or in order of completion. At most max_in_flight chunks
+    are submitted but not yet yielded, so that results waiting for an earlier
+    chunk do not pile up in memory. If the loop is interrupted, e.g. by a
+    KeyboardInterrupt in a Jupyter kernel, or left early, pending chunks are
+    cancelled, worker processes are terminated and shared memory is released.
+
+    Worker processes are not free: the pool is started per call, the input is
+    copied into shared memory and each result is copied back. Hence, the
+    default is a single worker, i.e. a plain loop in this process. Use more
+    workers only if the function takes long per chunk compared to these
+    copies, and measure on the target machine, e.g. by running this module
+    as script.
+
+    Example, with `function` defined at module level (workers import it by name):
+        for i, result in parallel_map(function, df, chunk_size=1_000_000, workers=8):
+            ...
+
+    :param function:
+        callable, called as function(chunk, *chunk_args[i], **kwargs), chunk is of the same type as data
+    :param data:
+        np.ndarray, pd.DataFrame or dict of np.ndarray, chunks are slices of rows
+    :param chunk_size:
+        int, number of rows per chunk, default is None (see bounds, else CHUNKS_PER_WORKER chunks per worker)
+    :param bounds:
+        list, (start, end) rows per chunk, e.g. partitions of various size, default is None (see chunk_size)
+    :param chunk_args:
+        list, tuple of further positional arguments per chunk, default is None
+    :param workers:
+        int, number of worker processes, default is 1 (runs in this process without shared memory)
+    :param ordered:
+        bool, whether to yield results in order of the chunks, else in order of completion, default is True
+    :param max_in_flight:
+        int, number of chunks submitted but not yet yielded, default is None (IN_FLIGHT_PER_WORKER per worker)
+    :param submit_order:
+        list, positions of chunks in order of submission, e.g. largest first, default is None (in order)
+    :param share_results:
+        bool, whether to return results through shared memory, else pickled, default is True
+    :param kwargs:
+        dict, passed on to function
+    :return generator:
+        tuples of (position, result), position of the chunk in bounds
+    """
+
+    # ...
+    workers = workers or 1
+    length = _get_length(data)
+    if bounds is None:
+        chunk_size = int(chunk_size or max(-(-length // (CHUNKS_PER_WORKER * workers)), 1))
+        bounds = [(start, min(start + chunk_size, length)) for start in range(0, length, chunk_size)]
+    chunk_args = chunk_args or [()] * len(bounds)
+    submit_order = list(submit_order) if submit_order is not None else list(range(len(bounds)))
+    max_in_flight = max(int(max_in_flight or IN_FLIGHT_PER_WORKER * workers), 1)
+    assert len(chunk_args) == len(bounds) and sorted(submit_order) == list(range(len(bounds))), \
+        "(ERROR) chunk_args and submit_order must have one entry per chunk, you provided {} bounds".format(len(bounds))
+
+    # process chunk by chunk in this process, e.g. to debug function
+    if workers <= 1:
+        for i in (range(len(bounds)) if ordered else submit_order):
+            start, end = bounds[i]
+            yield i, function(_take(data, start, end), *chunk_args[i], **kwargs)
+        return
+
+    # share input, make sure to release shared memory and worker processes in any case
+    shm_list, descriptor = share(data)
+    del data
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+    running, done_dict = {}, {}
+    is_submitted = np.zeros(len(bounds), dtype=bool)
+    is_received = np.zeros(len(bounds), dtype=bool)
+    token = uuid.uuid4().hex[:8] # result blocks are named by token and chunk, see `_release_named`
+    interrupted = False
+    try:
+        queue = collections.deque(submit_order)
+        position = 0 # next chunk to yield (ordered)
+
+        # ...
+        def submit(i):
+            start, end = bounds[i]
+            name = "psm_{}_{}".format(token, i) if share_results else None
+            task = (function, _slice_pickled(descriptor, start, end), start, end, chunk_args[i], kwargs, name)
+            running[executor.submit(_run_chunk, task)] = i
+            is_submitted[i] = True
+
+        while running or done_dict or queue:
+
+            # submit up to max_in_flight chunks, but always the next chunk to yield (ordered)
+            while queue and len(running) + len(done_dict) < max_in_flight:
+                i = queue.popleft()
+                if not is_submitted[i]:
+                    submit(i)
+            if ordered and position < len(bounds) and not is_submitted[position]:
+                submit(position)
+
+            # yield results in order, else as soon as they are done
+            if ordered and position in done_dict:
+                result = done_dict.pop(position)
+                is_received[position] = True
+                yield position, _receive(result, share_results)
+                position += 1
+                continue
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                done_dict[running.pop(future)] = future.result()
+            if not ordered:
+                while done_dict:
+                    i, result = done_dict.popitem()
+                    is_received[i] = True
+                    yield i, _receive(result, share_results)
+
+    # interrupted, failed or closed early, stop workers without waiting for running chunks
+    except BaseException:
+        interrupted = True
+        raise
+    finally:
+        if interrupted:
+            # the processes of the pool are not exposed publicly, skip if the attribute is gone in a later Python
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.terminate()
+        executor.shutdown(wait=True, cancel_futures=True)
+
+        # release results that have not been yielded, by name, as a worker may have been terminated after sharing its
+        # result but before the result was received, and the input
+        if share_results:
+            for i in np.flatnonzero(is_submitted & ~is_received):
+                _release_named("psm_{}_{}".format(token, i))
+        release(shm_list)
+
+def parallel_apply(function, data, **kwargs):
+    """
+    Apply a function to chunks of rows in parallel and concatenate the results
+    in order (see `parallel_map`), e.g. for functions that map rows to rows.
+
+    :param function:
+        callable, called as function(chunk, **kwargs), returns np.ndarray or pd.DataFrame
+    :param data:
+        np.ndarray, pd.DataFrame or dict of np.ndarray
+    :param kwargs:
+        dict, passed on to `parallel_map`, e.g. chunk_size, workers, and to function
+    :return result:
+        np.ndarray or pd.DataFrame, results of all chunks concatenated
+    """
+
+    # ...
+    result_list = [result for _, result in parallel_map(function, data, ordered=True, **kwargs)]
+    if result_list and all(isinstance(result, np.ndarray) for result in result_list):
+        return np.concatenate(result_list)
+
+    return pd.concat(result_list)
+
+def share(data, name=None):
+    """
+    Copy an array, DataFrame (or Series) or a dict, tuple or list of them
+    into blocks of shared memory, one block per array or column. Categorical
+    and string columns are shared as codes (categories, i.e. unique strings,
+    are kept in the descriptor), timezone-aware columns as integers. Other
+    object columns and other values are kept in the descriptor, i.e. pickled.
+
+    :param data:
+        np.ndarray, pd.DataFrame, pd.Series, or dict, tuple, list of them
+    :param name:
+        str, blocks are named `<name>_0`, `<name>_1`, ... in order, such that they can be released by name even if the
+        descriptor is lost (see `_release_named`), default is None (random names)
+    :return shm_list, descriptor:
+        list of SharedMemory blocks (see `release`), tuple to attach to the blocks (see `attach`)
+    """
+
+    # ...
+    shm_list = []
+    try:
+        descriptor = _share(data, shm_list, name=name)
+    except BaseException:
+        release(shm_list)
+        raise
+
+    return shm_list, descriptor
+
+def attach(descriptor:tuple, start=None, end=None):
+    """
+    Attach to blocks of shared memory and copy rows start to end, such that the
+    result does not depend on the blocks any longer (see `share`).
+
+    :param descriptor:
+        tuple, as returned by `share`
+    :param start:
+        int, first row, default is None (0)
+    :param end:
+        int, last row (exclusive), default is None (all rows)
+    :return data:
+        np.ndarray, pd.DataFrame, pd.Series, or dict, tuple, list of them
+    """
+
+    # ...
+    kind, content = descriptor
+    if kind == "array":
+        name, shape, dtype = content
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            return np.ndarray(shape, dtype=dtype, buffer=shm.buf)[start:end].copy()
+        finally:
+            shm.close()
+    if kind == "categorical":
+        codes, categories, is_ordered = content
+        return pd.Categorical.from_codes(attach(codes, start, end), categories=categories, ordered=is_ordered)
+    if kind == "strings":
+        codes, uniques, na_value = content
+        return np.append(np.asarray(uniques, dtype=object), na_value)[attach(codes, start, end)] # code -1 is missing
+    if kind == "datetimetz":
+        values, tz = content
+        return pd.DatetimeIndex(attach(values, start, end).view("datetime64[ns]")).tz_localize("UTC").tz_convert(tz)
+    if kind == "range":
+        return pd.RangeIndex(*content)[start:end]
+    if kind == "rows":
+        values, offset = content
+        return values[(start or 0) - offset:None if end is None else end - offset]
+    if kind == "frame":
+        names, column_list, index = content
+        data = pd.DataFrame(dict(enumerate(attach(column, start, end) for column in column_list)), index=pd.Index(attach(index, start, end)))
+        data.columns = names
+        return data
+    if kind == "series":
+        values, index, name = content
+        return pd.Series(attach(values, start, end), index=pd.Index(attach(index, start, end)), name=name)
+    if kind == "dict":
+        return {key: attach(value, start, end) for key, value in content.items()}
+    if kind in ("tuple", "list"):
+        return {"tuple": tuple, "list": list}[kind](attach(value, start, end) for value in content)
+
+    return content # pickled
+
+def release(shm_list):
+    """
+    Close and unlink blocks of shared memory, given as SharedMemory blocks or a
+    descriptor (see `share`), e.g. blocks of a result that will not be read.
+
+    :param shm_list:
+        list of SharedMemory, or tuple, descriptor
+    """
+
+    # ...
+    if isinstance(shm_list, tuple):
+        shm_list = list(_get_names(shm_list))
+    for shm in shm_list:
+        try:
+            shm = shared_memory.SharedMemory(name=shm) if isinstance(shm, str) else shm
+            shm.close()
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+def _release_named(name:str):
+    """
+    Close and unlink blocks of shared memory named `<name>_0`, `<name>_1`, ...
+    (see `share`), e.g. blocks of a result whose worker process was terminated.
+    Blocks are created in order, i.e. the first block missing is the end.
+
+    :param name:
+        str, name given to `share`
+    """
+
+    # ...
+    k = 0
+    while True:
+        try:
+            shm = shared_memory.SharedMemory(name="{}_{}".format(name, k))
+        except FileNotFoundError:
+            return
+        shm.close()
+        shm.unlink()
+        k += 1
+
+def _share(data, shm_list:list, name=None):
+    """
+    Share data recursively, append blocks to shm_list (see `share`).
+    """
+
+    # ...
+    if isinstance(data, np.ndarray) and not data.dtype.hasobject:
+        shm_name = None if name is None else "{}_{}".format(name, len(shm_list))
+        shm = shared_memory.SharedMemory(name=shm_name, create=True, size=max(data.nbytes, 1)) # empty blocks are not supported
+        shm_list.append(shm)
+        np.ndarray(data.shape, dtype=data.dtype, buffer=shm.buf)[:] = data
+        return "array", (shm.name, data.shape, data.dtype.str)
+    if isinstance(data, pd.DataFrame):
+        column_list = [_share_values(data.iloc[:, j], shm_list, name=name) for j in range(data.shape[1])]
+        return "frame", (data.columns, column_list, _share_values(data.index, shm_list, name=name))
+    if isinstance(data, pd.Series):
+        return "series", (_share_values(data, shm_list, name=name), _share_values(data.index, shm_list, name=name), data.name)
+    if isinstance(data, dict):
+        return "dict", {key: _share(value, shm_list, name=name) for key, value in data.items()}
+    if isinstance(data, (tuple, list)) and type(data) in (tuple, list):
+        return type(data).__name__, [_share(value, shm_list, name=name) for value in data]
+    if isinstance(data, np.ndarray):
+        return "rows", (data, 0) # object array, pickled, rows from offset 0
+
+    return "pickled", data
+
+def _share_values(values, shm_list:list, name=None):
+    """
+    Share the values of a column or index (see `share`).
+    """
+
+    # ...
+    if isinstance(values, pd.RangeIndex):
+        return "range", (values.start, values.stop, values.step)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = pd.Categorical(values)
+        return "categorical", (_share(np.asarray(values.codes), shm_list, name=name), values.categories, values.ordered)
+    if isinstance(values.dtype, pd.DatetimeTZDtype):
+        values = pd.DatetimeIndex(values)
+        return "datetimetz", (_share(values.asi8, shm_list, name=name), str(values.tz))
+    if isinstance(values.dtype, np.dtype) and not values.dtype.hasobject:
+        return _share(values.to_numpy(), shm_list, name=name)
+
+    # strings as codes, missing values are restored as the first of them, hence all must be of the same type
+    if values.dtype == object and pd.api.types.infer_dtype(values, skipna=True) == "string":
+        values = np.asarray(values, dtype=object)
+        codes, uniques = pd.factorize(values)
+        missing = values[codes < 0]
+        if len({type(value) for value in missing}) <= 1:
+            codes = codes.astype(np.int32) if len(uniques) < np.iinfo(np.int32).max else codes
+            return "strings", (_share(codes, shm_list, name=name), list(uniques), missing[0] if len(missing) else None)
+
+    return "rows", (np.asarray(values) if isinstance(values.dtype, np.dtype) else values.array, 0)
+
+def _slice_pickled(descriptor:tuple, start:int, end:int):
+    """
+    Slice pickled rows of a descriptor, such that each task carries only the
+    rows of its chunk. The offset of the sliced rows is kept, such that
+    `attach` still takes rows start to end.
+    """
+
+    # ...
+    kind, content = descriptor
+    if kind == "rows":
+        values, offset = content
+        return "rows", (values[start - offset:end - offset], start)
+    if kind == "frame":
+        names, column_list, index = content
+        return kind, (names, [_slice_pickled(column, start, end) for column in column_list], _slice_pickled(index, start, end))
+    if kind == "series":
+        values, index, name = content
+        return kind, (_slice_pickled(values, start, end), _slice_pickled(index, start, end), name)
+    if kind == "dict":
+        return kind, {key: _slice_pickled(value, start, end) for key, value in content.items()}
+
+    return descriptor
+
+def _get_names(descriptor:tuple):
+    """
+    Get the names of all blocks of shared memory of a descriptor.
+    """
+
+    # ...
+    kind, content = descriptor
+    if kind == "array":
+        yield content[0]
+    elif kind in ("categorical", "strings", "datetimetz"):
+        yield from _get_names(content[0])
+    elif kind == "frame":
+        for column in content[1]:
+            yield from _get_names(column)
+        yield from _get_names(content[2])
+    elif kind == "series":
+        yield from _get_names(content[0])
+        yield from _get_names(content[1])
+    elif kind == "dict":
+        for value in content.values():
+            yield from _get_names(value)
+    elif kind in ("tuple", "list"):
+        for value in content:
+            yield from _get_names(value)
+
+def _get_length(data):
+    """
+    Get the number of rows of data, columns of a dict must be of equal length.
+    """
+
+    # ...
+    if isinstance(data, dict):
+        length_set = {len(value) for value in data.values()}
+        assert len(length_set) <= 1, "(ERROR) columns must be of equal length, you provided lengths {}".format(sorted(length_set))
+        return length_set.pop() if length_set else 0
+    assert isinstance(data, (np.ndarray, pd.DataFrame, pd.Series)), \
+        "(ERROR) data must be np.ndarray, pd.DataFrame, pd.Series or dict, you provided type {}".format(type(data).__name__)
+
+    return len(data)
+
+def _take(data, start:int, end:int):
+    """
+    Slice rows start to end of data, without shared memory (see `parallel_map` with a single worker).
+    """
+
+    # ...
+    if isinstance(data, dict):
+        return {key: value[start:end] for key, value in data.items()}
+    if isinstance(data, (pd.DataFrame, pd.Series)):
+        return data.iloc[start:end]
+
+    return data[start:end]
+
+def _init_worker():
+    """
+    Ignore interrupts within worker processes, the parent process stops them
+    (Jupyter interrupts the entire process group).
+    """
+
+    # ...
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _run_chunk(task:tuple):
+    """
+    Apply function to a chunk of shared data, to be executed within a worker process.
+
+    :param task:
+        tuple, (function, descriptor, start, end, args, kwargs, name), name of the result blocks if they are shared,
+        else None
+    :return result:
+        tuple, descriptor of the result in shared memory if shared, else the result
+    """
+
+    # ...
+    function, descriptor, start, end, args, kwargs, name = task
+    result = function(attach(descriptor, start, end), *args, **kwargs)
+    if name is None:
+        return result
+
+    # blocks are unlinked by the parent process once the result has been read, or by name if it has not
+    shm_list, descriptor = share(result, name=name)
+    for shm in shm_list:
+        shm.close()
+
+    return descriptor
+
+def _receive(result, share_results:bool):
+    """
+    Read a result from shared memory and release its blocks.
+    """
+
+    # ...
+    if not share_results:
+        return result
+    try:
+        return attach(result)
+    finally:
+        release(result)
+
+def _example_function(chunk:np.ndarray):
+    """
+    Example function, rank of each value per column of a chunk.
+    """
+
+    # ...
+    return np.argsort(np.argsort(chunk, axis=0), axis=0)
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("parallel_map")
+    parser.add_argument("--rows", type=str, help="number of rows of the example array, e.g. 1e7", default="1e7")
+    parser.add_argument("--columns", type=int, help="number of columns of the example array", default=8)
+    parser.add_argument("--workers", type=int, help="number of worker processes to compare with 1 (serial), default is number of CPUs", default=None)
+    parser.add_argument("--chunk_size", type=str, help="number of rows per chunk, e.g. 1e6", default=None)
+
+    # parse args
+    args = parser.parse_args()
+    data = np.random.default_rng(0).standard_normal((int(float(args.rows)), args.columns))
+    chunk_size = int(float(args.chunk_size)) if args.chunk_size is not None else None
+
+    # compare serial and parallel runtime
+    for workers in (1, args.workers or os.cpu_count()):
+        time_start = time.time()
+        result = parallel_apply(_example_function, data, chunk_size=chunk_size, workers=workers)
+        print("{} workers took {:.2f} seconds ({} rows)".format(workers, time.time() - time_start, len(result)))
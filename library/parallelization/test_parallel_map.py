@@ -0,0 +1,198 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+from multiprocessing import shared_memory
+import numpy as np
+import os
+import pandas as pd
+import pytest
+import time
+
+# library imports
+from library.parallelization.parallel_map import _release_named, attach, parallel_apply, parallel_map, release, share
+
+# settings
+WORKERS = 2
+PATH_SHM = "/dev/shm" # shared memory blocks on linux
+
+# HELPERS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def _get_blocks():
+    """
+    Get the names of all blocks of shared memory created by Python.
+    """
+
+    # ...
+    return {name for name in os.listdir(PATH_SHM) if name.startswith("psm_")}
+
+def _get_frame(num_rows=1_000):
+    """
+    DataFrame with columns of all kinds that are shared, including strings with missing values.
+    """
+
+    # ...
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "float": rng.standard_normal(num_rows),
+        "int": np.arange(num_rows, dtype=np.int32),
+        "category": pd.Categorical(rng.choice(["A.DE", "B.DE"], num_rows)),
+        "datetimetz": pd.date_range("2021-01-04", periods=num_rows, freq="s", tz="Europe/Berlin"),
+        "string": np.where(np.arange(num_rows) % 7 == 0, None, rng.choice(["Raw", "UPDATE"], num_rows)).astype(object),
+        "mixed": np.array([i if i % 2 else str(i) for i in range(num_rows)], dtype=object), # pickled
+    }, index=pd.RangeIndex(num_rows) + 10)
+
+def _describe(chunk:pd.DataFrame):
+    """
+    Example function, returns the chunk with a further column.
+    """
+
+    # ...
+    chunk = chunk.copy()
+    chunk["double"] = chunk["float"] * 2
+
+    return chunk
+
+def _sleep(chunk:np.ndarray, delay:float):
+    """
+    Example function, returns the chunk after delay seconds.
+    """
+
+    # ...
+    time.sleep(delay)
+
+    return chunk
+
+def _touch(chunk:np.ndarray, directory:str):
+    """
+    Example function, marks the chunk as started by a file in directory.
+    """
+
+    # ...
+    open(os.path.join(directory, str(int(chunk[0]))), "w").close()
+
+    return chunk
+
+def _fail(chunk:np.ndarray):
+    """
+    Example function, fails for the chunk that starts at row 300.
+    """
+
+    # ...
+    if chunk[0] == 300:
+        raise ValueError("chunk failed")
+    time.sleep(0.1)
+
+    return chunk
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+def test_share_attach_release():
+    """
+    Shared data attaches to equal data, by row range, and no block survives its release.
+    """
+
+    # ...
+    data = {"frame": _get_frame(), "array": np.arange(1_000).reshape(-1, 1), "tuple": (np.ones(1_000), "pickled")}
+    shm_list, descriptor = share(data)
+    try:
+        assert descriptor[1]["frame"][1][1][4][0] == "strings"
+        assert descriptor[1]["frame"][1][1][5][0] == "rows"
+        result = attach(descriptor, 100, 200)
+        pd.testing.assert_frame_equal(result["frame"], data["frame"].iloc[100:200])
+        np.testing.assert_array_equal(result["array"], data["array"][100:200])
+        assert result["tuple"][1] == "pickled"
+    finally:
+        release(descriptor)
+
+    for shm in shm_list:
+        with pytest.raises(FileNotFoundError):
+            shared_memory.SharedMemory(name=shm.name)
+
+def test_release_named():
+    """
+    Named blocks are released by name, e.g. if the descriptor of a result is lost.
+    """
+
+    # ...
+    name = "psm_test_{}".format(os.getpid())
+    shm_list, descriptor = share({"frame": _get_frame(), "array": np.arange(10)}, name=name)
+    for shm in shm_list:
+        shm.close()
+
+    assert sorted(shm.name for shm in shm_list) == sorted("{}_{}".format(name, k) for k in range(len(shm_list)))
+    pd.testing.assert_frame_equal(attach(descriptor)["frame"], _get_frame())
+    _release_named(name)
+    assert not {block for block in _get_blocks() if block.startswith(name)}
+
+@pytest.mark.parametrize("share_results", [True, False])
+def test_ordered_equals_serial(share_results):
+    """
+    Results of several workers, shared or pickled, are yielded in order and equal serial results.
+    """
+
+    # ...
+    df = _get_frame()
+    expected = list(parallel_map(_describe, df, chunk_size=128, workers=1))
+    result = list(parallel_map(_describe, df, chunk_size=128, workers=WORKERS, share_results=share_results))
+
+    assert [i for i, _ in result] == list(range(len(expected)))
+    for (_, chunk), (_, chunk_expected) in zip(result, expected):
+        pd.testing.assert_frame_equal(chunk, chunk_expected)
+    pd.testing.assert_frame_equal(parallel_apply(_describe, df, chunk_size=128, workers=WORKERS), _describe(df))
+
+def test_unordered():
+    """
+    Unordered results are yielded as soon as they are done, i.e. a slow first chunk comes last.
+    """
+
+    # ...
+    data = np.arange(400)
+    result = list(parallel_map(_sleep, data, chunk_size=100, chunk_args=[(1.0,), (0,), (0,), (0,)], workers=WORKERS, ordered=False))
+
+    assert sorted(i for i, _ in result) == [0, 1, 2, 3]
+    assert result[-1][0] == 0
+    for i, chunk in result:
+        np.testing.assert_array_equal(chunk, data[100 * i:100 * (i + 1)])
+
+def test_max_in_flight(tmp_path):
+    """
+    At most max_in_flight chunks (and the next chunk to yield) are started before results are consumed.
+    """
+
+    # ...
+    data = np.arange(1_000)
+    for i, _ in parallel_map(_touch, data, chunk_size=100, workers=WORKERS, max_in_flight=2, directory=str(tmp_path)):
+        time.sleep(0.1) # consume slowly, such that workers would run ahead if unbounded
+        assert len(os.listdir(tmp_path)) <= i + 1 + 2 + 1
+
+    assert len(os.listdir(tmp_path)) == 10
+
+def test_release_on_exception():
+    """
+    No block of shared memory survives a failed chunk.
+    """
+
+    # ...
+    blocks = _get_blocks()
+    with pytest.raises(ValueError, match="chunk failed"):
+        for _ in parallel_map(_fail, np.arange(1_000), chunk_size=100, workers=WORKERS):
+            pass
+
+    assert _get_blocks() <= blocks
+
+def test_release_on_close():
+    """
+    No block of shared memory survives a generator that is closed early, e.g. by break.
+    """
+
+    # ...
+    blocks = _get_blocks()
+    generator = parallel_map(_sleep, np.arange(1_000), chunk_size=100, chunk_args=[(0.1,)] * 10, workers=WORKERS)
+    next(generator)
+    generator.close()
+
+    assert _get_blocks() <= blocks
@@ -0,0 +1,611 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# open issues
+# TODO: decompress regular (single-member) gzip files in parallel, e.g. using rapidgzip, if installed
+
+# general imports
+import argparse
+import collections
+from concurrent.futures import ThreadPoolExecutor
+import gzip
+import io
+import os
+import shutil
+import struct
+import zlib
+
+# settings
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+COMPRESSIONS = [None, "gzip", "zstd"] # None is uncompressed, "gzip" is written as BGZF
+EXTENSIONS = {".gz": "gzip", ".zst": "zstd"}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+# BGZF (blocked gzip, see SAM/BAM specification), i.e. a series of gzip members of at most 64 KiB each
+BGZF_BLOCK_SIZE = 65280 # uncompressed bytes per block, such that each compressed block fits 64 KiB (as htslib)
+BGZF_HEADER = struct.Struct("<4BI2BH2BHH") # ID1, ID2, CM, FLG, MTIME, XFL, OS, XLEN, SI1, SI2, SLEN, BSIZE
+BGZF_TRAILER = struct.Struct("<II") # CRC32, ISIZE
+BGZF_EOF = bytes.fromhex("1f8b08040000000000ff0600424302001b0003000000000000000000") # empty block
+BLOCKS_PER_TASK = 64 # blocks (de)compressed per thread task, about 4 MB
+
+def get_compression(path:str):
+    """
+    Detect the compression of a file from its first bytes (magic number),
+    i.e. independent of the file extension.
+
+    :param path:
+        str, path to file
+    :return compression:
+        str, one of "bgzf" (blocked gzip), "gzip" (regular gzip), "zstd", None (uncompressed)
+    """
+
+    # ...
+    with open(path, "rb") as file:
+        header = file.read(BGZF_HEADER.size)
+
+    # ...
+    if header.startswith(ZSTD_MAGIC):
+        return "zstd"
+    if not header.startswith(GZIP_MAGIC):
+        return None
+    if len(header) == BGZF_HEADER.size and _is_bgzf_header(header):
+        return "bgzf"
+
+    return "gzip"
+
+def open_compressed(path:str, mode="rb", compression=None, level=None, threads=None):
+    """
+    Open a file for reading or writing, (de)compressed on several threads if
+    possible. Reading detects the compression from the file content, BGZF is
+    decompressed in parallel, regular gzip on a single thread (as gzip.open),
+    zstd as a stream. Writing compresses gzip as BGZF in parallel, which is
+    readable by standard tools (gzip, zcat, pandas, datatable), and zstd using
+    the multi-threaded zstd compressor.
+
+    :param path:
+        str, path to file
+    :param mode:
+        str, one of "rb", "rt", "wb", "wt", default is "rb"
+    :param compression:
+        str, if writing, one of "gzip", "zstd", None, default is None (inferred from file extension)
+    :param level:
+        int, if writing, compression level, default is None (GZIP_LEVEL or ZSTD_LEVEL)
+    :param threads:
+        int, number of threads, default is None (number of cores)
+    :return file:
+        file object, binary or text
+    """
+
+    # ...
+    assert mode in ["rb", "rt", "wb", "wt"], \
+        "(ERROR) mode must be one of ['rb', 'rt', 'wb', 'wt'], you provided value {value}".format(
+            value=mode,
+        )
+
+    # read: detect compression from file content
+    if mode.startswith("r"):
+        compression = get_compression(path)
+        if compression == "bgzf":
+            file = io.BufferedReader(BlockGzipReader(open(path, "rb"), threads=threads))
+        elif compression == "gzip":
+            file = gzip.open(path, "rb")
+        elif compression == "zstd":
+            file = _open_zstd(path, "rb")
+        else:
+            file = open(path, "rb")
+
+    # write: infer compression from file extension, if not specified
+    else:
+        if compression is None:
+            compression = EXTENSIONS.get(os.path.splitext(path)[1])
+        assert compression in COMPRESSIONS, \
+            "(ERROR) compression must be one of {compressions}, you provided value {value}".format(
+                compressions=COMPRESSIONS,
+                value=compression,
+            )
+        if compression == "gzip":
+            file = BlockGzipWriter(open(path, "wb"), level=level if level is not None else GZIP_LEVEL, threads=threads)
+        elif compression == "zstd":
+            file = _open_zstd(path, "wb", level=level, threads=threads)
+        else:
+            file = open(path, "wb")
+
+    # ...
+    if mode.endswith("t"):
+        file = io.TextIOWrapper(file, encoding="utf-8")
+
+    return file
+
+def read_compressed(path:str, threads=None):
+    """
+    Read and decompress an entire file into memory, e.g. to pass it on to
+    `datatable.fread(text=...)`, which decompresses gzip on a single thread.
+
+    :param path:
+        str, path to file
+    :param threads:
+        int, number of threads, default is None (number of cores)
+    :return data:
+        bytes, decompressed file content
+    """
+
+    # ...
+    with open_compressed(path, "rb", threads=threads) as file:
+        return file.read()
+
+def recompress(path:str, path_out:str, compression="gzip", level=None, threads=None):
+    """
+    Recompress a file, e.g. a regular gzip file as BGZF, such that it can be
+    decompressed in parallel from now on. The file is processed as a stream.
+
+    :param path:
+        str, path to input file, any compression
+    :param path_out:
+        str, path to output file
+    :param compression:
+        str, one of "gzip" (BGZF), "zstd", None, default is "gzip"
+    :param level:
+        int, compression level, default is None (GZIP_LEVEL or ZSTD_LEVEL)
+    :param threads:
+        int, number of threads, default is None (number of cores)
+    """
+
+    # ...
+    with open_compressed(path, "rb", threads=threads) as file, \
+        open_compressed(path_out, "wb", compression=compression, level=level, threads=threads) as file_out:
+        shutil.copyfileobj(file, file_out, length=BGZF_BLOCK_SIZE * BLOCKS_PER_TASK)
+
+def iter_bgzf_blocks(path:str, threads=None):
+    """
+    Iterate over the blocks of a BGZF file, decompressed on several threads,
+    e.g. to map positions in the decompressed data to block offsets (see
+    `read_bgzf_range`).
+
+    :param path:
+        str, path to BGZF file
+    :param threads:
+        int, number of threads, default is None (number of cores)
+    :return generator:
+        tuples of (offset, data), i.e. position of the block in the file and decompressed block
+    """
+
+    # ...
+    threads = threads or os.cpu_count()
+    with open(path, "rb") as file, ThreadPoolExecutor(max_workers=threads) as executor:
+        pending = collections.deque()
+        offset = 0
+        for batch in _iter_block_batches(file):
+            pending.append((offset, executor.submit(_decompress_block_list, batch)))
+            offset += len(batch)
+            while len(pending) > 2 * threads:
+                batch_offset, future = pending.popleft()
+                for block_offset, data in future.result():
+                    yield batch_offset + block_offset, data
+        while pending:
+            batch_offset, future = pending.popleft()
+            for block_offset, data in future.result():
+                yield batch_offset + block_offset, data
+
+def get_bgzf_offsets(path:str):
+    """
+    Get the position of each block of a BGZF file, reading the block headers
+    only. All blocks written by `BlockGzipWriter` but the last one hold
+    BGZF_BLOCK_SIZE decompressed bytes, i.e. byte i of the decompressed data
+    is in block i // BGZF_BLOCK_SIZE (see `read_bgzf_range`).
+
+    :param path:
+        str, path to BGZF file
+    :return offset_list:
+        list, positions of the blocks in the file, except for empty blocks (end of file)
+    """
+
+    # ...
+    offset_list = []
+    with open(path, "rb") as file:
+        offset = 0
+        header = file.read(BGZF_HEADER.size)
+        while header:
+            assert len(header) == BGZF_HEADER.size and _is_bgzf_header(header), \
+                "(ERROR) file is not BGZF at offset {offset}".format(offset=offset)
+            block_size = BGZF_HEADER.unpack(header)[-1] + 1
+            file.seek(offset + block_size - BGZF_TRAILER.size)
+            if BGZF_TRAILER.unpack(file.read(BGZF_TRAILER.size))[1]:
+                offset_list.append(offset)
+            offset += block_size
+            header = file.read(BGZF_HEADER.size)
+
+    return offset_list
+
+def read_bgzf_range(file, offset:int, skip:int, size:int):
+    """
+    Read a range of decompressed data from a BGZF file, decompressing only
+    the blocks that overlap the range (random access).
+
+    :param file:
+        file object, binary, BGZF file
+    :param offset:
+        int, position of the block in the file where the range starts
+    :param skip:
+        int, position of the range within the decompressed block
+    :param size:
+        int, length of the range in decompressed bytes
+    :return data:
+        bytes, decompressed range
+    """
+
+    # ...
+    file.seek(offset)
+    data_list = []
+    remaining = skip + size
+    while remaining > 0:
+        header = file.read(BGZF_HEADER.size)
+        assert len(header) == BGZF_HEADER.size and _is_bgzf_header(header), \
+            "(ERROR) range exceeds BGZF file, or file is not BGZF at offset {offset}".format(offset=offset)
+        block_size = BGZF_HEADER.unpack(header)[-1] + 1
+        data = _decompress_blocks(header + file.read(block_size - BGZF_HEADER.size))
+        data_list.append(data)
+        remaining -= len(data)
+
+    return b"".join(data_list)[skip:skip + size]
+
+class BlockGzipReader(io.RawIOBase):
+
+    def __init__(self, file, threads=None):
+        """
+        Read a BGZF file, decompressing batches of blocks on several threads
+        ahead of the position that is read (zlib releases the GIL). At most
+        two batches per thread are held in memory.
+
+        :param file:
+            file object, binary, positioned at the start of a BGZF block
+        :param threads:
+            int, number of threads, default is None (number of cores)
+        """
+
+        # ...
+        threads = threads or os.cpu_count()
+        self.file = file
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.max_pending = 2 * threads
+        self.pending = collections.deque()
+        self.batches = _iter_block_batches(file)
+        self.buffer = memoryview(b"")
+        self._submit()
+
+    def _submit(self):
+        """
+        Submit batches of blocks until the number of pending batches is reached.
+        """
+
+        # ...
+        while len(self.pending) < self.max_pending:
+            batch = next(self.batches, None)
+            if batch is None:
+                break
+            self.pending.append(self.executor.submit(_decompress_blocks, batch))
+
+    def _next(self):
+        """
+        Get the next decompressed batch, in order.
+
+        :return data:
+            bytes, decompressed data, empty at end of file
+        """
+
+        # ...
+        while self.pending:
+            data = self.pending.popleft().result()
+            self._submit()
+            if data:
+                return data
+
+        return b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        """
+        Read up to len(buffer) bytes into buffer.
+
+        :param buffer:
+            writable buffer, e.g. bytearray
+        :return size:
+            int, number of bytes read, 0 at end of file
+        """
+
+        # ...
+        if not len(self.buffer):
+            self.buffer = memoryview(self._next())
+        buffer = memoryview(buffer).cast("B")
+        size = min(len(buffer), len(self.buffer))
+        buffer[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+
+        return size
+
+    def readall(self):
+        """
+        Read all remaining bytes, joined once.
+
+        :return data:
+            bytes, decompressed data
+        """
+
+        # ...
+        data_list = [bytes(self.buffer)]
+        self.buffer = memoryview(b"")
+        data = self._next()
+        while data:
+            data_list.append(data)
+            data = self._next()
+
+        return b"".join(data_list)
+
+    def close(self):
+        """
+        Cancel pending batches, close underlying file.
+        """
+
+        # ...
+        if not self.closed:
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.file.close()
+        super().close()
+
+class BlockGzipWriter(io.RawIOBase):
+
+    def __init__(self, file, level=GZIP_LEVEL, threads=None):
+        """
+        Write a BGZF file, compressing batches of blocks on several threads
+        (zlib releases the GIL) and writing them in order. At most two batches
+        per thread are held in memory. An empty block marks the end of file.
+
+        :param file:
+            file object, binary
+        :param level:
+            int, gzip compression level, 1 (fast) to 9 (small), default is GZIP_LEVEL
+        :param threads:
+            int, number of threads, default is None (number of cores)
+        """
+
+        # ...
+        threads = threads or os.cpu_count()
+        self.file = file
+        self.level = level
+        self.executor = ThreadPoolExecutor(max_workers=threads)
+        self.max_pending = 2 * threads
+        self.pending = collections.deque()
+        self.buffer = bytearray()
+
+    def _submit(self, data):
+        """
+        Submit a batch of data for compression, write completed batches in order.
+
+        :param data:
+            bytes, uncompressed data
+        """
+
+        # ...
+        self.pending.append(self.executor.submit(_compress_blocks, data, self.level))
+        while len(self.pending) > self.max_pending:
+            self.file.write(self.pending.popleft().result())
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        """
+        Write data, compressed in batches of BLOCKS_PER_TASK blocks.
+
+        :param data:
+            bytes-like, uncompressed data
+        :return size:
+            int, number of bytes written
+        """
+
+        # bytes are immutable, i.e. can be compressed without copy, others may be modified by the caller
+        if not isinstance(data, bytes):
+            data = bytes(data)
+        view = memoryview(data)
+        batch_size = BGZF_BLOCK_SIZE * BLOCKS_PER_TASK
+
+        # complete buffered batch first
+        if self.buffer:
+            fill = min(len(view), batch_size - len(self.buffer))
+            self.buffer += view[:fill]
+            view = view[fill:]
+            if len(self.buffer) == batch_size:
+                self._submit(bytes(self.buffer))
+                self.buffer = bytearray()
+
+        # submit complete batches, keep the rest
+        cut = len(view) - len(view) % batch_size
+        for start in range(0, cut, batch_size):
+            self._submit(view[start:start + batch_size])
+        self.buffer += view[cut:]
+
+        return len(data)
+
+    def close(self):
+        """
+        Compress remaining data, write end-of-file block, close underlying file.
+        """
+
+        # ...
+        if not self.closed:
+            try:
+                if self.buffer:
+                    self._submit(bytes(self.buffer))
+                    self.buffer = bytearray()
+                while self.pending:
+                    self.file.write(self.pending.popleft().result())
+                self.file.write(BGZF_EOF)
+            finally:
+                self.executor.shutdown(wait=True)
+                self.file.close()
+        super().close()
+
+def _compress_blocks(data, level=GZIP_LEVEL):
+    """
+    Compress data into a series of BGZF blocks, to be executed within a thread.
+
+    :param data:
+        bytes-like, uncompressed data
+    :param level:
+        int, gzip compression level
+    :return blocks:
+        bytes, BGZF blocks
+    """
+
+    # ...
+    block_list = []
+    for start in range(0, len(data), BGZF_BLOCK_SIZE):
+        block = data[start:start + BGZF_BLOCK_SIZE]
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS) # raw deflate, no zlib header
+        deflated = compressor.compress(block) + compressor.flush()
+        block_size = BGZF_HEADER.size + len(deflated) + BGZF_TRAILER.size
+        block_list.append(BGZF_HEADER.pack(31, 139, 8, 4, 0, 0, 255, 6, 66, 67, 2, block_size - 1))
+        block_list.append(deflated)
+        block_list.append(BGZF_TRAILER.pack(zlib.crc32(block), len(block)))
+
+    return b"".join(block_list)
+
+def _decompress_blocks(data):
+    """
+    Decompress a series of BGZF blocks, to be executed within a thread.
+
+    :param data:
+        bytes, BGZF blocks
+    :return data:
+        bytes, decompressed data
+    """
+
+    # ...
+    return b"".join(block for _, block in _decompress_block_list(data))
+
+def _decompress_block_list(data):
+    """
+    Decompress a series of BGZF blocks one by one, to be executed within a
+    thread. The checksum and size of each block are verified.
+
+    :param data:
+        bytes, BGZF blocks
+    :return block_list:
+        list, tuples of (offset, data), i.e. position of the block in data and decompressed block
+    """
+
+    # ...
+    view = memoryview(data)
+    block_list = []
+    offset = 0
+    while offset < len(view):
+        block_size = BGZF_HEADER.unpack_from(view, offset)[-1] + 1
+        crc, size = BGZF_TRAILER.unpack_from(view, offset + block_size - BGZF_TRAILER.size)
+        deflated = view[offset + BGZF_HEADER.size:offset + block_size - BGZF_TRAILER.size]
+        block = zlib.decompress(deflated, -zlib.MAX_WBITS, max(size, 1))
+        assert len(block) == size and zlib.crc32(block) == crc, \
+            "(ERROR) corrupt BGZF block at offset {offset} of batch".format(offset=offset)
+        block_list.append((offset, block))
+        offset += block_size
+
+    return block_list
+
+def _iter_block_batches(file):
+    """
+    Split a BGZF file into batches of BLOCKS_PER_TASK blocks, using the block
+    size in each block header, i.e. without decompressing anything.
+
+    :param file:
+        file object, binary, positioned at the start of a BGZF block
+    :return batches:
+        generator, bytes, BGZF blocks
+    """
+
+    # ...
+    block_list = []
+    header = file.read(BGZF_HEADER.size)
+    while header:
+        assert len(header) == BGZF_HEADER.size and _is_bgzf_header(header), \
+            "(ERROR) file is not BGZF (blocked gzip) throughout, e.g. a regular gzip member was appended"
+        block_size = BGZF_HEADER.unpack(header)[-1] + 1
+        block_list.append(header + file.read(block_size - BGZF_HEADER.size))
+        if len(block_list) == BLOCKS_PER_TASK:
+            yield b"".join(block_list)
+            block_list = []
+        header = file.read(BGZF_HEADER.size)
+
+    if block_list:
+        yield b"".join(block_list)
+
+def _is_bgzf_header(header:bytes):
+    """
+    Check whether a gzip member header is a BGZF block header, i.e. has a
+    single extra subfield 'BC' that holds the size of the block.
+    """
+
+    # ...
+    id1, id2, cm, flg, _, _, _, xlen, si1, si2, slen, _ = BGZF_HEADER.unpack(header)
+
+    return (id1, id2, cm) == (31, 139, 8) and flg & 4 and (xlen, si1, si2, slen) == (6, 66, 67, 2)
+
+def _open_zstd(path:str, mode="rb", level=None, threads=None):
+    """
+    Open a zstd file as a stream, compressed on several threads.
+
+    :param path:
+        str, path to file
+    :param mode:
+        str, one of "rb", "wb", default is "rb"
+    :param level:
+        int, if writing, zstd compression level, default is None (ZSTD_LEVEL)
+    :param threads:
+        int, if writing, number of threads, default is None (number of cores)
+    :return file:
+        file object, binary
+    """
+
+    # we do not know whether zstandard is installed
+    import zstandard
+
+    # decompression is single-threaded, but fast
+    if mode == "rb":
+        return zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True, closefd=True)
+
+    # ...
+    compressor = zstandard.ZstdCompressor(
+        level=level if level is not None else ZSTD_LEVEL,
+        threads=threads or os.cpu_count(),
+    )
+
+    return compressor.stream_writer(open(path, "wb"), closefd=True)
+
+# ...
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("recompress")
+    parser.add_argument("--path", type=str, help="input file, any compression", default=None)
+    parser.add_argument("--path_out", type=str, help="output file, e.g. .csv.gz (BGZF) or .csv.zst", default=None)
+    parser.add_argument("--compression", type=str, help="gzip (BGZF) or zstd, default is inferred from --path_out", default=None)
+    parser.add_argument("--level", type=int, help="compression level", default=None)
+    parser.add_argument("--threads", type=int, help="number of threads, default is number of cores", default=None)
+
+    # parse args
+    args = parser.parse_args()
+
+    # ...
+    recompress(
+        path=args.path,
+        path_out=args.path_out,
+        compression=args.compression or EXTENSIONS.get(os.path.splitext(args.path_out)[1]),
+        level=args.level,
+        threads=args.threads,
+    )
@@ -0,0 +1,109 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import gzip
+import numpy as np
+import os
+import pytest
+
+# library imports
+from library.utility.compression.compression import BGZF_BLOCK_SIZE, get_bgzf_offsets, get_compression, open_compressed, read_bgzf_range, read_compressed, recompress
+
+# settings
+SIZE = 5 * BGZF_BLOCK_SIZE + 12345 # bytes, several full blocks and a partial last block
+
+# FIXTURES . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.fixture(scope="module")
+def data():
+    """
+    Compressible bytes, i.e. random digits and separators similar to a csv file.
+    """
+
+    # ...
+    rng = np.random.default_rng(0)
+    return rng.choice(np.frombuffer(b"0123456789.,\n", dtype=np.uint8), SIZE).tobytes()
+
+@pytest.fixture(scope="module")
+def path(data, tmp_path_factory):
+    """
+    BGZF file of data, written by `open_compressed`.
+    """
+
+    # ...
+    path = os.path.join(tmp_path_factory.mktemp("compression"), "data.csv.gz")
+    with open_compressed(path, "wb", compression="gzip", threads=2) as file:
+        file.write(data)
+
+    return path
+
+# TESTS . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . . .
+
+@pytest.mark.parametrize("threads", [1, 2])
+def test_round_trip(path, data, threads):
+    """
+    BGZF written in parallel reads back equal, in parallel and by the standard gzip module.
+    """
+
+    # ...
+    assert get_compression(path) == "bgzf"
+    with open_compressed(path, "rb", threads=threads) as file:
+        assert file.read() == data
+    assert read_compressed(path, threads=threads) == data
+    with gzip.open(path, "rb") as file:
+        assert file.read() == data
+
+def test_recompress(path, data, tmp_path):
+    """
+    Regular (single-member) gzip recompresses as BGZF with equal content.
+    """
+
+    # ...
+    path_gzip = os.path.join(tmp_path, "single.csv.gz")
+    with gzip.open(path_gzip, "wb") as file:
+        file.write(data)
+    path_out = os.path.join(tmp_path, "blocked.csv.gz")
+    recompress(path_gzip, path_out, threads=2)
+
+    assert get_compression(path_gzip) == "gzip"
+    assert get_compression(path_out) == "bgzf"
+    assert read_compressed(path_out) == data
+
+def test_get_bgzf_offsets(path, data):
+    """
+    Each block but the last holds BGZF_BLOCK_SIZE decompressed bytes, the end of file block is skipped.
+    """
+
+    # ...
+    offset_list = get_bgzf_offsets(path)
+    assert len(offset_list) == -(-len(data) // BGZF_BLOCK_SIZE)
+    assert offset_list[0] == 0 and offset_list == sorted(offset_list)
+
+    with open(path, "rb") as file:
+        for i, offset in enumerate(offset_list):
+            block = read_bgzf_range(file, offset, 0, BGZF_BLOCK_SIZE if i < len(offset_list) - 1 else len(data) % BGZF_BLOCK_SIZE)
+            assert block == data[i * BGZF_BLOCK_SIZE:(i + 1) * BGZF_BLOCK_SIZE]
+
+def test_read_bgzf_range(path, data):
+    """
+    Random ranges, including ranges at and across block boundaries, equal the decompressed data.
+    """
+
+    # ...
+    offset_list = get_bgzf_offsets(path)
+    rng = np.random.default_rng(0)
+    range_list = [(0, 1), (BGZF_BLOCK_SIZE - 1, 2), (BGZF_BLOCK_SIZE, BGZF_BLOCK_SIZE), (0, len(data)), (len(data) - 1, 1)]
+    range_list += [(int(start), int(rng.integers(1, 3 * BGZF_BLOCK_SIZE))) for start in rng.integers(0, len(data), 50)]
+    with open(path, "rb") as file:
+        for start, size in range_list:
+            size = min(size, len(data) - start)
+            block, skip = divmod(start, BGZF_BLOCK_SIZE)
+            assert read_bgzf_range(file, offset_list[block], skip, size) == data[start:start + size]
+
+    # range beyond the end of file
+    with open(path, "rb") as file, pytest.raises(AssertionError, match="range exceeds BGZF file"):
+        read_bgzf_range(file, offset_list[-1], 0, BGZF_BLOCK_SIZE)
@@ -0,0 +1,55 @@
+# !/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
+
+# general imports
+import argparse
+import hashlib
+
+# settings
+BLOCK_SIZE = 2**20 # bytes per read, 1 MiB
+
+def hash_file(path:str, algorithm="sha256", block_size=BLOCK_SIZE):
+    """
+    Hash a file block by block, e.g. to verify a download or to identify raw
+    data in the cache (see `chunkwise_reconstruct_book`).
+
+    :param path:
+        str, path to file
+    :param algorithm:
+        str, hash algorithm (see `hashlib.algorithms_available`), default is "sha256"
+    :param block_size:
+        int, bytes per read, default is BLOCK_SIZE
+    :return digest:
+        str, hex digest
+    """
+
+    # ...
+    assert algorithm in hashlib.algorithms_available, \
+        "(ERROR) algorithm must be one of {algorithms}, you provided value {value}".format(
+            algorithms=sorted(hashlib.algorithms_available),
+            value=algorithm,
+        )
+
+    # ...
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+if __name__ == "__main__":
+
+    # instantiate argument parser
+    parser = argparse.ArgumentParser("hash_file")
+    parser.add_argument("--path", type=str, help="file to hash", default=None)
+    parser.add_argument("--algorithm", type=str, help="hash algorithm, e.g. md5, sha1 or sha256", default="sha256")
+
+    # parse args
+    args = parser.parse_args()
+
+    # ...
+    print(hash_file(args.path, algorithm=args.algorithm))
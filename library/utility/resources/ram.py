@@ -1,4 +1,104 @@
 # !/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+__author__ = "Jonas De Paolis"
+__version__ = "2026-10-17"
 
+# open issues
+# TODO: support cgroup memory limits (kubernetes pods) in addition to process rss
+
+# general imports
+import ctypes
+import ctypes.util
+import gc
+import resource
+
+# settings
+PROC_STATUS = "/proc/self/status"
+PROC_CLEAR_REFS = "/proc/self/clear_refs"
+
+def _read_proc_status(key):
+    """
+    Read a memory value from /proc/self/status (linux only).
+
+    :param key:
+        str, e.g. "VmRSS" (current) or "VmHWM" (peak)
+    :return value:
+        int, value in bytes, None if not available
+    """
+
+    # ...
+    try:
+        with open(PROC_STATUS) as file:
+            for line in file:
+                if line.startswith(key + ":"):
+                    return int(line.split()[1]) * 1024 # reported in kB
+    except OSError:
+        pass
+
+    return None
+
+def get_rss():
+    """
+    Get the current resident set size (rss) of this process.
+
+    :return rss:
+        int, rss in bytes, None if not available
+    """
+
+    # ...
+    return _read_proc_status("VmRSS")
+
+def get_peak_rss():
+    """
+    Get the peak resident set size (rss) of this process, i.e. since process
+    start or since the last call to `reset_peak_rss`.
+
+    :return peak_rss:
+        int, peak rss in bytes
+    """
+
+    # use /proc/self/status if possible, as it respects `reset_peak_rss`
+    peak_rss = _read_proc_status("VmHWM")
+    if peak_rss is not None:
+        return peak_rss
+
+    # ru_maxrss is reported in kB on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def reset_peak_rss():
+    """
+    Reset the peak resident set size (rss) of this process to its current
+    rss, so that the peak of a subsequent block of code can be measured.
+    This requires linux >= 4.0, otherwise the peak cannot be reset.
+
+    :return is_reset:
+        bool, whether the peak rss has been reset
+    """
+
+    # ...
+    try:
+        with open(PROC_CLEAR_REFS, "w") as file:
+            file.write("5")
+        return True
+    except OSError:
+        return False
+
+def trim_memory():
+    """
+    Run the garbage collector and return freed heap memory to the operating
+    system (glibc only), such that the rss reflects the memory still in use.
+    Otherwise, memory freed by a previous block of code is kept by the
+    allocator and hides the peak rss of a subsequent block of code.
+
+    :return is_trimmed:
+        bool, whether freed heap memory has been returned
+    """
+
+    # ...
+    gc.collect()
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"))
+        return bool(libc.malloc_trim(0))
+    except (OSError, AttributeError):
+        return False